@@ -1,116 +1,215 @@
 from __future__ import annotations
 
+import base64
+import hashlib
 import json as _json
 import os
 import time as _time
-from typing import Any, Dict, List, Optional, Tuple
-from urllib.error import HTTPError, URLError
-from urllib.request import urlopen
+import zlib
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from backend.shared.card_catalog import (
+    FETCHED_AT_ATTR,
+    REFRESHER_ATTR,
+    CardCatalogIndex,
+    CardCatalogRefresher,
+    SortKey,
+    get_catalog_index,
+    publish_catalog,
+    validate_cards,
+)
 
 router = APIRouter(prefix="/api", tags=["cards"])
 
+# Upper bound on ids resolved by one batch request (a deck is well below this)
+_BATCH_MAX_IDS = 500
+
+# Target size of each chunk written by the streaming export
+_EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+_DEFAULT_CARDS: List[Dict[str, Any]] = [
+    {
+        "id": "card-001",
+        "name": "Solar Guard",
+        "description": "Shielded unit of the Solaris Nexus.",
+        "type": "unit",
+        "unitType": "melee",
+        "faction": "solaris",
+        "rarity": "common",
+        "cost": 2,
+        "attack": 2,
+        "health": 3,
+        "abilities": [],
+        "energyCost": 2,
+        "isActive": True,
+        "createdAt": "2025-01-01T00:00:00Z",
+        "updatedAt": "2025-01-01T00:00:00Z",
+    },
+    {
+        "id": "card-002",
+        "name": "Shadow Operative",
+        "description": "Stealth unit of Umbral Eclipse.",
+        "type": "unit",
+        "unitType": "ranged",
+        "faction": "umbral-eclipse",
+        "rarity": "uncommon",
+        "cost": 3,
+        "attack": 3,
+        "health": 2,
+        "abilities": ["Stealth"],
+        "energyCost": 3,
+        "isActive": True,
+        "createdAt": "2025-01-01T00:00:00Z",
+        "updatedAt": "2025-01-01T00:00:00Z",
+    },
+]
+
 
-def _cards_store(request: Request) -> List[Dict[str, Any]]:
+def _cards_store(request: Request) -> CardCatalogIndex:
     """Minimal in-memory card catalog for development.
 
+    The catalog is indexed once per load and the index is cached on the db
+    object, so requests never rescan the raw card list. A remote
+    ``CARDS_SOURCE_URL`` is only ever fetched by the background
+    ``CardCatalogRefresher``; requests keep serving the current (possibly
+    stale) copy while it revalidates, and after a failed fetch until the
+    refresher's backoff has elapsed.
+
     In production, replace with real database/provider.
     """
     db = getattr(request.state, "db", None)
     if db is None:
         raise HTTPException(status_code=500, detail="Database not available")
-    # If external source provided, fetch and cache
     source_url = os.environ.get("CARDS_SOURCE_URL")
     source_file = os.environ.get("CARDS_SOURCE_FILE")
     cache_ttl = int(os.environ.get("CARDS_SOURCE_TTL", "300"))  # seconds
     now = int(_time.time())
-    cards = getattr(db, "cards_catalog", None)
-    last_fetched = getattr(db, "cards_catalog_last_fetched", 0)
-
-    def _validate_cards(candidate: Any) -> Tuple[bool, List[Dict[str, Any]]]:
-        if not isinstance(candidate, list):
-            return False, []
-        validated: List[Dict[str, Any]] = []
-        for item in candidate:
-            if not isinstance(item, dict):
-                continue
-            cid = item.get("id")
-            name = item.get("name")
-            ctype = item.get("type")
-            if not isinstance(cid, str) or not isinstance(name, str) or not isinstance(ctype, str):
-                continue
-            validated.append(item)
-        # Require at least a handful of valid entries to accept source
-        return (len(validated) >= 1), validated
-    if source_url and (cards is None or now - int(last_fetched) > cache_ttl):
-        try:
-            with urlopen(source_url, timeout=5) as resp:
-                data = resp.read()
-                fetched = _json.loads(data)
-                ok, validated = _validate_cards(fetched)
-                if ok:
-                    cards = validated
-                    setattr(db, "cards_catalog", cards)
-                    setattr(db, "cards_catalog_last_fetched", now)
-        except (URLError, HTTPError, ValueError):
-            # fall through to in-memory default on failure
-            cards = getattr(db, "cards_catalog", None)
+    index = get_catalog_index(db)
+    last_fetched = getattr(db, FETCHED_AT_ATTR, 0)
+    expired = now - int(last_fetched) > cache_ttl
+
+    if source_url and (index is None or expired):
+        # Never block the request on the network: kick the refresher (created
+        # lazily when the app runs without the lifespan) and serve what we have
+        refresher = getattr(db, REFRESHER_ATTR, None) or CardCatalogRefresher(
+            db, source_url, refresh_interval=max(1, cache_ttl)
+        )
+        refresher.refresh_in_background()
 
     # Local file fallback if provided and still no cards or cache expired
-    if source_file and (cards is None or now - int(last_fetched) > cache_ttl):
+    if source_file and (index is None or (expired and not source_url)):
         try:
             with open(source_file, "r", encoding="utf-8") as fh:
-                fetched = _json.load(fh)
-                ok, validated = _validate_cards(fetched)
+                ok, validated = validate_cards(_json.load(fh))
                 if ok:
-                    cards = validated
-                    setattr(db, "cards_catalog", cards)
-                    setattr(db, "cards_catalog_last_fetched", now)
+                    index = publish_catalog(db, CardCatalogIndex(validated))
         except Exception:
-            cards = getattr(db, "cards_catalog", None)
-
-    if cards is None:
-        cards = [
-            {
-                "id": "card-001",
-                "name": "Solar Guard",
-                "description": "Shielded unit of the Solaris Nexus.",
-                "type": "unit",
-                "unitType": "melee",
-                "faction": "solaris",
-                "rarity": "common",
-                "cost": 2,
-                "attack": 2,
-                "health": 3,
-                "abilities": [],
-                "energyCost": 2,
-                "isActive": True,
-                "createdAt": "2025-01-01T00:00:00Z",
-                "updatedAt": "2025-01-01T00:00:00Z",
-            },
-            {
-                "id": "card-002",
-                "name": "Shadow Operative",
-                "description": "Stealth unit of Umbral Eclipse.",
-                "type": "unit",
-                "unitType": "ranged",
-                "faction": "umbral-eclipse",
-                "rarity": "uncommon",
-                "cost": 3,
-                "attack": 3,
-                "health": 2,
-                "abilities": ["Stealth"],
-                "energyCost": 3,
-                "isActive": True,
-                "createdAt": "2025-01-01T00:00:00Z",
-                "updatedAt": "2025-01-01T00:00:00Z",
-            },
-        ]
-        setattr(db, "cards_catalog", cards)
-        setattr(db, "cards_catalog_last_fetched", now)
-    return cards
+            pass
+
+    if index is None:
+        index = publish_catalog(db, CardCatalogIndex(_DEFAULT_CARDS))
+    return index
+
+
+def _cache_control() -> str:
+    """Cache-Control header encouraging brief edge/browser caching."""
+    try:
+        max_age = int(os.environ.get("CARDS_HTTP_CACHE_SEC", "60"))
+    except ValueError:
+        max_age = 60
+    try:
+        swr = int(os.environ.get("CARDS_HTTP_SWR_SEC", "300"))
+    except ValueError:
+        swr = 300
+    return f"public, max-age={max_age}, stale-while-revalidate={swr}"
+
+
+def _etag(index: CardCatalogIndex, key: Tuple[Any, ...]) -> str:
+    """Strong ETag for one response: catalog version plus normalized request key."""
+    digest = hashlib.blake2b(repr(key).encode("utf-8"), digest_size=8).hexdigest()
+    return f'"{index.version}-{digest}"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Evaluate If-None-Match (weak comparison, as RFC 9110 requires for it)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _serialize(content: Any) -> bytes:
+    """Encode JSON exactly as ``JSONResponse`` would."""
+    return _json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _cached_json(
+    request: Request,
+    index: CardCatalogIndex,
+    key: Tuple[Any, ...],
+    build: Callable[[], Any],
+) -> Response:
+    """Serve a JSON body from the per-version cache, honoring If-None-Match.
+
+    A matching validator is answered with 304 before any result is computed;
+    otherwise the body is serialized at most once per catalog version.
+    """
+    etag = _etag(index, key)
+    headers = {"ETag": etag, "Cache-Control": _cache_control()}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    body = index.responses.get(key)
+    if body is None:
+        body = _serialize(build())
+        index.responses.put(key, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _encode_cursor(index: CardCatalogIndex, key: SortKey, pos: int) -> str:
+    """Opaque keyset cursor: catalog version, last sort key and last card id."""
+    raw = _json.dumps(
+        {"v": index.version, "k": list(key), "id": index.cards[pos].get("id")},
+        separators=(",", ":"),
+    ).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, index: CardCatalogIndex, text: Optional[str]) -> SortKey:
+    """Turn a cursor back into the sort key to resume after.
+
+    Cursors minted against an older catalog version are re-anchored on the
+    last card id when it still exists; otherwise the stored key is used as a
+    best-effort resume point.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = _json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        key = tuple(int(k) for k in data["k"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if len(key) != (2 if text else 1):
+        raise HTTPException(status_code=400, detail="Cursor does not match search")
+
+    if data.get("v") != index.version:
+        pos = index.position_of(data.get("id"))
+        if pos is not None:
+            return index.sort_key(pos, text)
+    return key
 
 
 @router.get("/cards/search")
@@ -124,60 +223,139 @@ async def search_cards(
     search: Optional[str] = None,
     page: int = 1,
     pageSize: int = 20,
-) -> JSONResponse:
-    cards = _cards_store(request)
-    results: List[Dict[str, Any]] = []
-    for c in cards:
-        if faction and c.get("faction") != faction:
-            continue
-        if type and c.get("type") != type:
-            continue
-        if rarity and c.get("rarity") != rarity:
-            continue
-        if costMin is not None and int(c.get("cost", 0)) < costMin:
-            continue
-        if costMax is not None and int(c.get("cost", 0)) > costMax:
-            continue
-        if search:
-            s = search.lower()
-            if (
-                s not in str(c.get("name", "")).lower()
-                and s not in str(c.get("description", "")).lower()
-            ):
-                continue
-        results.append(c)
-
-    start = max(0, (page - 1) * pageSize)
-    end = start + pageSize
-    page_items = results[start:end]
-    resp = JSONResponse({
-        "cards": page_items,
-        "total": len(results),
-        "page": page,
-        "pageSize": pageSize,
-    })
-    # Encourage edge/browser caching for brief period to reduce load
-    try:
-        max_age = int(os.environ.get("CARDS_HTTP_CACHE_SEC", "60"))
-    except ValueError:
-        max_age = 60
-    try:
-        swr = int(os.environ.get("CARDS_HTTP_SWR_SEC", "300"))
-    except ValueError:
-        swr = 300
-    resp.headers["Cache-Control"] = (
-        f"public, max-age={max_age}, stale-while-revalidate={swr}"
+    cursor: Optional[str] = None,
+) -> Response:
+    """Search the catalog with offset (page) or keyset (cursor) pagination.
+
+    Every response carries ``nextCursor``; passing it back as ``cursor``
+    resumes right after the last card served, so deep pages cost the same
+    as the first one. ``page`` is ignored when a cursor is supplied.
+    """
+    index = _cards_store(request)
+    # Normalize so equivalent requests share one cache entry and ETag
+    key = (
+        "search", faction or None, type or None, rarity or None,
+        costMin, costMax, (search or "").lower() or None,
+        None if cursor else page, pageSize, cursor or None,
     )
-    return resp
+
+    def build() -> Dict[str, Any]:
+        filters = {
+            "faction": faction,
+            "card_type": type,
+            "rarity": rarity,
+            "cost_min": costMin,
+            "cost_max": costMax,
+            "text": search,
+        }
+        size = max(0, pageSize)
+        after = _decode_cursor(cursor, index, search) if cursor else None
+        skip = 0 if cursor else max(0, (page - 1) * pageSize)
+        # Fetch one extra match to learn whether another page exists
+        matches = list(islice(index.iter_search(**filters, after=after), skip, skip + size + 1))
+        page_matches = matches[:size]
+        next_cursor = None
+        if len(matches) > size and page_matches:
+            next_cursor = _encode_cursor(index, *page_matches[-1])
+        return {
+            "cards": [index.cards[pos] for _, pos in page_matches],
+            "total": index.count(**filters),
+            "page": page,
+            "pageSize": pageSize,
+            "nextCursor": next_cursor,
+        }
+
+    return _cached_json(request, index, key, build)
+
+
+def _ndjson_chunks(cards: List[Dict[str, Any]], compress: bool) -> Iterator[bytes]:
+    """Yield the catalog as NDJSON in bounded chunks, optionally gzip-encoded.
+
+    Only one chunk (plus the compressor window) is held in memory at a time,
+    however large the catalog is.
+    """
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+    buffer: List[bytes] = []
+    buffered = 0
+    for card in cards:
+        line = _serialize(card) + b"\n"
+        buffer.append(line)
+        buffered += len(line)
+        if buffered >= _EXPORT_CHUNK_BYTES:
+            chunk = b"".join(buffer)
+            buffer, buffered = [], 0
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+    chunk = b"".join(buffer)
+    if compressor is not None:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+@router.get("/cards/export")
+async def export_cards(request: Request, gzip: bool = False) -> Response:
+    """Stream the whole catalog as newline-delimited JSON.
+
+    Intended for offline tooling and cache warmers; pass ``gzip=true`` for a
+    gzip-encoded body. The stream reads from the catalog snapshot current at
+    request time, so a concurrent refresh never mixes two versions.
+    """
+    index = _cards_store(request)
+    etag = _etag(index, ("export", gzip))
+    headers = {
+        "ETag": etag,
+        "Cache-Control": _cache_control(),
+        "X-Catalog-Version": index.version,
+    }
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        _ndjson_chunks(index.cards, compress=gzip),
+        media_type="application/x-ndjson",
+        headers=headers,
+    )
+
+
+@router.post("/cards/batch")
+async def get_cards_batch(request: Request) -> JSONResponse:
+    """Resolve many cards in one call.
+
+    Body: { ids: [<card id>, ...] }
+    Returns: { cards: [...], missing: [...] } with cards in request order
+    """
+    try:
+        payload = await request.json()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+
+    ids = payload.get("ids") if isinstance(payload, dict) else None
+    if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+        raise HTTPException(
+            status_code=400,
+            detail="Missing or invalid 'ids' list",
+        )
+    if len(ids) > _BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {_BATCH_MAX_IDS} ids per batch",
+        )
+
+    found, missing = _cards_store(request).get_many(ids)
+    return JSONResponse({"cards": found, "missing": missing})
 
 
 @router.get("/cards/{card_id}")
-async def get_card(card_id: str, request: Request) -> JSONResponse:
-    cards = _cards_store(request)
-    for c in cards:
-        if c.get("id") == card_id:
-            return JSONResponse(c)
-    raise HTTPException(status_code=404, detail="Card not found")
+async def get_card(card_id: str, request: Request) -> Response:
+    index = _cards_store(request)
+    card = index.get(card_id)
+    if card is None:
+        raise HTTPException(status_code=404, detail="Card not found")
+    return _cached_json(request, index, ("card", card_id), lambda: card)
 
 
 @router.get("/users/{user_id}/cards")
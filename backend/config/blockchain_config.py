@@ -26,6 +26,7 @@ class BlockchainNetwork:
     block_time_seconds: Union[int, float]
     confirmation_blocks: int
     max_gas_price_gwei: Optional[int] = None
+    max_concurrent_requests: int = 4
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary."""
@@ -41,6 +42,7 @@ class BlockchainNetwork:
             "block_time_seconds": self.block_time_seconds,
             "confirmation_blocks": self.confirmation_blocks,
             "max_gas_price_gwei": self.max_gas_price_gwei,
+            "max_concurrent_requests": self.max_concurrent_requests,
         }
 
 class BlockchainConfig:
@@ -60,6 +62,7 @@ class BlockchainConfig:
             block_time_seconds=15,
             confirmation_blocks=12,
             max_gas_price_gwei=100,
+            max_concurrent_requests=int(os.environ.get("ETHEREUM_MAINNET_MAX_CONCURRENCY", "4")),
         ),
         "ethereum_testnet": BlockchainNetwork(
             name="ethereum_testnet",
@@ -73,6 +76,7 @@ class BlockchainConfig:
             block_time_seconds=15,
             confirmation_blocks=3,
             max_gas_price_gwei=50,
+            max_concurrent_requests=int(os.environ.get("ETHEREUM_TESTNET_MAX_CONCURRENCY", "4")),
         ),
         "etherlink_mainnet": BlockchainNetwork(
             name="etherlink_mainnet",
@@ -86,6 +90,7 @@ class BlockchainConfig:
             block_time_seconds=5,
             confirmation_blocks=6,
             max_gas_price_gwei=10,
+            max_concurrent_requests=int(os.environ.get("ETHERLINK_MAINNET_MAX_CONCURRENCY", "8")),
         ),
         "etherlink_testnet": BlockchainNetwork(
             name="etherlink_testnet",
@@ -99,6 +104,7 @@ class BlockchainConfig:
             block_time_seconds=5,
             confirmation_blocks=3,
             max_gas_price_gwei=5,
+            max_concurrent_requests=int(os.environ.get("ETHERLINK_TESTNET_MAX_CONCURRENCY", "8")),
         ),
         "solana_mainnet": BlockchainNetwork(
             name="solana_mainnet",
@@ -112,6 +118,7 @@ class BlockchainConfig:
             block_time_seconds=0.4,     # Solana's ~400ms slot time
             confirmation_blocks=32,     # Solana confirmation depth
             max_gas_price_gwei=None,    # Solana doesn't use gas/gwei
+            max_concurrent_requests=int(os.environ.get("SOLANA_MAINNET_MAX_CONCURRENCY", "8")),
         ),
         "solana_testnet": BlockchainNetwork(
             name="solana_testnet",
@@ -125,6 +132,7 @@ class BlockchainConfig:
             block_time_seconds=0.4,
             confirmation_blocks=32,
             max_gas_price_gwei=None,
+            max_concurrent_requests=int(os.environ.get("SOLANA_TESTNET_MAX_CONCURRENCY", "8")),
         ),
     }
 
@@ -242,6 +250,28 @@ class BlockchainConfig:
             results[network_name] = (is_valid, errors)
         return results
 
+    @classmethod
+    def get_max_concurrency(cls, blockchain: str, default: int = 4) -> int:
+        """
+        Get how many operations may run against a blockchain at once.
+
+        Args:
+            blockchain: A network name (e.g., 'ethereum_mainnet') or a blockchain
+                type (e.g., 'ethereum'), which uses the lowest limit of its networks
+
+        Returns:
+            The concurrency limit, or ``default`` for unknown blockchains
+        """
+        network = cls.NETWORKS.get(blockchain)
+        if network is not None:
+            return max(1, network.max_concurrent_requests)
+        limits = [
+            n.max_concurrent_requests
+            for n in cls.NETWORKS.values()
+            if cls.get_blockchain_type_from_network(n.name) == blockchain
+        ]
+        return max(1, min(limits)) if limits else default
+
     @classmethod
     def get_network(cls, network_name: str) -> Optional[BlockchainNetwork]:
         """Get network configuration by name."""
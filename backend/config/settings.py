@@ -119,6 +119,25 @@ class Settings(BaseSettings):
         default=5, description="Maximum retry attempts for failed operations"
     )
 
+    # In-memory database persistence
+    in_memory_db_persistence_dir: Optional[str] = Field(
+        default=None,
+        description="Directory for in-memory DB snapshots and journal (unset disables persistence)",
+    )
+    in_memory_db_fsync_interval: float = Field(
+        default=1.0, description="Seconds between in-memory DB journal flushes and fsyncs"
+    )
+    in_memory_db_snapshot_interval: float = Field(
+        default=300.0, description="Seconds between in-memory DB snapshots"
+    )
+    in_memory_db_columnar_collections: List[str] = Field(
+        default=[],
+        description="In-memory DB collections stored column-wise to reduce memory (e.g. cards)",
+    )
+    in_memory_db_ttl_interval: float = Field(
+        default=60.0, description="Seconds between in-memory DB TTL index sweeps (0 disables them)"
+    )
+
     # Logging
     log_level: str = Field(default="INFO", description="Logging level")
     log_format: str = Field(
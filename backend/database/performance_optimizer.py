@@ -254,6 +254,15 @@ class PerformanceOptimizer:
             ]
         }
 
+        # Indexes hot paths depend on, created regardless of benefit score
+        self.REQUIRED_INDEXES = {
+            "outbox": [
+                {"status": 1, "next_attempt_at": 1},  # Due-entry polling and claims
+                {"status": 1, "lease_expires_at": 1},  # Expired lease reclamation
+                {"outbox_id": 1},  # Entry lookup and status updates
+            ]
+        }
+
     async def analyze_collection_performance(self, collection_name: str) -> CollectionStats:
         """Analyze performance characteristics of a collection."""
         collection = self.database[collection_name]
@@ -417,6 +426,39 @@ class PerformanceOptimizer:
 
         return created_indexes
 
+    async def ensure_required_indexes(
+        self, collection_names: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Create the required indexes that are missing (idempotent).
+
+        Args:
+            collection_names: Collections to cover (default: all in REQUIRED_INDEXES)
+
+        Returns:
+            The indexes created
+        """
+        created_indexes = []
+        for collection_name in collection_names or list(self.REQUIRED_INDEXES):
+            collection = self.database[collection_name]
+            for index_spec in self.REQUIRED_INDEXES.get(collection_name, []):
+                try:
+                    start_time = time.time()
+                    await collection.create_index(
+                        list(index_spec.items()),
+                        background=True,
+                        name=self._generate_index_name(index_spec),
+                    )
+                    created_indexes.append({
+                        "collection": collection_name,
+                        "index_spec": index_spec,
+                        "creation_time": time.time() - start_time,
+                    })
+                except Exception as e:
+                    logger.error(f"Failed to create required index {index_spec} on {collection_name}: {e}")
+
+        return created_indexes
+
     async def optimize_all_collections(self) -> Dict[str, Any]:
         """Run optimization on all known collections."""
         collections = ["users", "cards", "decks", "games", "blockchain_transactions"]
@@ -425,6 +467,7 @@ class PerformanceOptimizer:
             "collection_stats": {},
             "index_recommendations": {},
             "created_indexes": {},
+            "required_indexes": await self.ensure_required_indexes(),
             "performance_summary": {}
         }
 
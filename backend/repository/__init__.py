@@ -7,13 +7,14 @@ consistent data access across the application.
 """
 
 from .outbox_models import OutboxEntry, OutboxStatus, OutboxType
-from .transaction_outbox import TransactionOutboxRepository
+from .transaction_outbox import AsyncTransactionOutboxRepository, TransactionOutboxRepository
 
 __all__ = [
     "OutboxEntry",
     "OutboxStatus",
     "OutboxType",
-    "TransactionOutboxRepository"
+    "TransactionOutboxRepository",
+    "AsyncTransactionOutboxRepository",
 ]
 
 # Version info
@@ -7,7 +7,9 @@ import inspect
 import logging
 import uuid
 from typing import Any, Callable, Dict, List, Optional, TypeVar, cast
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
 
 from .outbox_models import OutboxStatus, OutboxType
 
@@ -79,6 +81,8 @@ class _OutboxEntryCompat:
     max_attempts: int
     result: Optional[Dict[str, Any]]
     last_error: Optional[str]
+    lease_owner: Optional[str]
+    lease_expires_at: Optional[datetime]
 
     def __init__(self, data: Dict[str, Any]):
         if data is None:
@@ -98,6 +102,8 @@ class _OutboxEntryCompat:
         self.result = cast(Optional[Dict[str, Any]], data.get("result"))
         last_error_value = data.get("last_error")
         self.last_error = None if last_error_value is None else str(last_error_value)
+        self.lease_owner = cast(Optional[str], data.get("lease_owner"))
+        self.lease_expires_at = cast(Optional[datetime], data.get("lease_expires_at"))
 
     @staticmethod
     def _require(d: Dict[str, Any], key: str) -> Any:
@@ -107,6 +113,149 @@ class _OutboxEntryCompat:
         return d[key]
 
 
+def _new_entry_document(
+    outbox_type: OutboxType, request_data: Dict[str, Any], max_attempts: int
+) -> Dict[str, Any]:
+    """Build the document stored for a new pending outbox entry."""
+    now = datetime.now(timezone.utc)
+    return {
+        "outbox_id": str(uuid.uuid4()),  # guaranteed unique id
+        "outbox_type": (
+            outbox_type.value
+            if isinstance(outbox_type, OutboxType)
+            else outbox_type
+        ),
+        "status": OutboxStatus.PENDING.value,
+        "request_data": request_data,
+        "created_at": now,
+        "updated_at": now,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "next_attempt_at": now,
+    }
+
+
+def _completed_update(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Update document marking an entry completed with its result and releasing its lease."""
+    return {
+        "$set": {
+            "status": OutboxStatus.COMPLETED.value,
+            "result": result,
+            "updated_at": datetime.now(timezone.utc),
+            "lease_owner": None,
+            "lease_expires_at": None,
+        }
+    }
+
+
+def _failed_update(error: str) -> Dict[str, Any]:
+    """Update document marking an entry failed and releasing its lease."""
+    return {
+        "$set": {
+            "status": OutboxStatus.FAILED.value,
+            "last_error": error,
+            "updated_at": datetime.now(timezone.utc),
+            "lease_owner": None,
+            "lease_expires_at": None,
+        }
+    }
+
+
+def _manual_review_update(error: str, result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Update document parking an entry for manual review and releasing its lease.
+
+    The operation's result goes to ``review_result``, so a completion another
+    worker already recorded is never overwritten.
+    """
+    return {
+        "$set": {
+            "status": OutboxStatus.MANUAL_REVIEW.value,
+            "last_error": error,
+            "review_result": result,
+            "updated_at": datetime.now(timezone.utc),
+            "lease_owner": None,
+            "lease_expires_at": None,
+        }
+    }
+
+
+def _retry_update(next_attempt_at: datetime) -> Dict[str, Any]:
+    """Update document returning an entry to pending until ``next_attempt_at``."""
+    return {
+        "$set": {
+            "status": OutboxStatus.PENDING.value,
+            "next_attempt_at": next_attempt_at,
+            "updated_at": datetime.now(timezone.utc),
+            "lease_owner": None,
+            "lease_expires_at": None,
+        }
+    }
+
+
+def _attempt_update(error: Optional[str]) -> Dict[str, Any]:
+    """Update document recording one more processing attempt."""
+    set_doc: Dict[str, Any] = {"updated_at": datetime.now(timezone.utc)}
+    if error is not None:
+        set_doc["last_error"] = error
+    return {"$inc": {"attempts": 1}, "$set": set_doc}
+
+
+def _due_clauses(now: datetime) -> List[Dict[str, Any]]:
+    """$or clauses matching pending entries whose next attempt is due (uses {status, next_attempt_at})."""
+    return [
+        {"status": OutboxStatus.PENDING.value, "next_attempt_at": {"$lte": now}},
+        # Entries written before retries were scheduled have no next_attempt_at
+        {"status": OutboxStatus.PENDING.value, "next_attempt_at": {"$exists": False}},
+    ]
+
+
+def _expired_lease_filter(now: datetime) -> Dict[str, Any]:
+    """Filter for processing entries whose worker let the lease expire (uses {status, lease_expires_at})."""
+    return {"status": OutboxStatus.PROCESSING.value, "lease_expires_at": {"$lt": now}}
+
+
+def _entry_filter(outbox_id: str, worker_id: Optional[str]) -> Dict[str, Any]:
+    """Filter for one entry, fenced to its lease owner when ``worker_id`` is given."""
+    if worker_id is None:
+        return {"outbox_id": outbox_id}
+    return {"outbox_id": outbox_id, "lease_owner": worker_id}
+
+
+_STATS_STATUSES = ("pending", "processing", "completed", "failed")
+
+# Callbacks run after any repository in this process creates an entry
+_entry_created_callbacks: List[Callable[[], None]] = []
+
+
+def add_entry_created_callback(callback: Callable[[], None]) -> None:
+    """Register a callback run (on the creating thread) after each create_entry."""
+    _entry_created_callbacks.append(callback)
+
+
+def remove_entry_created_callback(callback: Callable[[], None]) -> None:
+    """Unregister a callback added with add_entry_created_callback."""
+    try:
+        _entry_created_callbacks.remove(callback)
+    except ValueError:
+        pass
+
+
+def _notify_entry_created() -> None:
+    """Run the entry-created callbacks; a failing callback never fails the insert."""
+    for callback in list(_entry_created_callbacks):
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Error in outbox entry-created callback: {e}")
+
+
+async def _resolve(value: Any) -> Any:
+    """Await a value if it is awaitable (Motor's find() is sync, the in-memory one async)."""
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
 class TransactionOutboxRepository:
     """Repository for managing transaction outbox entries (sync API for tests)."""
 
@@ -151,21 +300,7 @@ class TransactionOutboxRepository:
         max_attempts: int = 5,
     ) -> _OutboxEntryCompat:
         """Create a new outbox entry (sync)."""
-        now = datetime.now(timezone.utc)
-        entry_doc = {
-            "outbox_id": str(uuid.uuid4()),  # guaranteed unique id
-            "outbox_type": (
-                outbox_type.value
-                if isinstance(outbox_type, OutboxType)
-                else outbox_type
-            ),
-            "status": OutboxStatus.PENDING.value,
-            "request_data": request_data,
-            "created_at": now,
-            "updated_at": now,
-            "attempts": 0,
-            "max_attempts": max_attempts,
-        }
+        entry_doc = _new_entry_document(outbox_type, request_data, max_attempts)
 
         try:
             # Use sync_bridge for both in-memory and MongoDB collections
@@ -179,6 +314,7 @@ class TransactionOutboxRepository:
             logger.error(f"Error inserting outbox entry: {e}")
             raise  # Re-raise to maintain original behavior
 
+        _notify_entry_created()
         return _OutboxEntryCompat(entry_doc)
 
     def get_by_id(self, outbox_id: str) -> Optional[_OutboxEntryCompat]:
@@ -205,15 +341,15 @@ class TransactionOutboxRepository:
             return None
 
     def get_pending(self, limit: int = 100) -> List[_OutboxEntryCompat]:
-        """Get entries ready for processing (sync)."""
+        """Get pending entries whose next attempt is due (sync)."""
         limit_value = max(0, int(limit))
         if limit_value == 0:
             return []
 
         try:
-            # Use a consistent approach for both in-memory and MongoDB
+            # Only entries whose scheduled retry is due
             cursor = sync_bridge(
-                self.collection.find, {"status": OutboxStatus.PENDING.value}
+                self.collection.find, {"$or": _due_clauses(datetime.now(timezone.utc))}
             )
 
             # Apply limit if cursor supports it
@@ -237,16 +373,8 @@ class TransactionOutboxRepository:
         """Mark entry as completed (sync)."""
         try:
             # Use update_one consistently for both in-memory and MongoDB
-            update_data = {
-                "$set": {
-                    "status": OutboxStatus.COMPLETED.value,
-                    "result": result,
-                    "updated_at": datetime.now(timezone.utc),
-                }
-            }
-
             sync_bridge(
-                self.collection.update_one, {"outbox_id": outbox_id}, update_data
+                self.collection.update_one, {"outbox_id": outbox_id}, _completed_update(result)
             )
 
         except Exception as e:
@@ -256,16 +384,8 @@ class TransactionOutboxRepository:
         """Mark entry as failed (sync)."""
         try:
             # Use update_one consistently for both in-memory and MongoDB
-            update_data = {
-                "$set": {
-                    "status": OutboxStatus.FAILED.value,
-                    "last_error": error,
-                    "updated_at": datetime.now(timezone.utc),
-                }
-            }
-
             sync_bridge(
-                self.collection.update_one, {"outbox_id": outbox_id}, update_data
+                self.collection.update_one, {"outbox_id": outbox_id}, _failed_update(error)
             )
 
         except Exception as e:
@@ -275,18 +395,22 @@ class TransactionOutboxRepository:
         """Increment attempt counter (sync)."""
         try:
             # Use update_one consistently for both in-memory and MongoDB
-            set_doc: Dict[str, Any] = {"updated_at": datetime.now(timezone.utc)}
-            if error is not None:
-                set_doc["last_error"] = error
+            sync_bridge(
+                self.collection.update_one, {"outbox_id": outbox_id}, _attempt_update(error)
+            )
 
-            update_data: Dict[str, Any] = {"$inc": {"attempts": 1}, "$set": set_doc}
+        except Exception as e:
+            logger.error(f"Error in increment_attempts: {e}")
 
+    def schedule_retry(self, outbox_id: str, next_attempt_at: datetime) -> None:
+        """Return entry to pending, due again at ``next_attempt_at`` (sync)."""
+        try:
             sync_bridge(
-                self.collection.update_one, {"outbox_id": outbox_id}, update_data
+                self.collection.update_one, {"outbox_id": outbox_id}, _retry_update(next_attempt_at)
             )
 
         except Exception as e:
-            logger.error(f"Error in increment_attempts: {e}")
+            logger.error(f"Error in schedule_retry: {e}")
 
     def get_processing_stats(self) -> Dict[str, int]:
         """Get processing statistics (sync)."""
@@ -320,3 +444,251 @@ class TransactionOutboxRepository:
         except Exception as e:
             logger.error(f"Error getting processing stats: {e}")
             return stats
+
+
+class AsyncTransactionOutboxRepository:
+    """
+    Repository for managing transaction outbox entries (native async API).
+
+    Calls are awaited directly on the application's database handle, so
+    with Motor they share the app's client, connection pool and event
+    loop instead of spinning up a loop per call like sync_bridge.
+    """
+
+    def __init__(self, db: Any) -> None:
+        self.collection = db.outbox
+
+    async def create_entry(
+        self,
+        outbox_type: OutboxType,
+        request_data: Dict[str, Any],
+        max_attempts: int = 5,
+    ) -> _OutboxEntryCompat:
+        """Create a new outbox entry."""
+        entry_doc = _new_entry_document(outbox_type, request_data, max_attempts)
+        try:
+            await self.collection.insert_one(entry_doc)
+        except Exception as e:
+            logger.error(f"Error inserting outbox entry: {e}")
+            raise
+        _notify_entry_created()
+        return _OutboxEntryCompat(entry_doc)
+
+    async def get_by_id(self, outbox_id: str) -> Optional[_OutboxEntryCompat]:
+        """Get entry by ID."""
+        try:
+            doc = await self.collection.find_one({"outbox_id": outbox_id})
+            return _OutboxEntryCompat(dict(doc)) if doc else None
+        except Exception as e:
+            logger.error(f"Error in get_by_id: {e}")
+            return None
+
+    async def get_pending(self, limit: int = 100) -> List[_OutboxEntryCompat]:
+        """Get pending entries whose next attempt is due."""
+        limit_value = max(0, int(limit))
+        if limit_value == 0:
+            return []
+
+        try:
+            cursor = await _resolve(
+                self.collection.find({"$or": _due_clauses(datetime.now(timezone.utc))})
+            )
+            docs = await cursor.limit(limit_value).to_list(limit_value)
+            return [_OutboxEntryCompat(dict(doc)) for doc in docs]
+        except Exception as e:
+            logger.error(f"Error getting pending entries: {e}")
+            return []
+
+    async def claim_batch(
+        self, worker_id: str, limit: int = 10, lease_seconds: float = 300
+    ) -> List[_OutboxEntryCompat]:
+        """
+        Atomically claim up to ``limit`` entries for one worker.
+
+        Each entry is moved to processing with a single find_one_and_update,
+        so concurrent workers never claim the same entry. Entries left in
+        processing by a worker whose lease expired (e.g. it crashed) are
+        reclaimed first; the lost run counts as an attempt, so an entry
+        that keeps killing or hanging its worker is marked failed once it
+        reaches max_attempts instead of being reclaimed forever. Pending
+        entries rescheduled by schedule_retry wait until next_attempt_at.
+
+        Args:
+            worker_id: Unique id of the claiming worker, recorded as lease owner
+            limit: Maximum number of entries to claim
+            lease_seconds: How long the claim lasts before others may reclaim it
+
+        Returns:
+            The claimed entries: reclaimed ones first, then earliest due
+
+        Raises:
+            Exception: The database error, if it struck before any entry was
+                claimed; entries already claimed are returned instead
+        """
+        limit_value = max(0, int(limit))
+        claimed: List[_OutboxEntryCompat] = []
+        reclaiming = True
+        try:
+            while len(claimed) < limit_value:
+                now = datetime.now(timezone.utc)
+                lease = {
+                    "status": OutboxStatus.PROCESSING.value,
+                    "lease_owner": worker_id,
+                    "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                    "updated_at": now,
+                }
+                doc = None
+                if reclaiming:
+                    doc = await self.collection.find_one_and_update(
+                        _expired_lease_filter(now),
+                        {
+                            "$set": {**lease, "last_error": "Lease expired before processing finished"},
+                            "$inc": {"attempts": 1},
+                        },
+                        sort=[("lease_expires_at", 1)],
+                        return_document=ReturnDocument.AFTER,
+                    )
+                    reclaiming = doc is not None
+                if doc is not None:
+                    entry = _OutboxEntryCompat(dict(doc))
+                    logger.warning(
+                        f"Reclaimed outbox {entry.outbox_id} after an expired lease "
+                        f"(attempt {entry.attempts}/{entry.max_attempts})"
+                    )
+                    if entry.attempts >= entry.max_attempts:
+                        await self.mark_failed(
+                            entry.outbox_id, "Lease expired on the final attempt", worker_id=worker_id
+                        )
+                    else:
+                        claimed.append(entry)
+                    continue
+
+                doc = await self.collection.find_one_and_update(
+                    {"$or": _due_clauses(now)},
+                    {"$set": lease},
+                    # Served by the {status, next_attempt_at} index
+                    sort=[("next_attempt_at", 1)],
+                    return_document=ReturnDocument.AFTER,
+                )
+                if doc is None:
+                    break
+                claimed.append(_OutboxEntryCompat(dict(doc)))
+        except Exception as e:
+            logger.error(f"Error claiming outbox entries for {worker_id}: {e}")
+            if not claimed:
+                raise
+        return claimed
+
+    async def renew_lease(self, outbox_id: str, worker_id: str, lease_seconds: float) -> bool:
+        """
+        Extend ``worker_id``'s lease on a processing entry.
+
+        Returns:
+            False if the lease was lost (reclaimed by another worker) or the update failed
+        """
+        try:
+            now = datetime.now(timezone.utc)
+            result = await self.collection.update_one(
+                {
+                    "outbox_id": outbox_id,
+                    "lease_owner": worker_id,
+                    "status": OutboxStatus.PROCESSING.value,
+                },
+                {"$set": {
+                    "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                    "updated_at": now,
+                }},
+            )
+            return getattr(result, "matched_count", 0) > 0
+        except Exception as e:
+            logger.error(f"Error renewing lease on outbox {outbox_id}: {e}")
+            return False
+
+    async def _fenced_update(
+        self, outbox_id: str, update: Dict[str, Any], worker_id: Optional[str], action: str
+    ) -> bool:
+        """
+        Apply an update, skipping it if ``worker_id`` no longer holds the lease.
+
+        Returns:
+            False if the lease was lost, no entry matched, or the update failed
+        """
+        try:
+            result = await self.collection.update_one(_entry_filter(outbox_id, worker_id), update)
+        except Exception as e:
+            logger.error(f"Error in {action}: {e}")
+            return False
+        if getattr(result, "matched_count", 1) == 0:
+            if worker_id is not None:
+                logger.warning(
+                    f"Skipped {action} for outbox {outbox_id}: lease no longer held by {worker_id}"
+                )
+            return False
+        return True
+
+    async def mark_completed(
+        self, outbox_id: str, result: Dict[str, Any], worker_id: Optional[str] = None
+    ) -> bool:
+        """Mark entry as completed (only while ``worker_id`` holds its lease, if given).
+
+        Returns:
+            True if the completion was recorded
+        """
+        return await self._fenced_update(
+            outbox_id, _completed_update(result), worker_id, "mark_completed"
+        )
+
+    async def mark_failed(
+        self, outbox_id: str, error: str, worker_id: Optional[str] = None
+    ) -> bool:
+        """Mark entry as failed (only while ``worker_id`` holds its lease, if given)."""
+        return await self._fenced_update(outbox_id, _failed_update(error), worker_id, "mark_failed")
+
+    async def mark_manual_review(
+        self, outbox_id: str, error: str, result: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """
+        Park an entry for manual review, whoever holds its lease.
+
+        Used when an operation ran but its outcome could not be recorded
+        under the lease, so no worker retries it automatically.
+
+        Returns:
+            True if the entry was updated
+        """
+        return await self._fenced_update(
+            outbox_id, _manual_review_update(error, result), None, "mark_manual_review"
+        )
+
+    async def increment_attempts(
+        self, outbox_id: str, error: Optional[str] = None, worker_id: Optional[str] = None
+    ) -> bool:
+        """Increment attempt counter (only while ``worker_id`` holds its lease, if given)."""
+        return await self._fenced_update(
+            outbox_id, _attempt_update(error), worker_id, "increment_attempts"
+        )
+
+    async def schedule_retry(
+        self, outbox_id: str, next_attempt_at: datetime, worker_id: Optional[str] = None
+    ) -> bool:
+        """Release an entry back to pending, claimable again from ``next_attempt_at``."""
+        return await self._fenced_update(
+            outbox_id, _retry_update(next_attempt_at), worker_id, "schedule_retry"
+        )
+
+    async def get_processing_stats(self) -> Dict[str, int]:
+        """Get processing statistics with one $group query instead of a count per status."""
+        stats = {status: 0 for status in _STATS_STATUSES}
+        try:
+            cursor = self.collection.aggregate([
+                {"$match": {"status": {"$in": [
+                    getattr(OutboxStatus, status.upper()).value for status in _STATS_STATUSES
+                ]}}},
+                {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+            ])
+            for row in await cursor.to_list(None):
+                stats[row["_id"]] = int(row["count"])
+            return stats
+        except Exception as e:
+            logger.error(f"Error getting processing stats: {e}")
+            return stats
@@ -0,0 +1,161 @@
+"""
+Contention benchmark for the in-memory database.
+
+Runs concurrent reader and writer tasks against an InMemoryCollection and
+reports read latency percentiles and throughput, twice:
+
+- "rwlock": the collection as shipped (lock-free find/count_documents,
+  reader/writer lock for writes)
+- "serialized": every operation funnelled through one asyncio.Lock, the
+  way count_documents and writes used to queue behind a single collection
+  lock while a writer held it
+
+It also measures InMemoryDB collection lookups from several threads, the
+path that previously took a global RLock on every access.
+
+Run:
+  python backend/scripts/bench_in_memory_db.py [--docs 20000] [--readers 64] [--writers 4]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from backend.shared.db import InMemoryCollection, InMemoryDB  # noqa: E402
+
+STATUSES = ["pending", "processing", "completed", "failed"]
+
+
+async def build_collection(docs: int) -> InMemoryCollection:
+    collection = InMemoryCollection("bench_outbox")
+    await collection.create_index("status")
+    await collection.create_index("outbox_id", unique=True)
+    await collection.insert_many([
+        {"outbox_id": f"ob-{i}", "status": random.choice(STATUSES), "attempts": random.randint(0, 5)}
+        for i in range(docs)
+    ])
+    return collection
+
+
+async def run_load(
+    collection: InMemoryCollection,
+    readers: int,
+    writers: int,
+    duration: float,
+    serialize: bool,
+) -> Dict[str, Any]:
+    """Run readers and writers for ``duration`` seconds and collect read latencies."""
+    lock = asyncio.Lock()
+    stop = time.perf_counter() + duration
+    latencies: List[float] = []
+    writes = 0
+
+    async def guarded(operation: Callable[[], Awaitable[Any]]) -> Any:
+        if not serialize:
+            return await operation()
+        async with lock:
+            return await operation()
+
+    async def reader() -> None:
+        rng = random.Random()
+        while time.perf_counter() < stop:
+            status = rng.choice(STATUSES)
+            started = time.perf_counter()
+            if rng.random() < 0.5:
+                await guarded(lambda: collection.count_documents({"status": status}))
+            else:
+                cursor = await guarded(lambda: collection.find({"status": status}))
+                await cursor.limit(20).to_list(None)
+            latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0)
+
+    async def writer() -> None:
+        nonlocal writes
+        rng = random.Random()
+        while time.perf_counter() < stop:
+            outbox_id = f"ob-{rng.randrange(len(collection._by_id))}"
+            # A claim-then-complete batch that holds the write lock across
+            # an await, like a handler doing I/O inside batch_operations()
+            async with (lock if serialize else collection):
+                await collection.update_one({"outbox_id": outbox_id}, {"$set": {"status": "processing"}})
+                await asyncio.sleep(0.001)
+                await collection.update_one({"outbox_id": outbox_id}, {"$set": {"status": "completed"}})
+            writes += 2
+            await asyncio.sleep(0.001)
+
+    await asyncio.gather(*[reader() for _ in range(readers)], *[writer() for _ in range(writers)])
+
+    latencies.sort()
+    return {
+        "reads_per_sec": len(latencies) / duration,
+        "writes_per_sec": writes / duration,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0,
+    }
+
+
+def bench_lookups(threads: int, lookups: int, locked: bool) -> float:
+    """Return collection lookups per second across ``threads`` threads."""
+    db = InMemoryDB()
+    names = [f"collection_{i}" for i in range(16)]
+    for name in names:
+        db[name]
+
+    def work() -> None:
+        for i in range(lookups):
+            if locked:
+                # What every lookup used to pay
+                with db._lock:
+                    db[names[i % len(names)]]
+            else:
+                db[names[i % len(names)]]
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return threads * lookups / (time.perf_counter() - started)
+
+
+async def main(args: argparse.Namespace) -> None:
+    print(
+        f"{args.docs} documents, {args.readers} readers, {args.writers} writers, "
+        f"{args.duration:.1f}s per run"
+    )
+    for serialize in (True, False):
+        collection = await build_collection(args.docs)
+        result = await run_load(collection, args.readers, args.writers, args.duration, serialize)
+        label = "serialized" if serialize else "rwlock"
+        print(
+            f"{label:>10}: {result['reads_per_sec']:9.0f} reads/s  "
+            f"{result['writes_per_sec']:7.0f} writes/s  "
+            f"p50 {result['p50_ms']:7.3f} ms  p99 {result['p99_ms']:7.3f} ms"
+        )
+    for locked in (True, False):
+        rate = bench_lookups(args.threads, args.lookups, locked)
+        label = "locked" if locked else "lock-free"
+        print(f"{label:>10}: {rate:,.0f} collection lookups/s across {args.threads} threads")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20_000)
+    parser.add_argument("--readers", type=int, default=64)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    asyncio.run(main(parser.parse_args()))
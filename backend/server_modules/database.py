@@ -8,6 +8,7 @@ import logging
 from typing import Any
 
 # Import from shared module
+from backend.shared.db.persistence import DatabasePersistence
 from backend.shared.in_memory_db import InMemoryDB
 
 logger = logging.getLogger(__name__)
@@ -28,6 +29,39 @@ class DatabaseConfig:
             "max_idle_time": getattr(settings, "db_max_idle_time", 300000),  # 5 minutes
         }
 
+def create_in_memory_db(settings: Any) -> InMemoryDB:
+    """
+    Create an in-memory database, with snapshot/journal persistence and
+    columnar collections if configured.
+
+    State is loaded, and the TTL sweeper started, when the database is
+    opened during application startup.
+
+    Args:
+        settings: Application settings
+
+    Returns:
+        In-memory database
+    """
+    collection_storage = {
+        name: "columnar" for name in getattr(settings, "in_memory_db_columnar_collections", None) or []
+    }
+    ttl_interval = getattr(settings, "in_memory_db_ttl_interval", 60.0)
+    persistence_dir = getattr(settings, "in_memory_db_persistence_dir", None)
+    if not persistence_dir:
+        return InMemoryDB(collection_storage=collection_storage, ttl_interval=ttl_interval)
+
+    logger.info(f"In-memory database persistence enabled at {persistence_dir}")
+    return InMemoryDB(
+        persistence=DatabasePersistence(
+            persistence_dir,
+            fsync_interval=getattr(settings, "in_memory_db_fsync_interval", 1.0),
+            snapshot_interval=getattr(settings, "in_memory_db_snapshot_interval", 300.0),
+        ),
+        collection_storage=collection_storage,
+        ttl_interval=ttl_interval,
+    )
+
 def setup_database(settings: Any) -> Any:
     """
     Set up and configure the database connection with environment-specific optimizations.
@@ -43,7 +77,7 @@ def setup_database(settings: Any) -> Any:
 
     if use_in_memory:
         logger.info(f"Using in-memory database for {env} environment")
-        return InMemoryDB()
+        return create_in_memory_db(settings)
 
     # Get database configuration
     db_config = DatabaseConfig.get_connection_params(settings)
@@ -83,14 +117,14 @@ def setup_database(settings: Any) -> Any:
             # For now, fall back to in-memory for non-production
             if env not in {"prod", "production"}:
                 logger.warning("MongoDB configuration found but using in-memory database for development")
-                return InMemoryDB()
+                return create_in_memory_db(settings)
 
         # For now, return in-memory DB as placeholder (non-prod only)
         if env in {"prod", "production"}:
             raise RuntimeError("Real DB not configured; refusing in-memory fallback in production")
 
         logger.warning(f"Using in-memory database (placeholder for actual DB connection) in {env}")
-        return InMemoryDB()
+        return create_in_memory_db(settings)
 
     except Exception as e:
         logger.error(f"Failed to connect to database: {e}")
@@ -101,4 +135,4 @@ def setup_database(settings: Any) -> Any:
             raise
 
         logger.warning("Falling back to in-memory database")
-        return InMemoryDB()
\ No newline at end of file
+        return create_in_memory_db(settings)
\ No newline at end of file
@@ -28,6 +28,7 @@ class LifecycleManager:
         self.blockchain_service = blockchain_service
         self.outbox_processor = outbox_processor
         self.db = db
+        self.card_catalog_refresher: Any = None
 
     async def startup(self, fail_fast: bool = True) -> None:
         """
@@ -39,6 +40,9 @@ class LifecycleManager:
         logger.info("Starting Crisis Unleashed Backend...")
 
         try:
+            # Restore persisted in-memory state before services read it
+            await self._open_database()
+
             # Import here to avoid circular imports
             from backend.server_modules.services import start_services
 
@@ -50,6 +54,8 @@ class LifecycleManager:
                 fail_fast=fail_fast,
             )
 
+            await self._start_card_catalog_refresher()
+
             logger.info("🚀 Crisis Unleashed Backend started successfully!")
 
         except Exception as e:
@@ -99,6 +105,7 @@ class LifecycleManager:
         # Define shutdown sequence with proper dependencies
         shutdown_tasks = [
             ("health manager", self._stop_health_manager),
+            ("card catalog refresher", self._stop_card_catalog_refresher),
             ("outbox processor", self._stop_outbox_processor),
             ("database", self._close_database),
         ]
@@ -126,6 +133,31 @@ class LifecycleManager:
         if self.health_manager:
             await self.health_manager.stop()
 
+    async def _open_database(self) -> None:
+        """Load persisted state into an in-memory database and start its TTL sweeper."""
+        # Import here to avoid circular imports
+        from backend.shared.db import InMemoryDB
+
+        if isinstance(self.db, InMemoryDB):
+            await self.db.open()
+
+    async def _start_card_catalog_refresher(self) -> None:
+        """Start background refresh of a remote card catalog, if configured."""
+        if self.db is None:
+            return
+
+        # Import here to avoid circular imports
+        from backend.shared.card_catalog import CardCatalogRefresher
+
+        self.card_catalog_refresher = CardCatalogRefresher.from_env(self.db)
+        if self.card_catalog_refresher:
+            await self.card_catalog_refresher.start()
+
+    async def _stop_card_catalog_refresher(self) -> None:
+        """Stop card catalog refresher."""
+        if self.card_catalog_refresher:
+            await self.card_catalog_refresher.stop()
+
     async def _stop_outbox_processor(self) -> None:
         """Stop outbox processor service."""
         if self.outbox_processor:
@@ -137,17 +169,10 @@ class LifecycleManager:
             return
 
         if hasattr(self.db, 'close'):
-            # Check if it's not an in-memory database
-            is_in_memory = (
-                hasattr(self.db, 'outbox')
-                and hasattr(self.db.outbox, '__class__')
-                and 'InMemoryCollection' in self.db.outbox.__class__.__name__
-            )
-            if not is_in_memory:
-                await self.db.close()
-                logger.debug("Database connection closed")
-            else:
-                logger.debug("In-memory database detected, skipping close()")
+            # In-memory databases also stop the TTL sweeper here, and flush the
+            # journal and write a final snapshot when persistent
+            await self.db.close()
+            logger.debug("Database connection closed")
         else:
             logger.debug("Database object has no close() method, skipping")
 
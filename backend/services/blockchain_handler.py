@@ -2,21 +2,26 @@
 Blockchain Handler for processing outbox entries.
 """
 
+import asyncio
 import logging
 import random
-import time
-from typing import Any, Dict, List, TypedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, TypedDict, Union
 
 try:
     # Absolute imports rooted at 'backend'
+    from backend.config.blockchain_config import BlockchainConfig
     from backend.repository import (
+        AsyncTransactionOutboxRepository,
         OutboxType,
         TransactionOutboxRepository,
     )
     from backend.services.blockchain_service import BlockchainService
 except ImportError:
     # Fallback to relative imports (works when run from source tree)
+    from ..config.blockchain_config import BlockchainConfig
     from ..repository import (
+        AsyncTransactionOutboxRepository,
         OutboxType,
         TransactionOutboxRepository,
     )
@@ -26,6 +31,11 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 
+class LeaseLostError(RuntimeError):
+    """Raised when a claimed entry's lease is lost before its operation ran."""
+    pass
+
+
 class ErrorItem(TypedDict):
     """Type definition for error items in processing results."""
 
@@ -34,15 +44,32 @@ class ErrorItem(TypedDict):
 
 
 class BlockchainHandler:
-    """Handles blockchain operations for outbox entries using the modular service."""
+    """
+    Handles blockchain operations for outbox entries using the modular service.
+
+    process_pending_entries() drives a sync TransactionOutboxRepository;
+    process_pending_entries_async() drives an AsyncTransactionOutboxRepository,
+    awaiting repository calls on the caller's loop and running only the
+    blocking blockchain calls in worker threads. Async entries run
+    concurrently, at most BlockchainConfig.get_max_concurrency() at a time
+    per blockchain. On both paths a failed entry is rescheduled through
+    next_attempt_at rather than slept on.
+    """
+
+    # Retry backoff: exponential from base_delay, capped, with +/- jitter
+    base_delay = 0.5  # seconds
+    max_delay = 30.0  # seconds cap
+    jitter = 0.2      # +/-20%
 
     def __init__(
         self,
-        outbox_repo: TransactionOutboxRepository,
+        outbox_repo: Union[TransactionOutboxRepository, AsyncTransactionOutboxRepository],
         blockchain_service: BlockchainService,
     ):
         self.outbox_repo = outbox_repo
         self.blockchain_service = blockchain_service
+        # One semaphore per blockchain, created on first use
+        self._chain_limits: Dict[str, asyncio.Semaphore] = {}
 
     # Add this helper alongside other private methods in the class
     def _get_entry_id(self, entry: Any) -> str:
@@ -64,7 +91,7 @@ class BlockchainHandler:
         for entry in entries:
             entry_id = self._get_entry_id(entry)
             try:
-                self._process_with_retry(entry)
+                self._attempt_entry(entry)
                 successful += 1
             except Exception as e:
                 logger.error(f"Failed to process entry {entry_id}: {e}")
@@ -84,80 +111,249 @@ class BlockchainHandler:
         )
         return results
 
-    def _process_entry(self, entry: Any) -> None:
-        """Process a single outbox entry (sync)."""
+    async def process_pending_entries_async(
+        self,
+        max_entries: int = 50,
+        worker_id: Optional[str] = None,
+        lease_seconds: float = 300,
+    ) -> Dict[str, Any]:
+        """
+        Process pending outbox entries through an async repository.
+
+        With a ``worker_id`` the entries are claimed under a lease first, so
+        several processors can share one outbox without executing an entry
+        twice, and every status update is fenced to the lease owner.
+
+        Args:
+            max_entries: Maximum number of entries to process
+            worker_id: Unique id of this processor; claims entries when given
+            lease_seconds: Lease length for claimed entries
+        Returns:
+            Processing results summary
+        """
+        if worker_id is not None:
+            entries = await self.outbox_repo.claim_batch(
+                worker_id, limit=max_entries, lease_seconds=lease_seconds
+            )
+        else:
+            entries = await self.outbox_repo.get_pending(limit=max_entries)
+        outcomes = await asyncio.gather(
+            *(self.process_entry_async(entry, worker_id, lease_seconds) for entry in entries),
+            return_exceptions=True,
+        )
+        errors: List[ErrorItem] = []
+        skipped = 0
+        for entry, outcome in zip(entries, outcomes):
+            if isinstance(outcome, LeaseLostError):
+                skipped += 1
+            elif isinstance(outcome, Exception):
+                entry_id = self._get_entry_id(entry)
+                logger.error(f"Failed to process entry {entry_id}: {outcome}")
+                errors.append({"entry_id": entry_id, "error": str(outcome)})
+
+        results = {
+            "total_processed": len(entries),
+            "successful": len(entries) - len(errors) - skipped,
+            "failed": len(errors),
+            "skipped": skipped,
+            "errors": errors,
+        }
+        logger.info(
+            f"Processed {results['total_processed']} entries: "
+            f"{results['successful']} successful, {results['failed']} failed, "
+            f"{results['skipped']} skipped"
+        )
+        return results
+
+    def _execute(self, entry: Any) -> Dict[str, Any]:
+        """Run an entry's blockchain operation and return its completion result (blocking)."""
         entry_id = self._get_entry_id(entry)
         entry_type = getattr(entry, 'outbox_type', getattr(entry, 'type', None))
-        # mark processing (best-effort if repo provides it)
-        try:
-            mark_proc = getattr(self.outbox_repo, 'mark_processing', None)
-            if callable(mark_proc):
-                mark_proc(entry_id)
-        except Exception:
-            pass
         try:
             if entry_type == OutboxType.MINT_NFT:
-                self._handle_mint_nft(entry)
+                return self._handle_mint_nft(entry)
             elif entry_type == OutboxType.TRANSFER_NFT:
-                self._handle_transfer_nft(entry)
+                return self._handle_transfer_nft(entry)
             elif entry_type == OutboxType.MARKETPLACE_LIST:
-                self._handle_marketplace_list(entry)
+                return self._handle_marketplace_list(entry)
             elif entry_type == OutboxType.MARKETPLACE_PURCHASE:
-                self._handle_marketplace_purchase(entry)
+                return self._handle_marketplace_purchase(entry)
             else:
                 raise ValueError(f"Unsupported operation type: {entry_type}")
         except Exception as e:
             logger.error(f"Blockchain operation failed for {entry_id}: {e}")
-            # Attempts are handled by _process_with_retry
+            # Attempts are recorded by _attempt_entry / process_entry_async
             raise
 
-    # New: retry wrapper with exponential backoff and jitter
-    def _process_with_retry(self, entry: Any) -> None:
+    def _process_entry(self, entry: Any) -> None:
+        """Process a single outbox entry (sync)."""
+        entry_id = self._get_entry_id(entry)
+        # mark processing (best-effort if repo provides it)
+        try:
+            mark_proc = getattr(self.outbox_repo, 'mark_processing', None)
+            if callable(mark_proc):
+                mark_proc(entry_id)
+        except Exception:
+            pass
+        self.outbox_repo.mark_completed(entry_id, self._execute(entry))
+
+    def _retry_delay(self, try_num: int) -> float:
+        """Exponential backoff with jitter for the given retry number."""
+        delay = min(self.max_delay, self.base_delay * (2 ** try_num))
+        jitter_factor = 1.0 + (random.random() * 2 - 1) * self.jitter
+        return max(0.1, delay * jitter_factor)
+
+    def _attempt_entry(self, entry: Any) -> None:
+        """
+        Execute one entry once (sync).
+
+        A failed entry with attempts left gets a backoff next_attempt_at and
+        goes back to pending for a later batch, instead of being retried
+        after a sleep here; the backoff lives in the database, so it survives
+        restarts and costs no worker time.
+
+        Raises:
+            Exception: The operation's error, after the entry was rescheduled or failed
+        """
         entry_id = self._get_entry_id(entry)
-        # Pull max attempts from entry if available, else default
         attempts_used = int(getattr(entry, "attempts", 0) or 0)
         max_attempts = int(getattr(entry, "max_attempts", 5) or 5)
 
-        base_delay = 0.5  # seconds
-        max_delay = 30.0  # seconds cap
-        jitter = 0.2      # +/-20%
-
-        try_num = 0
-        while True:
+        try:
+            self._process_entry(entry)
+        except Exception as e:
+            # Repository updates are best-effort; the original error is re-raised
+            try:
+                self.outbox_repo.increment_attempts(entry_id, str(e))
+            except Exception:
+                pass
             try:
-                if try_num > 0:
-                    logger.info(
-                        f"Retrying outbox {entry_id} (attempt {attempts_used + try_num + 1}/{max_attempts})"
+                if attempts_used + 1 >= max_attempts:
+                    self.outbox_repo.mark_failed(entry_id, str(e))
+                else:
+                    delay = self._retry_delay(attempts_used)
+                    self.outbox_repo.schedule_retry(
+                        entry_id, datetime.now(timezone.utc) + timedelta(seconds=delay)
+                    )
+                    logger.warning(
+                        f"Outbox {entry_id} failed: {e}. Retry scheduled in {delay:.2f}s "
+                        f"(attempt {attempts_used + 1}/{max_attempts})"
                     )
-                self._process_entry(entry)
+            except Exception:
+                pass
+            raise
+
+    def _chain_semaphore(self, entry: Any) -> asyncio.Semaphore:
+        """Semaphore bounding concurrent operations on the entry's blockchain."""
+        request_data = getattr(entry, "request_data", None) or {}
+        chain = str(request_data.get("blockchain") or "default")
+        semaphore = self._chain_limits.get(chain)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(BlockchainConfig.get_max_concurrency(chain))
+            self._chain_limits[chain] = semaphore
+        return semaphore
+
+    async def _keep_lease(
+        self, entry_id: str, worker_id: str, lease_seconds: float, lost: asyncio.Event
+    ) -> None:
+        """Renew a claimed entry's lease every third of its length until cancelled or lost."""
+        while True:
+            await asyncio.sleep(lease_seconds / 3)
+            if not await self.outbox_repo.renew_lease(entry_id, worker_id, lease_seconds):
+                logger.warning(f"Could not renew lease on outbox {entry_id} for {worker_id}")
+                lost.set()
                 return
+
+    async def _hold_unrecorded(
+        self, entry_id: str, result: Dict[str, Any], lease_lost: bool
+    ) -> None:
+        """Park an executed entry whose completion could not be recorded, then raise.
+
+        Raises:
+            RuntimeError: Always, so the entry is never reported as completed
+        """
+        reason = "Lease lost during execution" if lease_lost else "Completion could not be recorded"
+        tx_hash = result.get("tx_hash") if isinstance(result, dict) else None
+        logger.error(
+            f"Outbox {entry_id} executed (tx {tx_hash}) but was not marked completed: "
+            f"{reason}; moving it to manual review"
+        )
+        if not await self.outbox_repo.mark_manual_review(entry_id, reason, result):
+            logger.error(f"Could not move outbox {entry_id} to manual review; tx {tx_hash} is unrecorded")
+        raise RuntimeError(f"{reason} (tx {tx_hash})")
+
+    async def process_entry_async(
+        self, entry: Any, worker_id: Optional[str] = None, lease_seconds: float = 300
+    ) -> None:
+        """
+        Execute one entry once through an async repository.
+
+        A failed entry with attempts left is released with a backoff
+        next_attempt_at instead of being retried here, so it gives up its
+        blockchain slot to healthy entries while it waits.
+
+        A claimed entry's lease is renewed from the moment processing starts
+        until it is recorded, so neither queueing for a blockchain slot nor
+        a slow confirmation lets another worker reclaim it. The lease is
+        checked again once the slot is acquired, and the entry is skipped
+        if another worker took it over in the meantime. An operation that
+        ran but whose completion could not be recorded under the lease is
+        moved to manual review instead of being reported as completed.
+
+        Args:
+            entry: Outbox entry to execute
+            worker_id: Lease owner that repository updates are fenced to, if claimed
+            lease_seconds: Length each lease renewal extends the claim by
+
+        Raises:
+            LeaseLostError: The lease was lost before the operation ran
+            RuntimeError: The operation ran but its completion was not recorded
+            Exception: The operation's error, after the entry was rescheduled or failed
+        """
+        entry_id = self._get_entry_id(entry)
+        fence = {} if worker_id is None else {"worker_id": worker_id}
+        attempts_used = int(getattr(entry, "attempts", 0) or 0)
+        max_attempts = int(getattr(entry, "max_attempts", 5) or 5)
+
+        lease_lost = asyncio.Event()
+        heartbeat = None
+        if worker_id is not None:
+            heartbeat = asyncio.create_task(
+                self._keep_lease(entry_id, worker_id, lease_seconds, lease_lost)
+            )
+        try:
+            try:
+                async with self._chain_semaphore(entry):
+                    if worker_id is not None and (
+                        lease_lost.is_set()
+                        or not await self.outbox_repo.renew_lease(entry_id, worker_id, lease_seconds)
+                    ):
+                        raise LeaseLostError(f"Lease on outbox {entry_id} lost before execution")
+                    # Blockchain clients are blocking; keep them off the event loop
+                    result = await asyncio.to_thread(self._execute, entry)
+            except LeaseLostError:
+                raise
             except Exception as e:
-                # Update attempts in repo; this is best-effort
-                try:
-                    self.outbox_repo.increment_attempts(entry_id, str(e))
-                except Exception:
-                    pass
-
-                if attempts_used + try_num + 1 >= max_attempts:
-                    # Exhausted retries: mark failed (best-effort)
-                    try:
-                        self.outbox_repo.mark_failed(entry_id, str(e))
-                    except Exception:
-                        pass
-                    raise
-
-                # Compute exponential backoff with jitter and sleep synchronously
-                delay = min(max_delay, base_delay * (2 ** try_num))
-                # apply jitter
-                jitter_factor = 1.0 + (random.random() * 2 - 1) * jitter
-                delay = max(0.1, delay * jitter_factor)
-                logger.warning(
-                    f"Outbox {entry_id} failed: {e}. Backing off for {delay:.2f}s before retry"
-                )
-                time.sleep(delay)
-                try_num += 1
-
-    def _handle_mint_nft(self, entry: Any) -> None:
+                await self.outbox_repo.increment_attempts(entry_id, str(e), **fence)
+                if attempts_used + 1 >= max_attempts:
+                    await self.outbox_repo.mark_failed(entry_id, str(e), **fence)
+                else:
+                    delay = self._retry_delay(attempts_used)
+                    await self.outbox_repo.schedule_retry(
+                        entry_id, datetime.now(timezone.utc) + timedelta(seconds=delay), **fence
+                    )
+                    logger.warning(
+                        f"Outbox {entry_id} failed: {e}. Retry scheduled in {delay:.2f}s "
+                        f"(attempt {attempts_used + 1}/{max_attempts})"
+                    )
+                raise
+            if not await self.outbox_repo.mark_completed(entry_id, result, **fence):
+                await self._hold_unrecorded(entry_id, result, lease_lost.is_set())
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+
+    def _handle_mint_nft(self, entry: Any) -> Dict[str, Any]:
         """Handle NFT minting operation (sync, matches test expectations)."""
         data = entry.request_data
         blockchain = data["blockchain"]
@@ -171,15 +367,14 @@ class BlockchainHandler:
         )
         receipt = self.blockchain_service.wait_for_confirmation(blockchain, tx_hash, timeout=180)
         if receipt and receipt.get("status") == 1:
-            self.outbox_repo.mark_completed(entry_id, {
+            return {
                 "tx_hash": tx_hash,
                 "status": "confirmed",
                 "receipt": receipt
-            })
-        else:
-            raise Exception("Transaction failed on blockchain")
+            }
+        raise Exception("Transaction failed on blockchain")
 
-    def _handle_transfer_nft(self, entry: Any) -> None:
+    def _handle_transfer_nft(self, entry: Any) -> Dict[str, Any]:
         """Handle NFT transfer operation (sync, matches test expectations)."""
         data = entry.request_data
         blockchain = data["blockchain"]
@@ -193,15 +388,14 @@ class BlockchainHandler:
         )
         receipt = self.blockchain_service.wait_for_confirmation(blockchain, tx_hash, timeout=180)
         if receipt and receipt.get("status") == 1:
-            self.outbox_repo.mark_completed(entry_id, {
+            return {
                 "tx_hash": tx_hash,
                 "status": "confirmed",
                 "receipt": receipt
-            })
-        else:
-            raise Exception("Transfer failed on blockchain")
+            }
+        raise Exception("Transfer failed on blockchain")
 
-    def _handle_marketplace_list(self, entry: Any) -> None:
+    def _handle_marketplace_list(self, entry: Any) -> Dict[str, Any]:
         """Handle marketplace listing operation."""
         data = entry.request_data
         # Placeholder for marketplace listing logic
@@ -214,9 +408,9 @@ class BlockchainHandler:
             "price": data.get("price"),
             "status": "listed",
         }
-        self.outbox_repo.mark_completed(entry_id, result)
+        return result
 
-    def _handle_marketplace_purchase(self, entry: Any) -> None:
+    def _handle_marketplace_purchase(self, entry: Any) -> Dict[str, Any]:
         """Handle marketplace purchase operation."""
         data = entry.request_data
         # Placeholder for marketplace purchase logic
@@ -230,7 +424,7 @@ class BlockchainHandler:
             "price": data.get("price"),
             "status": "purchased",
         }
-        self.outbox_repo.mark_completed(entry_id, result)
+        return result
 
     def get_processing_stats(self) -> Dict[str, Any]:
         """Get statistics about outbox processing (sync)."""
@@ -0,0 +1,756 @@
+"""
+Card Catalog Index
+
+This module provides precomputed lookup structures over the card catalog so the
+card endpoints can answer filtered searches without rescanning every card on
+every request. An index is built once per catalog load and never mutated
+afterwards; a refreshed catalog simply produces a new index.
+
+It also provides the background refresher that keeps a remote catalog
+(``CARDS_SOURCE_URL``) current without ever fetching on a request path.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import (
+    Any, Dict, Hashable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+)
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+logger = logging.getLogger(__name__)
+
+# Card fields served by exact-match hash indexes
+FACET_FIELDS: Tuple[str, ...] = ("faction", "type", "rarity")
+
+# Attributes used to hang catalog state off the db object. They are private
+# names so attribute-style collection access never shadows them.
+INDEX_ATTR = "_cards_catalog_index"
+FETCHED_AT_ATTR = "_cards_catalog_last_fetched"
+REFRESHER_ATTR = "_cards_catalog_refresher"
+
+# First retry delay after a failed catalog refresh, in seconds; doubles with
+# each consecutive failure up to the refresh interval
+REFRESH_RETRY_BASE = 5
+
+# Gram length of the full-text index; shorter needles fall back to scanning
+NGRAM_SIZE = 3
+
+# Default number of serialized responses kept per catalog version
+RESPONSE_CACHE_SIZE = 512
+
+# Per-version caches backing cursor pagination: full ranked text results and
+# result counts, keyed by the normalized filters
+RANKED_CACHE_SIZE = 64
+COUNT_CACHE_SIZE = 1024
+
+# Ordering key of a search result: (position,) for catalog order and
+# (rank, position) for ranked text search
+SortKey = Tuple[int, ...]
+
+# Switch from hash probing to binary search when a posting list is this many
+# times longer than the running intersection
+_GALLOP_RATIO = 8
+
+# Relevance buckets for free-text matches, best first
+RANK_NAME_EXACT = 0
+RANK_NAME_PREFIX = 1
+RANK_NAME_WORD_PREFIX = 2
+RANK_NAME_SUBSTRING = 3
+RANK_DESCRIPTION = 4
+
+
+def _coerce_cost(value: Any) -> int:
+    """Normalize a card cost to an int, treating malformed values as 0."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _ngrams(text: str) -> Set[str]:
+    """Return the distinct n-grams of an already lower-cased string."""
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+def _intersect_sorted(lists: List[List[int]]) -> List[int]:
+    """Intersect ascending posting lists, driving from the shortest one."""
+    if not lists:
+        return []
+    lists = sorted(lists, key=len)
+    result = lists[0]
+    for other in lists[1:]:
+        if not result:
+            break
+        if len(other) <= _GALLOP_RATIO * len(result):
+            # Similar sizes: a hash probe per element beats binary searching
+            members = set(result)
+            result = [pos for pos in other if pos in members]
+            continue
+        merged: List[int] = []
+        lo = 0
+        for pos in result:
+            # Gallop through the much longer list instead of walking it
+            lo = bisect_left(other, pos, lo)
+            if lo == len(other):
+                break
+            if other[lo] == pos:
+                merged.append(pos)
+        result = merged
+    return list(result)
+
+
+class _FilterPlan(NamedTuple):
+    """Execution plan for the structured (non-text) search filters."""
+
+    driver: Optional[List[int]]  # ascending candidate positions; None = whole catalog
+    facets: List[Tuple[str, Any]]  # every active (field, value) predicate
+    probes: List[Tuple[str, Any]]  # predicates not already implied by the driver
+    has_cost: bool
+    check_cost: bool  # whether the driver still needs the cost range probed
+    low: float
+    high: float
+
+
+class CardTextIndex:
+    """Trigram inverted index over card names and descriptions.
+
+    The index only narrows the candidate set; every candidate is verified with
+    a plain substring check so results keep the exact semantics of the former
+    ``needle in text`` scan.
+    """
+
+    def __init__(self, names: List[str], descriptions: List[str]):
+        self._names = names
+        self._descriptions = descriptions
+        self._postings: Dict[str, List[int]] = {}
+        for pos, (name, description) in enumerate(zip(names, descriptions)):
+            for gram in _ngrams(name) | _ngrams(description):
+                self._postings.setdefault(gram, []).append(pos)
+
+    def candidates(self, needle: str) -> Optional[List[int]]:
+        """
+        Return ascending positions that may contain the needle.
+
+        Args:
+            needle: Lower-cased search text
+
+        Returns:
+            Candidate positions, or None when the needle is too short to use
+            the index and the caller must fall back to scanning
+        """
+        if len(needle) < NGRAM_SIZE:
+            return None
+        lists = []
+        for gram in _ngrams(needle):
+            postings = self._postings.get(gram)
+            if not postings:
+                return []
+            lists.append(postings)
+        return _intersect_sorted(lists)
+
+    def rank(self, pos: int, needle: str) -> Optional[int]:
+        """Score a candidate; lower is more relevant and None means no match."""
+        name = self._names[pos]
+        found = name.find(needle)
+        if found < 0:
+            return RANK_DESCRIPTION if needle in self._descriptions[pos] else None
+        if found == 0:
+            return RANK_NAME_EXACT if len(name) == len(needle) else RANK_NAME_PREFIX
+        if name.find(" " + needle, found - 1) >= 0:
+            return RANK_NAME_WORD_PREFIX
+        return RANK_NAME_SUBSTRING
+
+
+def _catalog_version(cards: Sequence[Dict[str, Any]]) -> str:
+    """Content hash of a catalog; equal catalogs always get equal versions."""
+    digest = hashlib.sha256()
+    for card in cards:
+        digest.update(json.dumps(card, sort_keys=True, separators=(",", ":"), default=str).encode())
+        digest.update(b"\n")
+    return digest.hexdigest()[:32]
+
+
+class LRUCache:
+    """Minimal LRU map with hit/miss counters (event-loop confined, no locking)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a cached value and mark it most recently used."""
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Cache a value, evicting the least recently used entry when full."""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SerializedResponseCache(LRUCache):
+    """LRU of pre-serialized response bodies for a single catalog version.
+
+    Each index owns its own cache, so publishing a new catalog version
+    invalidates every cached body at once without any bookkeeping.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+        super().__init__(max_entries)
+
+
+class CardCatalogIndex:
+    """Immutable, query-ready view over one loaded card catalog.
+
+    Positions returned by the query methods refer to catalog order, so
+    structured filters return results in the order the previous linear scan
+    produced; free-text searches are additionally ranked by relevance.
+    """
+
+    def __init__(self, cards: Sequence[Dict[str, Any]]):
+        self.cards: List[Dict[str, Any]] = list(cards)
+        # Primary key lookup; the first card wins on duplicate ids, as the
+        # former linear scan did
+        self.by_id: Dict[Any, Dict[str, Any]] = {}
+        self._positions: Dict[Any, int] = {}
+
+        # Hash indexes: facet value -> ascending list of catalog positions
+        self._postings: Dict[str, Dict[Any, List[int]]] = {f: {} for f in FACET_FIELDS}
+        # Column views used to probe candidates in O(1) during intersection
+        self._columns: Dict[str, List[Any]] = {f: [] for f in FACET_FIELDS}
+        self._costs: List[int] = []
+        # Lower-cased text, computed once instead of per request
+        self._names: List[str] = []
+        self._descriptions: List[str] = []
+
+        for pos, card in enumerate(self.cards):
+            self.by_id.setdefault(card.get("id"), card)
+            self._positions.setdefault(card.get("id"), pos)
+            for field in FACET_FIELDS:
+                value = card.get(field)
+                self._columns[field].append(value)
+                try:
+                    self._postings[field].setdefault(value, []).append(pos)
+                except TypeError:
+                    # Unhashable values can never equal a query string
+                    pass
+            self._costs.append(_coerce_cost(card.get("cost", 0)))
+            self._names.append(str(card.get("name", "")).lower())
+            self._descriptions.append(str(card.get("description", "")).lower())
+
+        # Sorted cost array for range queries; the sort is stable so ties keep
+        # catalog order
+        self._cost_order: List[int] = sorted(
+            range(len(self.cards)), key=self._costs.__getitem__
+        )
+        self._cost_keys: List[int] = [self._costs[p] for p in self._cost_order]
+        self.text = CardTextIndex(self._names, self._descriptions)
+
+        # Content version for ETags plus the per-version response cache
+        self.version = _catalog_version(self.cards)
+        self.responses = SerializedResponseCache()
+        self._ranked_results = LRUCache(RANKED_CACHE_SIZE)
+        self._counts = LRUCache(COUNT_CACHE_SIZE)
+
+        logger.debug(f"Built card catalog index over {len(self.cards)} cards")
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def _cost_bounds(self, cost_min: Optional[int], cost_max: Optional[int]) -> Tuple[int, int]:
+        """Locate the slice of the sorted cost array inside [cost_min, cost_max]."""
+        lo = 0 if cost_min is None else bisect_left(self._cost_keys, cost_min)
+        hi = len(self._cost_keys) if cost_max is None else bisect_right(self._cost_keys, cost_max)
+        return lo, max(lo, hi)
+
+    def _plan(
+        self,
+        faction: Optional[str],
+        card_type: Optional[str],
+        rarity: Optional[str],
+        cost_min: Optional[int],
+        cost_max: Optional[int],
+    ) -> Optional[_FilterPlan]:
+        """Pick the driving candidate list for the structured filters.
+
+        Returns None when some facet value has no postings at all.
+        """
+        facets: List[Tuple[str, Any, List[int]]] = []
+        for field, value in (("faction", faction), ("type", card_type), ("rarity", rarity)):
+            if not value:
+                continue
+            postings = self._postings[field].get(value)
+            if not postings:
+                return None
+            facets.append((field, value, postings))
+
+        has_cost = cost_min is not None or cost_max is not None
+        low = cost_min if cost_min is not None else float("-inf")
+        high = cost_max if cost_max is not None else float("inf")
+        active = [(field, value) for field, value, _ in facets]
+        if not facets and not has_cost:
+            return _FilterPlan(None, [], [], False, False, low, high)
+
+        lo, hi = self._cost_bounds(cost_min, cost_max) if has_cost else (0, 0)
+        facets.sort(key=lambda f: len(f[2]))
+        if has_cost and (not facets or hi - lo < len(facets[0][2])):
+            driver = sorted(self._cost_order[lo:hi])
+            return _FilterPlan(driver, active, active, True, False, low, high)
+        probes = [(field, value) for field, value, _ in facets[1:]]
+        return _FilterPlan(facets[0][2], active, probes, has_cost, has_cost, low, high)
+
+    def _accepts(self, plan: _FilterPlan, pos: int, full: bool = False) -> bool:
+        """Check one position against a plan.
+
+        By default only the predicates not implied by the plan's driver are
+        probed; ``full`` checks every predicate, for candidates that come from
+        some other list.
+        """
+        if (plan.check_cost or (full and plan.has_cost)) and not (
+            plan.low <= self._costs[pos] <= plan.high
+        ):
+            return False
+        predicates = plan.facets if full else plan.probes
+        return all(self._columns[field][pos] == value for field, value in predicates)
+
+    def filter(
+        self,
+        faction: Optional[str] = None,
+        card_type: Optional[str] = None,
+        rarity: Optional[str] = None,
+        cost_min: Optional[int] = None,
+        cost_max: Optional[int] = None,
+    ) -> List[int]:
+        """
+        Return catalog positions of cards matching every given filter.
+
+        The smallest candidate set (a facet posting list or the cost range)
+        drives the intersection and the remaining predicates are probed per
+        candidate, so the work done is proportional to that set rather than to
+        the catalog size.
+
+        Args:
+            faction: Exact faction to match (falsy means no filter)
+            card_type: Exact card type to match (falsy means no filter)
+            rarity: Exact rarity to match (falsy means no filter)
+            cost_min: Inclusive lower bound on cost
+            cost_max: Inclusive upper bound on cost
+
+        Returns:
+            Matching positions in catalog order
+        """
+        return self._run_plan(self._plan(faction, card_type, rarity, cost_min, cost_max))
+
+    def _run_plan(self, plan: Optional[_FilterPlan]) -> List[int]:
+        """Evaluate a structured filter plan in catalog order."""
+        if plan is None:
+            return []
+        if plan.driver is None:
+            return list(range(len(self.cards)))
+        if not plan.probes and not plan.check_cost:
+            return list(plan.driver)
+        return [pos for pos in plan.driver if self._accepts(plan, pos)]
+
+    def _ranked(self, needle: str, plan: _FilterPlan, key: Hashable) -> List[Tuple[int, int]]:
+        """Return (rank, position) pairs for a text search, cached per query."""
+        ranked = self._ranked_results.get(key)
+        if ranked is not None:
+            return ranked
+
+        text_candidates = self.text.candidates(needle)
+        if text_candidates is not None and (
+            plan.driver is None or len(text_candidates) <= len(plan.driver)
+        ):
+            # Text postings are the smaller set: probe every structured filter
+            positions = text_candidates
+            if plan.driver is not None:
+                positions = [pos for pos in positions if self._accepts(plan, pos, full=True)]
+        else:
+            # Structured filters are selective (or the needle is too short)
+            positions = self._run_plan(plan)
+
+        rank = self.text.rank
+        ranked = [(score, pos) for pos in positions if (score := rank(pos, needle)) is not None]
+        ranked.sort()
+        self._ranked_results.put(key, ranked)
+        return ranked
+
+    def iter_search(
+        self,
+        faction: Optional[str] = None,
+        card_type: Optional[str] = None,
+        rarity: Optional[str] = None,
+        cost_min: Optional[int] = None,
+        cost_max: Optional[int] = None,
+        text: Optional[str] = None,
+        after: Optional[SortKey] = None,
+    ) -> Iterator[Tuple[SortKey, int]]:
+        """
+        Lazily yield (sort key, position) for matches, resuming after a key.
+
+        Structured-only searches walk the driving posting list from the
+        resume point, so a page costs only as much as the matches it
+        returns. Text searches rank the full match set once per catalog
+        version and query, then resume from the cached ranking.
+
+        Args:
+            faction: Exact faction to match
+            card_type: Exact card type to match
+            rarity: Exact rarity to match
+            cost_min: Inclusive lower bound on cost
+            cost_max: Inclusive upper bound on cost
+            text: Case-insensitive substring to find in name or description
+            after: Sort key of the last result already served
+
+        Yields:
+            Tuples of (sort key, catalog position) in result order
+        """
+        plan = self._plan(faction, card_type, rarity, cost_min, cost_max)
+        if plan is None:
+            return
+
+        if text:
+            needle = text.lower()
+            key = (faction or None, card_type or None, rarity or None, cost_min, cost_max, needle)
+            ranked = self._ranked(needle, plan, key)
+            start = bisect_right(ranked, tuple(after)) if after is not None else 0
+            for i in range(start, len(ranked)):
+                yield ranked[i], ranked[i][1]
+            return
+
+        last = after[0] if after is not None else -1
+        if plan.driver is None:
+            for pos in range(last + 1, len(self.cards)):
+                yield (pos,), pos
+            return
+
+        driver = plan.driver
+        probe = bool(plan.probes) or plan.check_cost
+        for i in range(bisect_right(driver, last), len(driver)):
+            pos = driver[i]
+            if not probe or self._accepts(plan, pos):
+                yield (pos,), pos
+
+    def search(
+        self,
+        faction: Optional[str] = None,
+        card_type: Optional[str] = None,
+        rarity: Optional[str] = None,
+        cost_min: Optional[int] = None,
+        cost_max: Optional[int] = None,
+        text: Optional[str] = None,
+    ) -> List[int]:
+        """
+        Return catalog positions matching the structured filters and free text.
+
+        Free-text matches are ordered by relevance (exact name, name prefix,
+        name word prefix, name substring, description) and then by catalog
+        order; without text the catalog order is kept.
+
+        Args:
+            faction: Exact faction to match
+            card_type: Exact card type to match
+            rarity: Exact rarity to match
+            cost_min: Inclusive lower bound on cost
+            cost_max: Inclusive upper bound on cost
+            text: Case-insensitive substring to find in name or description
+
+        Returns:
+            Matching positions
+        """
+        if not text:
+            return self.filter(faction, card_type, rarity, cost_min, cost_max)
+        return [
+            pos for _, pos in self.iter_search(
+                faction, card_type, rarity, cost_min, cost_max, text
+            )
+        ]
+
+    def count(
+        self,
+        faction: Optional[str] = None,
+        card_type: Optional[str] = None,
+        rarity: Optional[str] = None,
+        cost_min: Optional[int] = None,
+        cost_max: Optional[int] = None,
+        text: Optional[str] = None,
+    ) -> int:
+        """Count matches for a search; computed once per catalog version and query."""
+        key = (
+            faction or None, card_type or None, rarity or None,
+            cost_min, cost_max, (text or "").lower() or None,
+        )
+        total = self._counts.get(key)
+        if total is None:
+            total = len(self.search(faction, card_type, rarity, cost_min, cost_max, text))
+            self._counts.put(key, total)
+        return total
+
+    def sort_key(self, pos: int, text: Optional[str] = None) -> SortKey:
+        """Build the sort key of a position for the given search mode."""
+        if not text:
+            return (pos,)
+        score = self.text.rank(pos, text.lower())
+        return (RANK_DESCRIPTION if score is None else score, pos)
+
+    def position_of(self, card_id: str) -> Optional[int]:
+        """Return the catalog position of a card id, if present."""
+        return self._positions.get(card_id)
+
+    def get(self, card_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a single card by id in O(1)."""
+        return self.by_id.get(card_id)
+
+    def get_many(self, card_ids: Sequence[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Resolve many card ids in one pass.
+
+        Args:
+            card_ids: Ids to resolve; duplicates are collapsed
+
+        Returns:
+            Tuple of (cards found in request order, ids that were not found)
+        """
+        found: List[Dict[str, Any]] = []
+        missing: List[str] = []
+        for card_id in dict.fromkeys(card_ids):
+            card = self.by_id.get(card_id)
+            if card is None:
+                missing.append(card_id)
+            else:
+                found.append(card)
+        return found, missing
+
+
+def validate_cards(candidate: Any) -> Tuple[bool, List[Dict[str, Any]]]:
+    """Keep only well-formed cards (string id, name and type) from a payload."""
+    if not isinstance(candidate, list):
+        return False, []
+    validated: List[Dict[str, Any]] = []
+    for item in candidate:
+        if not isinstance(item, dict):
+            continue
+        cid = item.get("id")
+        name = item.get("name")
+        ctype = item.get("type")
+        if not isinstance(cid, str) or not isinstance(name, str) or not isinstance(ctype, str):
+            continue
+        validated.append(item)
+    # Require at least a handful of valid entries to accept source
+    return (len(validated) >= 1), validated
+
+
+def get_catalog_index(db: Any) -> Optional[CardCatalogIndex]:
+    """Return the catalog index currently published on the db object, if any."""
+    return getattr(db, INDEX_ATTR, None)
+
+
+def publish_catalog(db: Any, index: CardCatalogIndex) -> CardCatalogIndex:
+    """Atomically swap in a new catalog index; readers see old or new, never partial."""
+    setattr(db, INDEX_ATTR, index)
+    setattr(db, FETCHED_AT_ATTR, int(time.time()))
+    return index
+
+
+class CardCatalogRefresher:
+    """
+    Background refresher for a remote card catalog.
+
+    Fetches run in a worker thread with conditional request headers
+    (``If-None-Match`` / ``If-Modified-Since``). A successful fetch builds a
+    new index off the event loop and publishes it with a single attribute
+    swap; failures and ``304 Not Modified`` keep serving the current catalog
+    (stale-while-revalidate). Consecutive failures back off exponentially so
+    an unreachable source is not retried on every request.
+    """
+
+    def __init__(
+        self,
+        db: Any,
+        source_url: str,
+        refresh_interval: float = 300,
+        timeout: float = 5,
+    ):
+        """
+        Initialize the refresher.
+
+        Args:
+            db: Database object the catalog index is published on
+            source_url: URL returning the catalog as a JSON list of cards
+            refresh_interval: Seconds between refresh attempts
+            timeout: Socket timeout for a single fetch, in seconds
+        """
+        self.db = db
+        self.source_url = source_url
+        self.refresh_interval = refresh_interval
+        self.timeout = timeout
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.is_running = False
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._inflight: Optional["asyncio.Task[bool]"] = None
+        self._stats = {"refreshes": 0, "not_modified": 0, "failures": 0}
+        self._consecutive_failures = 0
+        self._retry_at = 0.0
+        setattr(db, REFRESHER_ATTR, self)
+
+    @classmethod
+    def from_env(cls, db: Any) -> Optional["CardCatalogRefresher"]:
+        """Create a refresher from ``CARDS_SOURCE_URL``/``CARDS_SOURCE_TTL``, if configured."""
+        source_url = os.environ.get("CARDS_SOURCE_URL")
+        if not source_url:
+            return None
+        try:
+            interval = int(os.environ.get("CARDS_SOURCE_TTL", "300"))
+        except ValueError:
+            interval = 300
+        return cls(db, source_url, refresh_interval=max(1, interval))
+
+    def _fetch(self) -> Optional[CardCatalogIndex]:
+        """Fetch and index the catalog (runs in a worker thread).
+
+        Returns:
+            A new index, or None if the source reported no change
+        """
+        headers = {"Accept": "application/json"}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+
+        try:
+            with urlopen(Request(self.source_url, headers=headers), timeout=self.timeout) as resp:
+                data = resp.read()
+                etag = resp.headers.get("ETag")
+                last_modified = resp.headers.get("Last-Modified")
+        except HTTPError as e:
+            if e.code == 304:
+                return None
+            raise
+
+        ok, validated = validate_cards(json.loads(data))
+        if not ok:
+            raise ValueError("Card source returned no valid cards")
+        index = CardCatalogIndex(validated)
+        # Only remember validators for payloads we actually accepted
+        self.etag = etag
+        self.last_modified = last_modified
+        return index
+
+    async def refresh(self) -> bool:
+        """
+        Refresh the catalog once without blocking the event loop.
+
+        Returns:
+            True if a new catalog was published
+        """
+        try:
+            index = await asyncio.to_thread(self._fetch)
+        except (URLError, HTTPError, ValueError, OSError) as e:
+            self._stats["failures"] += 1
+            self._consecutive_failures += 1
+            delay = min(
+                self.refresh_interval,
+                REFRESH_RETRY_BASE * 2 ** (self._consecutive_failures - 1),
+            )
+            self._retry_at = time.monotonic() + delay
+            logger.warning(
+                f"Card catalog refresh from {self.source_url} failed: {e} "
+                f"(retrying in {delay}s)"
+            )
+            return False
+
+        self._consecutive_failures = 0
+        self._retry_at = 0.0
+        if index is None:
+            self._stats["not_modified"] += 1
+            # Source confirmed our copy is current; restart the freshness clock
+            setattr(self.db, FETCHED_AT_ATTR, int(time.time()))
+            return False
+
+        publish_catalog(self.db, index)
+        self._stats["refreshes"] += 1
+        logger.info(f"Card catalog refreshed: {len(index)} cards")
+        return True
+
+    def in_backoff(self) -> bool:
+        """Whether a recent failure means the next refresh should wait."""
+        return time.monotonic() < self._retry_at
+
+    def refresh_in_background(self) -> None:
+        """Schedule a refresh unless one is in flight or backing off (request-path safe)."""
+        if self._inflight is not None and not self._inflight.done():
+            return
+        if self.in_backoff():
+            return
+        self._inflight = asyncio.get_running_loop().create_task(self.refresh())
+
+    async def start(self) -> None:
+        """Load the catalog once, then keep refreshing it in the background."""
+        if self.is_running:
+            logger.warning("Card catalog refresher is already running")
+            return
+
+        self.is_running = True
+        await self.refresh()
+        self._task = asyncio.create_task(self._refresh_loop())
+        logger.info(
+            f"Card catalog refresher started (interval: {self.refresh_interval}s)"
+        )
+
+    async def stop(self) -> None:
+        """Stop the background refresh loop."""
+        if not self.is_running:
+            return
+
+        self.is_running = False
+        for task in (self._task, self._inflight):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+        logger.info("Card catalog refresher stopped")
+
+    async def _refresh_loop(self) -> None:
+        """Refresh periodically until stopped."""
+        while self.is_running:
+            try:
+                await asyncio.sleep(self.refresh_interval)
+                await self.refresh()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in card catalog refresh loop: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get refresh counters and validator state."""
+        return {
+            **self._stats,
+            "is_running": self.is_running,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "last_fetched": getattr(self.db, FETCHED_AT_ATTR, None),
+            "consecutive_failures": self._consecutive_failures,
+        }
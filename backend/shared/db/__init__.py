@@ -7,8 +7,13 @@ requiring an actual database connection.
 """
 
 # Import main classes for easy access
+from .changes import InMemoryChangeStream
 from .cursor import InMemoryCursor
 from .collection import InMemoryCollection
 from .database import InMemoryDB, InMemoryDatabase
+from .persistence import DatabasePersistence
 
-__all__ = ['InMemoryCursor', 'InMemoryCollection', 'InMemoryDB', 'InMemoryDatabase']
\ No newline at end of file
+__all__ = [
+    'InMemoryCursor', 'InMemoryCollection', 'InMemoryDB', 'InMemoryDatabase',
+    'DatabasePersistence', 'InMemoryChangeStream',
+]
\ No newline at end of file
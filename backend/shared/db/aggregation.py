@@ -0,0 +1,465 @@
+"""
+In-Memory Aggregation Pipeline
+
+This module provides a streaming aggregation engine for the in-memory
+database. Stages are chained as lazy iterators, so a trailing $limit stops
+upstream work early and $group/$count consume their input in one pass.
+
+Supported stages: $match, $project, $sort, $skip, $limit, $group (with
+$sum, $avg, $min, $max and $count accumulators), $unwind and $count.
+
+Before running, the pipeline is rewritten:
+- adjacent $match stages are merged, and a $match directly after a $sort
+  is moved in front of it (they commute), so filters run before sorting
+  and a leading $match can be answered by the collection's indexes;
+- $sort followed by $limit (optionally with a $skip in between) becomes a
+  bounded heap top-k instead of a full sort.
+"""
+
+import asyncio
+import heapq
+import logging
+from collections import deque
+from itertools import islice
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pymongo.errors import OperationFailure
+
+from .cursor import DEFAULT_BATCH_SIZE, compile_sort_key
+from .index import MISSING, freeze, get_field, sort_key
+from .query import compile_query
+
+logger = logging.getLogger(__name__)
+
+Stage = Tuple[str, Any]
+Document = Dict[str, Any]
+
+_STAGES = ("$match", "$project", "$sort", "$skip", "$limit", "$group", "$unwind", "$count")
+_ACCUMULATORS = ("$sum", "$avg", "$min", "$max", "$count")
+
+
+# ---------------------------------------------------------------------------
+# Expressions and field paths
+# ---------------------------------------------------------------------------
+
+def _evaluate(expr: Any, doc: Document) -> Any:
+    """
+    Evaluate a minimal aggregation expression.
+
+    "$path" reads a field (MISSING when absent), {"$literal": v} returns v,
+    plain dicts build embedded documents and anything else is a constant.
+    """
+    if isinstance(expr, str) and expr.startswith("$"):
+        return get_field(doc, expr[1:])
+    if isinstance(expr, dict):
+        if len(expr) == 1 and "$literal" in expr:
+            return expr["$literal"]
+        if any(isinstance(k, str) and k.startswith("$") for k in expr):
+            raise OperationFailure(f"Unsupported aggregation expression: {expr}")
+        result = {}
+        for key, value in expr.items():
+            evaluated = _evaluate(value, doc)
+            if evaluated is not MISSING:
+                result[key] = evaluated
+        return result
+    return expr
+
+
+def _set_path(target: Document, path: str, value: Any) -> None:
+    """Set a (dotted) field on a freshly built document."""
+    parts = path.split(".")
+    node = target
+    for part in parts[:-1]:
+        child = node.get(part)
+        if not isinstance(child, dict):
+            child = {}
+            node[part] = child
+        node = child
+    node[parts[-1]] = value
+
+
+def _with_path(doc: Document, path: str, value: Any) -> Document:
+    """
+    Return a copy of ``doc`` with a (dotted) field set, or removed if MISSING.
+
+    Only the dicts along the path are copied; stored documents are shared
+    between readers and must never be modified.
+    """
+    parts = path.split(".")
+    result = dict(doc)
+    node = result
+    for part in parts[:-1]:
+        child = node.get(part)
+        if not isinstance(child, dict):
+            if value is MISSING:
+                return result
+            child = {}
+        else:
+            child = dict(child)
+        node[part] = child
+        node = child
+    if value is MISSING:
+        node.pop(parts[-1], None)
+    else:
+        node[parts[-1]] = value
+    return result
+
+
+# ---------------------------------------------------------------------------
+# $project
+# ---------------------------------------------------------------------------
+
+def _is_flag(value: Any) -> bool:
+    return isinstance(value, (bool, int)) and not isinstance(value, float) and value in (0, 1)
+
+
+def compile_projection(spec: Any) -> Callable[[Document], Document]:
+    """
+    Compile a projection into a function returning a new document.
+
+    Args:
+        spec: Dict of field -> 1/0/expression, or a list of field names
+
+    Returns:
+        Function mapping a document to its projected copy
+
+    Raises:
+        OperationFailure: If inclusion and exclusion are mixed
+    """
+    if isinstance(spec, (list, tuple)):
+        spec = {field: 1 for field in spec}
+    if not spec:
+        return dict
+
+    include_id = spec.get("_id", 1)
+    fields = {k: v for k, v in spec.items() if k != "_id"}
+    excluded = [k for k, v in fields.items() if _is_flag(v) and not v]
+    included = {k: v for k, v in fields.items() if not (_is_flag(v) and not v)}
+    if excluded and included:
+        raise OperationFailure("Cannot mix inclusion and exclusion in a projection")
+
+    if excluded or (not included and _is_flag(include_id) and not include_id):
+        drop_id = _is_flag(include_id) and not include_id
+
+        def exclude(doc: Document) -> Document:
+            result = dict(doc)
+            for path in excluded:
+                result = _with_path(result, path, MISSING)
+            if drop_id:
+                result.pop("_id", None)
+            return result
+        return exclude
+
+    def include(doc: Document) -> Document:
+        result: Document = {}
+        if not _is_flag(include_id):
+            value = _evaluate(include_id, doc)
+            if value is not MISSING:
+                result["_id"] = value
+        elif include_id and "_id" in doc:
+            result["_id"] = doc["_id"]
+        for path, value in included.items():
+            value = get_field(doc, path) if _is_flag(value) else _evaluate(value, doc)
+            if value is not MISSING:
+                _set_path(result, path, value)
+        return result
+    return include
+
+
+# ---------------------------------------------------------------------------
+# $group
+# ---------------------------------------------------------------------------
+
+class _Accumulator:
+    """Running state for one accumulator in one group."""
+
+    __slots__ = ("op", "expr", "total", "count", "best")
+
+    def __init__(self, op: str, expr: Any):
+        self.op = op
+        self.expr = expr
+        self.total: Any = 0
+        self.count = 0
+        self.best: Optional[Tuple[Any, Any]] = None
+
+    def add(self, doc: Document) -> None:
+        if self.op == "$count":
+            self.count += 1
+            return
+        value = _evaluate(self.expr, doc)
+        if self.op in ("$sum", "$avg"):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.total += value
+                self.count += 1
+        elif value is not MISSING and value is not None:
+            # $min/$max ignore null and missing values, like MongoDB
+            key = sort_key(value)
+            if (
+                self.best is None
+                or (self.op == "$min" and key < self.best[0])
+                or (self.op == "$max" and key > self.best[0])
+            ):
+                self.best = (key, value)
+
+    def result(self) -> Any:
+        if self.op == "$sum":
+            return self.total
+        if self.op == "$count":
+            return self.count
+        if self.op == "$avg":
+            return self.total / self.count if self.count else None
+        return self.best[1] if self.best is not None else None
+
+
+def _group_stage(stream: Iterable[Document], spec: Dict[str, Any]) -> Iterator[Document]:
+    """Group documents in a single pass over the input."""
+    if "_id" not in spec:
+        raise OperationFailure("a group specification must include an _id")
+    accumulators: List[Tuple[str, str, Any]] = []
+    for field, definition in spec.items():
+        if field == "_id":
+            continue
+        if not isinstance(definition, dict) or len(definition) != 1:
+            raise OperationFailure(f"The field '{field}' must be an accumulator object")
+        op, expr = next(iter(definition.items()))
+        if op not in _ACCUMULATORS:
+            raise OperationFailure(f"unknown group operator '{op}'")
+        accumulators.append((field, op, expr))
+
+    key_expr = spec["_id"]
+    groups: Dict[Any, Tuple[Any, List[_Accumulator]]] = {}
+    for doc in stream:
+        key = _evaluate(key_expr, doc)
+        if key is MISSING:
+            key = None
+        frozen = freeze(key)
+        group = groups.get(frozen)
+        if group is None:
+            group = (key, [_Accumulator(op, expr) for _, op, expr in accumulators])
+            groups[frozen] = group
+        for accumulator in group[1]:
+            accumulator.add(doc)
+
+    for key, state in groups.values():
+        result = {"_id": key}
+        for (field, _, _), accumulator in zip(accumulators, state):
+            result[field] = accumulator.result()
+        yield result
+
+
+# ---------------------------------------------------------------------------
+# Other stages
+# ---------------------------------------------------------------------------
+
+def _sort_specs(spec: Any) -> List[Tuple[str, int]]:
+    if not isinstance(spec, dict) or not spec:
+        raise OperationFailure("$sort key specification must be a non-empty object")
+    specs = []
+    for field, direction in spec.items():
+        if direction not in (1, -1):
+            raise OperationFailure(f"$sort direction for '{field}' must be 1 or -1")
+        specs.append((field, direction))
+    return specs
+
+
+def _sort_stage(stream: Iterable[Document], specs: List[Tuple[str, int]], top: Optional[int]) -> Iterator[Document]:
+    """Sort lazily; with ``top`` set, keep only the first ``top`` in a bounded heap."""
+    key, reverse = compile_sort_key(specs)
+    if top is not None:
+        pick = heapq.nlargest if reverse else heapq.nsmallest
+        yield from pick(top, stream, key=key)
+    else:
+        yield from sorted(stream, key=key, reverse=reverse)
+
+
+def _unwind_stage(stream: Iterable[Document], spec: Any) -> Iterator[Document]:
+    """Emit one document per array element."""
+    if isinstance(spec, str):
+        spec = {"path": spec}
+    path = spec.get("path")
+    if not isinstance(path, str) or not path.startswith("$"):
+        raise OperationFailure("$unwind path must be a field path starting with '$'")
+    path = path[1:]
+    preserve = bool(spec.get("preserveNullAndEmptyArrays", False))
+    index_field = spec.get("includeArrayIndex")
+
+    for doc in stream:
+        value = get_field(doc, path)
+        if isinstance(value, list) and value:
+            for i, item in enumerate(value):
+                out = _with_path(doc, path, item)
+                if index_field:
+                    out[index_field] = i
+                yield out
+        elif isinstance(value, list) or value is MISSING or value is None:
+            if preserve:
+                out = _with_path(doc, path, MISSING) if isinstance(value, list) else dict(doc)
+                if index_field:
+                    out[index_field] = None
+                yield out
+        else:
+            # A non-array value behaves like a one-element array
+            out = dict(doc)
+            if index_field:
+                out[index_field] = None
+            yield out
+
+
+def _count_stage(stream: Iterable[Document], field: Any) -> Iterator[Document]:
+    if not isinstance(field, str) or not field or field.startswith("$") or "." in field:
+        raise OperationFailure("$count field must be a non-empty string without '$' or '.'")
+    total = sum(1 for _ in stream)
+    if total:
+        yield {field: total}
+
+
+def _non_negative_int(name: str, value: Any) -> int:
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise OperationFailure(f"{name} requires a non-negative integer, got {value!r}")
+    return value
+
+
+# ---------------------------------------------------------------------------
+# Pipeline
+# ---------------------------------------------------------------------------
+
+def _merge_matches(first: Dict[str, Any], second: Dict[str, Any]) -> Dict[str, Any]:
+    """Combine two $match filters into one."""
+    if not first:
+        return second
+    if not second:
+        return first
+    if set(first).isdisjoint(second):
+        return {**first, **second}
+    return {"$and": [first, second]}
+
+
+def optimize_pipeline(pipeline: List[Dict[str, Any]]) -> List[Stage]:
+    """
+    Validate a pipeline and rewrite it for cheaper execution.
+
+    Returns:
+        (stage name, spec) pairs
+
+    Raises:
+        OperationFailure: On malformed or unsupported stages
+    """
+    if not isinstance(pipeline, (list, tuple)):
+        raise OperationFailure("pipeline must be a list of stages")
+    stages: List[Stage] = []
+    for stage in pipeline:
+        if not isinstance(stage, dict) or len(stage) != 1:
+            raise OperationFailure("A pipeline stage specification object must contain exactly one field")
+        name, spec = next(iter(stage.items()))
+        if name not in _STAGES:
+            raise OperationFailure(f"Unrecognized pipeline stage name: '{name}'")
+        stages.append((name, spec))
+
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(stages) - 1):
+            (a_name, a_spec), (b_name, b_spec) = stages[i], stages[i + 1]
+            if a_name == "$match" and b_name == "$match":
+                stages[i:i + 2] = [("$match", _merge_matches(a_spec, b_spec))]
+                changed = True
+                break
+            if a_name == "$sort" and b_name == "$match":
+                stages[i], stages[i + 1] = stages[i + 1], stages[i]
+                changed = True
+                break
+    return stages
+
+
+def _top_k(stages: List[Stage], i: int) -> Optional[int]:
+    """Return the number of sorted documents the stages after a $sort can use."""
+    following = stages[i + 1:i + 3]
+    if following and following[0][0] == "$limit":
+        return _non_negative_int("$limit", following[0][1])
+    if len(following) == 2 and following[0][0] == "$skip" and following[1][0] == "$limit":
+        return (
+            _non_negative_int("$skip", following[0][1])
+            + _non_negative_int("$limit", following[1][1])
+        )
+    return None
+
+
+def run_pipeline(stream: Iterable[Document], stages: List[Stage]) -> Iterator[Document]:
+    """
+    Chain pipeline stages over a document stream.
+
+    Args:
+        stream: Input documents (not modified)
+        stages: Stages from optimize_pipeline
+
+    Returns:
+        A lazy iterator of output documents
+    """
+    result: Iterable[Document] = stream
+    for i, (name, spec) in enumerate(stages):
+        if name == "$match":
+            result = filter(compile_query(spec), result)
+        elif name == "$project":
+            result = map(compile_projection(spec), result)
+        elif name == "$sort":
+            result = _sort_stage(result, _sort_specs(spec), _top_k(stages, i))
+        elif name == "$skip":
+            result = islice(result, _non_negative_int("$skip", spec), None)
+        elif name == "$limit":
+            result = islice(result, _non_negative_int("$limit", spec))
+        elif name == "$group":
+            if not isinstance(spec, dict):
+                raise OperationFailure("a group's fields must be specified in an object")
+            result = _group_stage(result, spec)
+        elif name == "$unwind":
+            result = _unwind_stage(result, spec)
+        elif name == "$count":
+            result = _count_stage(result, spec)
+    return iter(result)
+
+
+class InMemoryAggregationCursor:
+    """Cursor over a lazily evaluated aggregation pipeline."""
+
+    def __init__(self, stream: Iterator[Document]):
+        self._stream = stream
+        self._batch_size = DEFAULT_BATCH_SIZE
+        self._buffer: Deque[Document] = deque()
+        self._batches = 0
+
+    def batch_size(self, batch_size: int):
+        """Set how many documents async iteration materializes per batch."""
+        if not isinstance(batch_size, int) or isinstance(batch_size, bool):
+            raise TypeError("batch_size must be an integer")
+        if batch_size < 0:
+            raise ValueError("batch_size must be >= 0")
+        self._batch_size = batch_size or DEFAULT_BATCH_SIZE
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> List[Document]:
+        """Return the remaining results (at most ``length``) as copies."""
+        if length is not None and length < 0:
+            raise ValueError("length must be >= 0")
+        results = list(islice(self._buffer, length))
+        for _ in range(len(results)):
+            self._buffer.popleft()
+        remaining = None if length is None else length - len(results)
+        results.extend(dict(doc) for doc in islice(self._stream, remaining))
+        return results
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Document:
+        if not self._buffer:
+            if self._batches:
+                await asyncio.sleep(0)
+            self._batches += 1
+            self._buffer.extend(dict(doc) for doc in islice(self._stream, self._batch_size))
+            if not self._buffer:
+                raise StopAsyncIteration
+        return self._buffer.popleft()
+
+    async def next(self) -> Document:
+        """Return the next document, raising StopAsyncIteration when exhausted."""
+        return await self.__anext__()
@@ -0,0 +1,293 @@
+"""
+In-Memory Change Streams
+
+This module provides ``watch()`` for the in-memory database: an
+in-process publish/subscribe feed of committed writes, read through
+change streams that mirror Motor's ``AsyncIOMotorChangeStream``
+interface, so consumers work unchanged against MongoDB.
+
+A ChangeFeed is a bounded log of write records fed by the collection's
+write listeners. Every change stream reading the feed keeps its own
+position in the log, so a write costs one append no matter how many
+streams are open, and a stream can resume from any token still in the
+log. A stream that falls further behind than the log holds fails with
+ChangeStreamHistoryLost, like a MongoDB stream that falls off the oplog.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from pymongo.errors import OperationFailure
+
+from .aggregation import optimize_pipeline, run_pipeline
+
+logger = logging.getLogger(__name__)
+
+# Write records kept for streams that are behind or resuming
+CHANGE_LOG_SIZE = 10_000
+# Namespace database name reported in change events
+DATABASE_NAME = "in_memory"
+# MongoDB error code for a resume point that is no longer in the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+# (sequence, collection name, operation, before, after, wall time)
+ChangeRecord = Tuple[int, str, str, Optional[Dict[str, Any]], Optional[Dict[str, Any]], float]
+
+_EVENT_OPERATIONS = frozenset(["insert", "update", "replace", "delete"])
+_POST_IMAGE_MODES = frozenset(["updateLookup", "whenAvailable", "required"])
+_PRE_IMAGE_MODES = frozenset(["whenAvailable", "required"])
+
+
+def _token(seq: int) -> Dict[str, str]:
+    """Resume token for a record sequence number."""
+    return {"_data": f"{seq:016x}"}
+
+
+def _token_seq(token: Any) -> int:
+    """Sequence number encoded in a resume token."""
+    try:
+        return int(token["_data"], 16)
+    except (KeyError, TypeError, ValueError):
+        raise OperationFailure(f"Invalid resume token: {token!r}", code=260)
+
+
+def _update_description(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    """Describe an update as the top-level fields it set and removed."""
+    return {
+        "updatedFields": {
+            field: value for field, value in after.items()
+            if field not in before or before[field] != value
+        },
+        "removedFields": [field for field in before if field not in after],
+        "truncatedArrays": [],
+    }
+
+
+class ChangeFeed:
+    """Bounded log of committed writes that change streams read from."""
+
+    def __init__(self, capacity: int = CHANGE_LOG_SIZE) -> None:
+        self._records: Deque[ChangeRecord] = deque(maxlen=capacity)
+        self._next_seq = 1
+        # Futures of streams waiting for the next write
+        self._waiters: Set[asyncio.Future] = set()
+
+    @property
+    def position(self) -> int:
+        """Sequence number the next published record will get."""
+        return self._next_seq
+
+    def publish(
+        self,
+        collection_name: str,
+        operation: str,
+        before: Optional[Dict[str, Any]],
+        after: Optional[Dict[str, Any]],
+    ) -> None:
+        """Write listener that appends a record and wakes waiting streams."""
+        if operation not in _EVENT_OPERATIONS:
+            return
+        self._records.append((self._next_seq, collection_name, operation, before, after, time.time()))
+        self._next_seq += 1
+        if self._waiters:
+            waiters, self._waiters = self._waiters, set()
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    def read(self, position: int, limit: int) -> List[ChangeRecord]:
+        """
+        Return up to ``limit`` records starting at sequence ``position``.
+
+        Raises:
+            OperationFailure: If records from ``position`` were already dropped
+        """
+        oldest = self._next_seq - len(self._records)
+        if position < oldest:
+            raise OperationFailure(
+                f"Resume point {position} is no longer in the change log (oldest is {oldest})",
+                code=CHANGE_STREAM_HISTORY_LOST,
+            )
+        offset = position - oldest
+        if offset >= len(self._records):
+            return []
+        return list(itertools.islice(self._records, offset, offset + limit))
+
+    async def wait(self, position: int, timeout: Optional[float]) -> None:
+        """Wait until a record at ``position`` exists, or until the timeout."""
+        if position < self._next_seq:
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.add(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=timeout)
+        finally:
+            self._waiters.discard(waiter)
+            waiter.cancel()
+
+    def wake(self) -> None:
+        """Wake every waiting stream without publishing (used on close)."""
+        waiters, self._waiters = self._waiters, set()
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+class InMemoryChangeStream:
+    """
+    Change stream over a ChangeFeed, compatible with Motor's change streams.
+
+    Use it as ``async with collection.watch() as stream: async for change
+    in stream``, or call ``next()``/``try_next()``. The stream starts at
+    the feed position when ``watch()`` was called, so no write between
+    ``watch()`` and the first read is missed.
+    """
+
+    def __init__(
+        self,
+        feed: ChangeFeed,
+        pipeline: Optional[List[Dict[str, Any]]] = None,
+        full_document: Optional[str] = None,
+        full_document_before_change: Optional[str] = None,
+        resume_after: Optional[Dict[str, Any]] = None,
+        start_after: Optional[Dict[str, Any]] = None,
+        max_await_time_ms: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        on_close: Optional[Callable[[], None]] = None,
+    ):
+        """
+        Initialize the change stream.
+
+        Args:
+            feed: Feed to read write records from
+            pipeline: Aggregation stages applied to each change event
+            full_document: "updateLookup" (or "whenAvailable"/"required") adds
+                the post-update document to update events
+            full_document_before_change: "whenAvailable" or "required" adds
+                the pre-change document to update, replace and delete events
+            resume_after: Resume token; the stream starts after that event
+            start_after: Same as resume_after
+            max_await_time_ms: How long try_next() waits for a change (default 1000)
+            batch_size: Records read from the feed at a time
+            on_close: Called once when the stream closes
+        """
+        self._feed = feed
+        self._stages = optimize_pipeline(pipeline or [])
+        self._full_document = full_document
+        self._full_document_before_change = full_document_before_change
+        self._max_await = (1000 if max_await_time_ms is None else max_await_time_ms) / 1000
+        self._batch_size = batch_size or 100
+        self._on_close = on_close
+        token = resume_after or start_after
+        self._position = feed.position if token is None else _token_seq(token) + 1
+        # Events built from the last read but not yet returned
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._resume_token: Optional[Dict[str, str]] = token
+        self._closed = False
+
+    @property
+    def alive(self) -> bool:
+        """False once the stream has been closed."""
+        return not self._closed
+
+    @property
+    def resume_token(self) -> Optional[Dict[str, str]]:
+        """Token of the last returned change, for resume_after."""
+        return self._resume_token
+
+    def _event(self, record: ChangeRecord) -> Dict[str, Any]:
+        """Build a MongoDB-style change event from a write record."""
+        seq, collection_name, operation, before, after, wall_time = record
+        event: Dict[str, Any] = {
+            "_id": _token(seq),
+            "operationType": operation,
+            "wallTime": datetime.fromtimestamp(wall_time, tz=timezone.utc),
+            "ns": {"db": DATABASE_NAME, "coll": collection_name},
+            "documentKey": {"_id": (after if after is not None else before)["_id"]},
+        }
+        if operation in ("insert", "replace"):
+            event["fullDocument"] = after.copy()
+        elif operation == "update":
+            event["updateDescription"] = _update_description(before, after)
+            if self._full_document in _POST_IMAGE_MODES:
+                event["fullDocument"] = after.copy()
+        if before is not None and self._full_document_before_change in _PRE_IMAGE_MODES:
+            event["fullDocumentBeforeChange"] = before.copy()
+        return event
+
+    def _fill(self) -> None:
+        """Turn any new feed records into pending events."""
+        while not self._pending:
+            records = self._feed.read(self._position, self._batch_size)
+            if not records:
+                return
+            self._position = records[-1][0] + 1
+            events = [self._event(record) for record in records]
+            if self._stages:
+                events = list(run_pipeline(iter(events), self._stages))
+            self._pending.extend(events)
+            if not events:
+                # Every record was filtered out; still advance the resume point
+                self._resume_token = _token(self._position - 1)
+
+    def _pop(self) -> Dict[str, Any]:
+        event = self._pending.popleft()
+        self._resume_token = event.get("_id", self._resume_token)
+        return event
+
+    async def try_next(self) -> Optional[Dict[str, Any]]:
+        """
+        Return the next change, or None if none arrives within max_await_time_ms.
+
+        Raises:
+            OperationFailure: If the stream fell behind the change log
+        """
+        if self._closed:
+            raise StopAsyncIteration
+        self._fill()
+        if not self._pending:
+            await self._feed.wait(self._position, self._max_await)
+            if self._closed:
+                raise StopAsyncIteration
+            self._fill()
+        return self._pop() if self._pending else None
+
+    async def next(self) -> Dict[str, Any]:
+        """
+        Wait for and return the next change.
+
+        Raises:
+            StopAsyncIteration: If the stream is closed
+            OperationFailure: If the stream fell behind the change log
+        """
+        while True:
+            change = await self.try_next()
+            if change is not None:
+                return change
+
+    def __aiter__(self) -> "InMemoryChangeStream":
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        return await self.next()
+
+    async def close(self) -> None:
+        """Close the stream and wake a pending next() so it stops iterating."""
+        if self._closed:
+            return
+        self._closed = True
+        self._pending.clear()
+        if self._on_close is not None:
+            self._on_close()
+        self._feed.wake()
+
+    async def __aenter__(self) -> "InMemoryChangeStream":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
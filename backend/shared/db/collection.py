@@ -5,32 +5,229 @@ This module provides a collection implementation for the in-memory database.
 """
 
 import asyncio
+import itertools
 import logging
 import time
-from typing import Dict, Any, Optional, List
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, FrozenSet, Iterator, NamedTuple, Optional, List, Set, Tuple
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure, WriteError
 
 # Import related classes
-from .cursor import InMemoryCursor
+from .aggregation import (
+    InMemoryAggregationCursor,
+    compile_projection,
+    optimize_pipeline,
+    run_pipeline,
+)
+from .changes import ChangeFeed, InMemoryChangeStream
+from .cursor import InMemoryCursor, compile_sort_key
+from .index import CollectionIndex, freeze, normalize_index_keys
+from .locks import AsyncReadWriteLock
+from .storage import (
+    STORAGE_COLUMNAR,
+    STORAGE_DICT,
+    STORAGE_MODES,
+    ColumnarDocumentStore,
+    estimate_memory,
+)
+from .ttl import ExpiryQueue
+from .query import (
+    Matcher,
+    QueryConditions,
+    analyze_query,
+    compile_query,
+    query_fields,
+    query_key,
+)
+from .results import (
+    BulkWriteResult,
+    DeleteResult,
+    InsertManyResult,
+    InsertOneResult,
+    UpdateResult,
+)
 
 logger = logging.getLogger(__name__)
 
+# Queries whose plan examines fewer candidates than this are cheap enough
+# that caching them would only cost LRU slots and invalidation work.
+CACHE_MIN_CANDIDATES = 32
+
+# Past this many (inserted document x cached query) checks, a batch clears
+# the query cache instead of testing every cached matcher against every insert
+BATCH_INVALIDATION_LIMIT = 10_000
+
+# listener(collection_name, operation, before, after). Operations are
+# "insert", "update", "replace" and "delete" (with the stored documents
+# before and after the write) and "create_index"/"drop_index" (with index
+# descriptions).
+WriteListener = Callable[[str, str, Optional[Dict[str, Any]], Optional[Dict[str, Any]]], None]
+
+
+class _CachedQuery(NamedTuple):
+    """Cached candidate keys for a filter, revalidated with the matcher on read."""
+
+    keys: List[Any]
+    fields: FrozenSet[str]
+    matcher: Matcher
+    timestamp: float
+
+
+class _QueryPlan(NamedTuple):
+    """Candidate snapshot, matcher and (if cacheable) cache key for a filter."""
+
+    docs: List[Dict[str, Any]]
+    matcher: Optional[Matcher]
+    cache_key: Any = None
+
+
+class _WriteBatch(NamedTuple):
+    """Cache invalidation deferred until the end of a batch of writes."""
+
+    documents: List[Dict[str, Any]]
+    fields: Set[str]
+
+
+class _BulkRequests:
+    """
+    Collects pymongo write request objects (InsertOne, UpdateOne, ...).
+
+    pymongo requests describe themselves by calling these methods on a bulk
+    builder, so the public request classes work without reading their
+    private attributes.
+    """
+
+    def __init__(self) -> None:
+        # (kind, arguments) in request order
+        self.operations: List[Tuple[str, Dict[str, Any]]] = []
+
+    def add_insert(self, document: Dict[str, Any]) -> None:
+        self.operations.append(("insert", {"document": document}))
+
+    def add_update(self, selector, update, multi=False, upsert=False, **kwargs) -> None:
+        self.operations.append(
+            ("update", {"filter": selector, "update": update, "multi": multi, "upsert": upsert})
+        )
+
+    def add_replace(self, selector, replacement, upsert=False, **kwargs) -> None:
+        self.operations.append(
+            ("replace", {"filter": selector, "replacement": replacement, "upsert": upsert})
+        )
+
+    def add_delete(self, selector, limit, **kwargs) -> None:
+        self.operations.append(("delete", {"filter": selector, "multi": limit == 0}))
+
+
+def _write_error(index: int, error: OperationFailure, op: Any) -> Dict[str, Any]:
+    """Build a server-style writeErrors entry."""
+    code = error.code
+    if code is None and isinstance(error, DuplicateKeyError):
+        code = 11000
+    return {"index": index, "code": code, "errmsg": str(error), "op": op}
+
+
+def _updated_document(doc: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a new document with an update applied; ``doc`` is not modified."""
+    updated = doc.copy()
+    # Handle $set operator
+    if "$set" in update:
+        for key, value in update["$set"].items():
+            updated[key] = value
+    # Handle $inc operator
+    if "$inc" in update:
+        for key, value in update["$inc"].items():
+            updated[key] = updated.get(key, 0) + value
+    # Handle direct update only if no operators used
+    if not any(op in update for op in ["$set", "$inc"]):
+        for key, value in update.items():
+            if key != "_id":  # Don't update _id
+                updated[key] = value
+    return updated
+
+
+def _updated_fields(update: Dict[str, Any]) -> FrozenSet[str]:
+    """Return the top-level fields an update document writes."""
+    if any(op in update for op in ["$set", "$inc"]):
+        paths = [key for op in ("$set", "$inc") for key in update.get(op, {})]
+    else:
+        paths = [key for key in update if key != "_id"]
+    return frozenset(path.split(".", 1)[0] for path in paths)
+
 
 class InMemoryCollection:
     """In-memory collection implementation for testing."""
 
-    def __init__(self, name: str, max_cache_size: int = 1000):
+    def __init__(self, name: str, max_cache_size: int = 1000, storage: str = STORAGE_DICT):
+        """
+        Initialize the collection.
+
+        Args:
+            name: Collection name
+            max_cache_size: Maximum number of cached query results
+            storage: "dict" keeps each document as a dict; "columnar" stores
+                documents column-wise to cut memory for large collections
+
+        Raises:
+            ValueError: If the storage mode is unknown
+        """
+        if storage not in STORAGE_MODES:
+            raise ValueError(f"Unknown storage mode '{storage}', expected one of {STORAGE_MODES}")
         self.name = name
-        self.data: List[Dict[str, Any]] = []
+        self.storage = storage
+        # Primary key map: frozen _id -> stored document, in insertion order.
+        # Stored documents are never mutated; updates swap in a new dict.
+        self._by_id: "MutableMapping[Any, Dict[str, Any]]" = self._new_store()
+        # Secondary indexes by name
+        self._indexes: Dict[str, CollectionIndex] = {}
         self._id_counter = 1  # For auto-incrementing IDs
-        self._lock = asyncio.Lock()  # Add lock for thread safety
+        # Writers take the write side; reads run lock-free over copy-on-write
+        # snapshots, and only multi-step readers (clone_data) take the read side
+        self._lock = AsyncReadWriteLock()
+        # Query cache: canonical query key -> cached candidates, in LRU order
+        self._query_cache: "OrderedDict[Any, _CachedQuery]" = OrderedDict()
+        self._max_cache_size = max_cache_size
+        self._cache_ttl = 60.0
+        # Bumped on every write so in-flight cursors don't cache stale results
+        self._generation = 0
+        self._stats = {
+            'cache_hits': 0, 'cache_misses': 0, 'total_queries': 0,
+            'cache_evictions': 0, 'cache_invalidations': 0,
+            'last_cache_cleanup': time.time()
+        }
         # Operation metrics for monitoring
         self._operation_count = {
             'find': 0, 'find_one': 0, 'insert_one': 0, 'insert_many': 0,
             'update_one': 0, 'update_many': 0, 'delete_one': 0, 'delete_many': 0,
-            'count_documents': 0, 'find_one_and_update': 0
+            'count_documents': 0, 'find_one_and_update': 0, 'create_index': 0,
+            'aggregate': 0, 'bulk_write': 0
         }
+        # Called synchronously after every committed write (see WriteListener)
+        self._write_listeners: List[WriteListener] = []
+        # Set while a batch of writes defers query cache invalidation
+        self._batch: Optional[_WriteBatch] = None
+        # Expiry times for documents under TTL indexes
+        self._expiry = ExpiryQueue()
+        # Change log for watch(), created by the first stream
+        self._change_feed: Optional[ChangeFeed] = None
+        self._open_streams = 0
         logger.info(f"Initialized InMemoryCollection: {name}")
 
+    def _new_store(
+        self, documents: Optional[Dict[Any, Dict[str, Any]]] = None
+    ) -> "MutableMapping[Any, Dict[str, Any]]":
+        """Create an empty (or pre-filled) primary store for the storage mode."""
+        if self.storage == STORAGE_COLUMNAR:
+            return ColumnarDocumentStore(documents)
+        return dict(documents or {})
+
+    @property
+    def data(self) -> List[Dict[str, Any]]:
+        """Stored documents in insertion order (a snapshot list)."""
+        return list(self._by_id.values())
+
     def _log_operation(self, operation: str, **kwargs):
         """Log database operation with metrics."""
         self._operation_count[operation] += 1
@@ -40,187 +237,592 @@ class InMemoryCollection:
         )
 
     def get_metrics(self) -> dict:
-        """Get collection operation metrics."""
-        return {
+        """Get collection operation metrics, including estimated memory per document."""
+        memory = estimate_memory(self._by_id)
+        metrics = {
             'collection_name': self.name,
-            'document_count': len(self.data),
+            'document_count': len(self._by_id),
             'operation_counts': self._operation_count.copy(),
-            'next_id': self._id_counter
+            'index_count': len(self._indexes),
+            'next_id': self._id_counter,
+            'storage': self.storage,
+            'memory_bytes': memory['total_bytes'],
+            'memory_per_document': memory['bytes_per_document'],
         }
+        if isinstance(self._by_id, ColumnarDocumentStore):
+            metrics['storage_layout'] = self._by_id.describe()
+        if self._expiry:
+            metrics['ttl'] = self._expiry.get_stats()
+        if self._change_feed is not None:
+            metrics['change_streams'] = {
+                'open': self._open_streams, 'position': self._change_feed.position,
+            }
+        return metrics
 
-    async def find(self, query=None):
-        """Find documents matching query."""
-        self._log_operation('find', query=query)
-        if query is None:
-            result = [doc.copy() for doc in self.data]
-        else:
-            result = []
-            for doc in self.data:
-                match = True
-                for key, value in query.items():
-                    if key not in doc or doc[key] != value:
-                        match = False
+    async def set_storage(self, storage: str) -> Dict[str, Any]:
+        """
+        Convert the collection to another storage mode.
+
+        Indexes and cached queries refer to documents by _id, so they stay
+        valid across the conversion.
+
+        Args:
+            storage: "dict" or "columnar"
+
+        Returns:
+            Memory per document before and after the conversion
+        """
+        if storage not in STORAGE_MODES:
+            raise ValueError(f"Unknown storage mode '{storage}', expected one of {STORAGE_MODES}")
+        async with self._lock.write():
+            before = estimate_memory(self._by_id)
+            self.storage = storage
+            self._by_id = self._new_store(dict(self._by_id.items()))
+            after = estimate_memory(self._by_id)
+        logger.info(
+            f"Converted collection '{self.name}' to {storage} storage: "
+            f"{before['bytes_per_document']} -> {after['bytes_per_document']} bytes per document"
+        )
+        return {
+            'memory_per_document_before': before['bytes_per_document'],
+            'memory_per_document_after': after['bytes_per_document'],
+        }
+
+    def add_write_listener(self, listener: WriteListener) -> None:
+        """Register a callback invoked after every committed write."""
+        if listener not in self._write_listeners:
+            self._write_listeners.append(listener)
+
+    def remove_write_listener(self, listener: WriteListener) -> None:
+        """Unregister a write callback; unknown listeners are ignored."""
+        if listener in self._write_listeners:
+            self._write_listeners.remove(listener)
+
+    def _notify(
+        self,
+        operation: str,
+        before: Optional[Dict[str, Any]],
+        after: Optional[Dict[str, Any]],
+    ) -> None:
+        """Tell write listeners about a committed write.
+
+        Listeners receive the stored documents themselves, which are never
+        mutated, so they may keep references without copying. A failing
+        listener is logged and never fails the write.
+        """
+        for listener in self._write_listeners:
+            try:
+                listener(self.name, operation, before, after)
+            except Exception as e:
+                logger.error(f"Write listener failed for {operation} on '{self.name}': {e}")
+
+    def _index_candidates(self, conditions: QueryConditions) -> Optional[List[Any]]:
+        """
+        Pick the most selective index for a filter.
+
+        Returns:
+            Document keys that may match, or None when no index applies.
+            Callers must still check each document against the matcher.
+        """
+        equals, ins, ranges = conditions.equals, conditions.ins, conditions.ranges
+        if "_id" in equals:
+            key = freeze(equals["_id"])
+            return [key] if key in self._by_id else []
+        if "_id" in ins:
+            keys = dict.fromkeys(freeze(value) for value in ins["_id"])
+            return [key for key in keys if key in self._by_id]
+
+        best: Optional[List[Any]] = None
+        for index in self._indexes.values():
+            fields = index.fields
+            if all(field in equals for field in fields):
+                keys = index.lookup(tuple(equals[field] for field in fields))
+            elif index.hashed:
+                if len(fields) != 1 or fields[0] not in ins:
+                    continue
+                keys = list(dict.fromkeys(
+                    key for value in ins[fields[0]] for key in index.lookup((value,))
+                ))
+            else:
+                prefix = []
+                for field in fields:
+                    if field not in equals:
                         break
-                if match:
-                    result.append(doc.copy())
+                    prefix.append(equals[field])
+                head = tuple(prefix)
+                following = fields[len(prefix)]
+                if following in ranges:
+                    lower, upper = ranges[following]
+                    keys = list(index.scan(head, lower=lower, upper=upper))
+                elif following in ins:
+                    keys = list(dict.fromkeys(
+                        key for value in ins[following]
+                        for key in index.scan(head + (value,))
+                    ))
+                elif head:
+                    keys = list(index.scan(head))
+                else:
+                    continue
+            if best is None or len(keys) < len(best):
+                best = keys
+                if not best:
+                    break
+        return best
 
-        # Cache the result
-        await self._cache_result(cache_key, result, current_time)
-        return InMemoryCursor(result)
+    def _plan(self, query: Optional[Dict[str, Any]], record_stats: bool = True) -> _QueryPlan:
+        """
+        Resolve a filter to a snapshot of candidate documents and a matcher.
 
-    async def find_one(self, query=None):
-        """Find one document matching query."""
-        cursor = await self.find(query)
-        result = await cursor.to_list(1)
-        return result[0] if result else None
+        Stored documents are replaced rather than mutated, so the snapshot is
+        a list of references that stays consistent while writes continue.
+        Candidates come from the query cache, an index, or a full scan.
+        """
+        if not query:
+            return _QueryPlan(list(self._by_id.values()), None)
+        matcher = compile_query(query)
+        cache_key = query_key(query)
+        # Mid-batch the cache may still hold entries the batch made stale
+        cached = None if self._batch is not None else self._cached_candidates(cache_key, record_stats)
+        if cached is not None:
+            by_id = self._by_id
+            return _QueryPlan([by_id[key] for key in cached if key in by_id], matcher)
 
-    async def insert_one(self, document):
-        """Insert one document."""
+        keys = self._index_candidates(analyze_query(query))
+        if keys is None:
+            docs = list(self._by_id.values())
+        else:
+            docs = [self._by_id[key] for key in keys]
+        if len(docs) < CACHE_MIN_CANDIDATES:
+            cache_key = None
+        return _QueryPlan(docs, matcher, cache_key)
+
+    def _sorted_candidates(
+        self,
+        query: Optional[Dict[str, Any]],
+        sort_specs: List[Tuple[str, int]],
+        budget: int,
+    ) -> Optional[Iterator[Dict[str, Any]]]:
+        """
+        Find a sorted index that returns candidates already in sort order.
+
+        An index covers the sort when, after leading fields fixed by equality
+        in the filter, its next fields are exactly the sort fields. The sorted
+        entries are ascending, so the sort must use one direction throughout.
+
+        Args:
+            query: The cursor's filter
+            sort_specs: (field, direction) pairs
+            budget: Candidates the regular plan would examine; the index
+                range is only used if it is no larger
+
+        Returns:
+            A lazy iterator of documents in sort order, or None
+        """
+        directions = {direction for _, direction in sort_specs}
+        if len(directions) != 1:
+            return None
+        reverse = directions == {-1}
+        sort_fields = [field for field, _ in sort_specs]
+        conditions = analyze_query(query)
+
+        best = None
+        for index in self._indexes.values():
+            if index.hashed or index.sparse:
+                continue
+            fields = index.fields
+            fixed = 0
+            while (
+                fixed < len(fields)
+                and fields[fixed] in conditions.equals
+                and fields[fixed] not in sort_fields
+            ):
+                fixed += 1
+            if fields[fixed:fixed + len(sort_fields)] != sort_fields:
+                continue
+            head = tuple(conditions.equals[field] for field in fields[:fixed])
+            lower, upper = conditions.ranges.get(sort_fields[0], (None, None))
+            size = index.range_size(head, lower, upper)
+            if size <= budget and (best is None or size < best[0]):
+                best = (size, index, head, lower, upper)
+
+        if best is None:
+            return None
+        _, index, head, lower, upper = best
+        by_id = self._by_id
+        return (by_id[key] for key in index.scan(head, lower, upper, reverse=reverse))
+
+    def _iter_matching(
+        self, query: Optional[Dict[str, Any]], record_stats: bool = True
+    ) -> Iterator[Dict[str, Any]]:
+        """Iterate stored documents matching a filter, using indexes when possible."""
+        plan = self._plan(query, record_stats)
+        return iter(plan.docs) if plan.matcher is None else filter(plan.matcher, plan.docs)
+
+    def _exact_index_count(self, query: Dict[str, Any]) -> Optional[int]:
+        """Answer a count from an index whose fields are exactly the filter keys."""
+        conditions = analyze_query(query)
+        if not conditions.exact:
+            return None
+        for index in self._indexes.values():
+            if not index.sparse and len(index.fields) == len(query) and all(
+                field in query for field in index.fields
+            ):
+                return index.count(tuple(query[field] for field in index.fields))
+        return None
+
+    def _store(self, doc: Dict[str, Any]) -> None:
+        """Add a document to the primary map and every index."""
+        key = freeze(doc["_id"])
+        if key in self._by_id:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.name} index: _id_ "
+                f"dup key: {{ _id: {doc['_id']!r} }}"
+            )
+        for index in self._indexes.values():
+            index.check(key, doc)
+        self._by_id[key] = doc
+        for index in self._indexes.values():
+            index.add(key, doc)
+        if self._expiry:
+            self._expiry.schedule(key, doc)
+        self._generation += 1
+        if self._batch is not None:
+            self._batch.documents.append(doc)
+        else:
+            self._invalidate_for_document(doc)
+        self._notify("insert", None, doc)
+
+    def _unindex(self, doc: Dict[str, Any]) -> None:
+        """Remove a document from the primary map and every index."""
+        key = freeze(doc["_id"])
+        self._by_id.pop(key, None)
+        for index in self._indexes.values():
+            index.remove(key)
+        # Cached candidate lists skip missing keys, so no invalidation needed
+        self._generation += 1
+        self._notify("delete", doc, None)
+
+    def _apply_update(self, doc: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Apply an update copy-on-write and return the new stored document.
+
+        The previous document object is left untouched, so cursors and
+        callers still holding it keep a consistent snapshot.
+        """
+        return self._swap(doc, _updated_document(doc, update), _updated_fields(update))
+
+    def _swap(
+        self,
+        doc: Dict[str, Any],
+        updated: Dict[str, Any],
+        fields: FrozenSet[str],
+        operation: str = "update",
+    ) -> Dict[str, Any]:
+        """Store a new version of a document whose top-level ``fields`` changed."""
+        if updated.get("_id") != doc.get("_id"):
+            raise WriteError(
+                "Performing an update on the path '_id' would modify the immutable field '_id'",
+                code=66,
+            )
+
+        self._replace(freeze(doc["_id"]), updated)
+        if self._batch is not None:
+            self._batch.fields.update(fields)
+        else:
+            self._invalidate_for_fields(fields)
+        self._notify(operation, doc, updated)
+        return updated
+
+    def _replace(self, key: Any, updated: Dict[str, Any]) -> None:
+        """Swap in a new version of a stored document and reindex it."""
+        # Validate every unique index before touching the stored document
+        for index in self._indexes.values():
+            index.check(key, updated)
+        previous = self._by_id.get(key) if self._expiry else None
+        self._by_id[key] = updated
+        for index in self._indexes.values():
+            index.update(key, updated)
+        if self._expiry:
+            self._expiry.schedule(key, updated, previous)
+        self._generation += 1
+
+    async def find(self, query=None, projection=None):
+        """Find documents matching query, optionally projecting fields."""
+        self._log_operation('find', query=query)
+        plan = self._plan(query)
+        on_exhausted = None
+        if plan.cache_key is not None:
+            generation = self._generation
+
+            def on_exhausted(matched: List[Dict[str, Any]]) -> None:
+                # Only cache results computed against the current data
+                if self._generation == generation:
+                    self._cache_result(plan.cache_key, matched, plan.matcher, query_fields(query))
+
+        def sorted_source(sort_specs: List[Tuple[str, int]]) -> Optional[Iterator[Dict[str, Any]]]:
+            return self._sorted_candidates(query, sort_specs, len(plan.docs))
+
+        # Filtering, sorting, skip/limit and copying happen lazily in the cursor
+        return InMemoryCursor(
+            plan.docs,
+            matcher=plan.matcher,
+            on_exhausted=on_exhausted,
+            sorted_source=sorted_source,
+            projector=compile_projection(projection) if projection else None,
+        )
+
+    async def find_one(self, query=None, projection=None):
+        """Find one document matching query, optionally projecting fields."""
+        self._log_operation('find_one', query=query)
+        for doc in self._iter_matching(query):
+            return compile_projection(projection)(doc) if projection else doc.copy()
+        return None
+
+    def aggregate(self, pipeline, **kwargs):
+        """
+        Run an aggregation pipeline.
+
+        Like Motor, this returns a cursor synchronously; stages run lazily
+        as the cursor is consumed. A leading $match (after pipeline
+        rewriting) is planned like a find, so it can use indexes and the
+        query cache.
+
+        Args:
+            pipeline: List of stage documents
+            **kwargs: Accepted for driver compatibility and ignored
+
+        Returns:
+            InMemoryAggregationCursor over the results
+        """
+        self._log_operation('aggregate', pipeline=pipeline)
+        stages = optimize_pipeline(pipeline)
+        query = None
+        if stages and stages[0][0] == "$match":
+            query = stages.pop(0)[1]
+        plan = self._plan(query)
+        docs = iter(plan.docs) if plan.matcher is None else filter(plan.matcher, plan.docs)
+        return InMemoryAggregationCursor(run_pipeline(docs, stages))
+
+    def _insert(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy a document, assign an _id if needed and store it."""
         doc_copy = document.copy()
         # Auto-assign _id if not present
-        async with self._lock:
-            if '_id' not in doc_copy:
-                doc_copy['_id'] = self._id_counter
+        if '_id' not in doc_copy:
+            while freeze(self._id_counter) in self._by_id:
                 self._id_counter += 1
+            doc_copy['_id'] = self._id_counter
+            self._id_counter += 1
+        self._store(doc_copy)
+        return doc_copy
+
+    @contextmanager
+    def _write_batch(self) -> Iterator[None]:
+        """
+        Defer query cache invalidation until a batch of writes completes.
+
+        The batch body must not await, so no reader can observe the cache
+        between a write and its invalidation.
+        """
+        if self._batch is not None:
+            yield
+            return
+        self._batch = _WriteBatch([], set())
+        try:
+            yield
+        finally:
+            batch, self._batch = self._batch, None
+            self._invalidate_for_documents(batch.documents)
+            self._invalidate_for_fields(frozenset(batch.fields))
+
+    def _update_matching(
+        self, filter: Dict[str, Any], update: Dict[str, Any], multi: bool, upsert: bool = False
+    ) -> UpdateResult:
+        """Apply an update to the first or every matching document."""
+        matching = self._iter_matching(filter, record_stats=False)
+        # Materialize first: updates may move documents between index buckets
+        matched = list(matching if multi else itertools.islice(matching, 1))
+        for doc in matched:
+            self._apply_update(doc, update)
+        if matched or not upsert:
+            return UpdateResult(len(matched), len(matched))
+        seed = {
+            field: value for field, value in analyze_query(filter).equals.items()
+            if "." not in field
+        }
+        return UpdateResult(0, 0, self._insert(_updated_document(seed, update))["_id"])
+
+    def _replace_matching(
+        self, filter: Dict[str, Any], replacement: Dict[str, Any], upsert: bool = False
+    ) -> UpdateResult:
+        """Replace the first matching document, keeping its _id."""
+        for doc in self._iter_matching(filter, record_stats=False):
+            updated = {"_id": doc["_id"], **replacement}
+            self._swap(doc, updated, frozenset(doc) | frozenset(updated), operation="replace")
+            return UpdateResult(1, 1)
+        if not upsert:
+            return UpdateResult(0, 0)
+        seed = dict(replacement)
+        equals = analyze_query(filter).equals
+        if "_id" not in seed and "_id" in equals:
+            seed["_id"] = equals["_id"]
+        return UpdateResult(0, 0, self._insert(seed)["_id"])
+
+    def _delete_matching(self, filter: Dict[str, Any], multi: bool) -> DeleteResult:
+        """Delete the first or every matching document."""
+        matching = self._iter_matching(filter, record_stats=False)
+        doomed = list(matching if multi else itertools.islice(matching, 1))
+        for doc in doomed:
+            self._unindex(doc)
+        return DeleteResult(len(doomed))
+
+    async def insert_one(self, document):
+        """Insert one document."""
+        async with self._lock.write():
+            doc = self._insert(document)
+        return InsertOneResult(doc["_id"])
+
+    async def insert_many(self, documents, ordered: bool = True, **kwargs):
+        """
+        Insert many documents in one batch.
+
+        The lock is taken once and the query cache is invalidated once for
+        the whole batch.
 
-            self.data.append(doc_copy)
+        Args:
+            documents: Documents to insert
+            ordered: Stop at the first failed insert (default); when False,
+                attempt every document and report all failures
+            **kwargs: Accepted for driver compatibility and ignored
 
-        # Invalidate cache after data modification
-        await self.invalidate_cache()
-        return {"inserted_id": doc_copy.get("_id")}
+        Returns:
+            InsertManyResult with the inserted ids
 
-    async def insert_many(self, documents):
-        """Insert many documents."""
+        Raises:
+            BulkWriteError: If any document could not be inserted
+        """
         inserted_ids = []
-        for doc in documents:
-            result = await self.insert_one(doc)
-            inserted_ids.append(result["inserted_id"])
-        return {"inserted_ids": inserted_ids}
+        write_errors = []
+        async with self._lock.write():
+            with self._write_batch():
+                for position, document in enumerate(documents):
+                    try:
+                        inserted_ids.append(self._insert(document)["_id"])
+                    except OperationFailure as e:
+                        write_errors.append(_write_error(position, e, document))
+                        if ordered:
+                            break
+        self._log_operation('insert_many', count=len(inserted_ids))
+
+        if write_errors:
+            result = BulkWriteResult()
+            result["inserted_count"] = len(inserted_ids)
+            raise BulkWriteError(result.details(write_errors))
+        return InsertManyResult(inserted_ids)
+
+    async def bulk_write(self, requests, ordered: bool = True, **kwargs):
+        """
+        Execute a list of write requests in one batch.
+
+        Accepts pymongo's InsertOne, UpdateOne, UpdateMany, ReplaceOne,
+        DeleteOne and DeleteMany. The lock is taken once and the query cache
+        is invalidated once for the whole batch.
+
+        Args:
+            requests: Write request objects
+            ordered: Stop at the first failed request (default); when False,
+                attempt every request and report all failures
+            **kwargs: Accepted for driver compatibility and ignored
+
+        Returns:
+            BulkWriteResult with per-kind counts and upserted ids
+
+        Raises:
+            BulkWriteError: If any request failed; ``details`` holds the
+                counts for the requests that succeeded
+        """
+        collector = _BulkRequests()
+        for request in requests:
+            try:
+                request._add_to_bulk(collector)
+            except AttributeError:
+                raise TypeError(f"{request!r} is not a valid write request") from None
+
+        result = BulkWriteResult()
+        write_errors = []
+        async with self._lock.write():
+            with self._write_batch():
+                for position, (kind, args) in enumerate(collector.operations):
+                    try:
+                        if kind == "insert":
+                            self._insert(args["document"])
+                            result["inserted_count"] += 1
+                            continue
+                        if kind == "delete":
+                            deleted = self._delete_matching(args["filter"], args["multi"])
+                            result["deleted_count"] += deleted["deleted_count"]
+                            continue
+                        if kind == "update":
+                            updated = self._update_matching(
+                                args["filter"], args["update"], args["multi"], args["upsert"]
+                            )
+                        else:
+                            updated = self._replace_matching(
+                                args["filter"], args["replacement"], args["upsert"]
+                            )
+                        result["matched_count"] += updated["matched_count"]
+                        result["modified_count"] += updated["modified_count"]
+                        if updated["upserted_id"] is not None:
+                            result["upserted_count"] += 1
+                            result["upserted_ids"][position] = updated["upserted_id"]
+                    except OperationFailure as e:
+                        write_errors.append(_write_error(position, e, args))
+                        if ordered:
+                            break
+        self._log_operation('bulk_write', requests=len(collector.operations))
+
+        if write_errors:
+            raise BulkWriteError(result.details(write_errors))
+        return result
 
     async def update_one(self, filter, update, **kwargs):
         """Update one document matching filter."""
-        async with self._lock:
-            for i, doc in enumerate(self.data):
-                match = True
-                for key, value in filter.items():
-                    if key not in doc or doc[key] != value:
-                        match = False
-                        break
-
-                if match:
-                    # Handle $set operator
-                    if "$set" in update:
-                        for key, value in update["$set"].items():
-                            self.data[i][key] = value
-                    # Handle $inc operator
-                    if "$inc" in update:
-                        for key, value in update["$inc"].items():
-                            current = self.data[i].get(key, 0)
-                            self.data[i][key] = current + value
-                    # Handle direct update
-                    elif not any(op in update for op in ["$set", "$inc"]):
-                        for key, value in update.items():
-                            if key != "_id":  # Don't update _id
-                                self.data[i][key] = value
-                    # Invalidate cache after data modification
-                    await self.invalidate_cache()
-                    return {
-                        "modified_count": 1,
-                        "matched_count": 1,
-                    }
-
-        return {"modified_count": 0, "matched_count": 0}
+        async with self._lock.write():
+            return self._update_matching(filter, update, multi=False, upsert=kwargs.get("upsert", False))
 
     async def update_many(self, filter, update, **kwargs):
         """Update many documents matching filter."""
-        modified_count = 0
-        matched_count = 0
-
-        async with self._lock:
-            for i, doc in enumerate(self.data):
-                match = True
-                for key, value in filter.items():
-                    if key not in doc or doc[key] != value:
-                        match = False
-                        break
-
-                if match:
-                    matched_count += 1
-                    updated = False
-                    # Handle $set operator
-                    if "$set" in update:
-                        for key, value in update["$set"].items():
-                            self.data[i][key] = value
-                        updated = True
-                    # Handle $inc operator
-                    if "$inc" in update:
-                        for key, value in update["$inc"].items():
-                            current = self.data[i].get(key, 0)
-                            self.data[i][key] = current + value
-                        updated = True
-                    # Handle direct update only if no operators used
-                    if not updated:
-                        for key, value in update.items():
-                            if key != "_id":  # Don't update _id
-                                self.data[i][key] = value
-                        updated = True
-                    if updated:
-                        modified_count += 1
-
-        return {
-            "modified_count": modified_count,
-            "matched_count": matched_count,
-        }
+        async with self._lock.write():
+            with self._write_batch():
+                return self._update_matching(filter, update, multi=True, upsert=kwargs.get("upsert", False))
 
     async def delete_one(self, filter):
         """Delete one document matching filter."""
-        async with self._lock:
-            for i, doc in enumerate(self.data):
-                match = True
-                for key, value in filter.items():
-                    if key not in doc or doc[key] != value:
-                        match = False
-                        break
-
-                if match:
-                    self.data.pop(i)
-                    return {"deleted_count": 1}
-
-        return {"deleted_count": 0}
+        async with self._lock.write():
+            return self._delete_matching(filter, multi=False)
 
     async def delete_many(self, filter):
         """Delete many documents matching filter."""
-        async with self._lock:
-            original_count = len(self.data)
-            # Filter out documents that don't match
-            self.data = [
-                doc for doc in self.data
-                if not all(
-                    key in doc and doc[key] == value
-                    for key, value in filter.items()
-                )
-            ]
-            deleted_count = original_count - len(self.data)
-
-        return {"deleted_count": deleted_count}
+        async with self._lock.write():
+            return self._delete_matching(filter, multi=True)
 
     async def count_documents(self, query=None):
-        """Count documents matching query."""
-        async with self._lock:
-            if query is None:
-                return len(self.data)
-
-            # Simple query implementation with thread safety
-            count = 0
-            for doc in self.data:
-                match = True
-                for key, value in query.items():
-                    if key not in doc or doc[key] != value:
-                        match = False
-                        break
-                if match:
-                    count += 1
+        """
+        Count documents matching query.
+
+        Lock-free: the count runs synchronously over a copy-on-write
+        snapshot, so no write can interleave with it.
+        """
+        if not query:
+            return len(self._by_id)
+
+        count = self._exact_index_count(query)
+        if count is not None:
             return count
+        plan = self._plan(query)
+        matched = list(filter(plan.matcher, plan.docs))
+        if plan.cache_key is not None:
+            self._cache_result(plan.cache_key, matched, plan.matcher, query_fields(query))
+        return len(matched)
 
     async def find_one_and_update(self, filter, update, **kwargs):
         """Find one document and update it."""
@@ -235,148 +837,342 @@ class InMemoryCollection:
             else:
                 return_document = ReturnDocument.BEFORE
 
-        async with self._lock:
-            for i, doc in enumerate(self.data):
-                match = True
-                for key, value in filter.items():
-                    if key not in doc or doc[key] != value:
-                        match = False
-                        break
-
-                if match:
-                    # Keep original document for return
-                    original = self.data[i].copy()
-
-                    # Handle $set operator
-                    if "$set" in update:
-                        for key, value in update["$set"].items():
-                            self.data[i][key] = value
-                    # Handle $inc operator
-                    if "$inc" in update:
-                        for key, value in update["$inc"].items():
-                            current = self.data[i].get(key, 0)
-                            self.data[i][key] = current + value
-                    # Handle direct update only if no operators used
-                    if not any(op in update for op in ["$set", "$inc"]):
-                        for key, value in update.items():
-                            if key != "_id":  # Don't update _id
-                                self.data[i][key] = value
-
-                    # Return based on return_document option
-                    if return_document == ReturnDocument.AFTER:
-                        return self.data[i].copy()
-                    else:
-                        return original
+        async with self._lock.write():
+            matching = self._iter_matching(filter, record_stats=False)
+            sort = kwargs.get("sort")
+            if sort:
+                # Update the first match in sort order, e.g. the oldest queued entry
+                key, reverse = compile_sort_key(normalize_index_keys(sort))
+                doc = (max if reverse else min)(matching, key=key, default=None)
+            else:
+                doc = next(matching, None)
+            if doc is None:
+                return None
+            updated = self._apply_update(doc, update)
 
-        return None
+        # Return based on return_document option; the original is an
+        # untouched snapshot thanks to copy-on-write updates
+        if return_document == ReturnDocument.AFTER:
+            return updated.copy()
+        return doc.copy()
 
     async def create_index(self, keys, **kwargs):
-        """Create index for query optimization in in-memory implementation."""
-        # Initialize indexes dict if not exists
-        if not hasattr(self, '_indexes'):
-            self._indexes = {}
-
-        # Parse index specification
-        if isinstance(keys, list):
-            index_name = "_".join([f"{k[0]}_{k[1]}" for k in keys])
-            index_fields = [k[0] for k in keys]
-        elif isinstance(keys, str):
-            index_name = f"{keys}_1"
-            index_fields = [keys]
-        else:
-            # Handle dict format like {"field": 1}
-            index_fields = list(keys.keys())
-            index_name = "_".join([f"{k}_1" for k in index_fields])
-
-        # Create index structure for future optimization
-        index_config = {
-            'fields': index_fields,
-            'unique': kwargs.get('unique', False),
-            'sparse': kwargs.get('sparse', False),
-            'name': kwargs.get('name', index_name)
-        }
+        """
+        Create an index that find, update, delete and count queries can use.
 
-        self._indexes[index_name] = index_config
-        self._log_operation('create_index', index=index_name, fields=index_fields)
+        Args:
+            keys: Field name, list of (field, direction) pairs, or dict
+            **kwargs: Index options such as unique, sparse, name and
+                expireAfterSeconds (a TTL index on a single date field)
 
-        logger.info(f"Created index '{index_name}' on collection '{self.name}' for fields: {index_fields}")
+        Returns:
+            The index name
+
+        Raises:
+            DuplicateKeyError: If a unique index conflicts with existing data
+            OperationFailure: If a TTL index is compound or its expiry is invalid
+        """
+        index_keys = normalize_index_keys(keys)
+        expire_after = kwargs.get('expireAfterSeconds')
+        if expire_after is not None:
+            if len(index_keys) != 1:
+                raise OperationFailure("TTL indexes are single-field indexes", code=67)
+            if isinstance(expire_after, bool) or not isinstance(expire_after, (int, float)) or expire_after < 0:
+                raise OperationFailure(
+                    f"expireAfterSeconds must be a non-negative number, got {expire_after!r}", code=67
+                )
+        index_name = kwargs.pop(
+            'name', "_".join(f"{field}_{direction}" for field, direction in index_keys)
+        )
+        unique = kwargs.pop('unique', False)
+        sparse = kwargs.pop('sparse', False)
+        kwargs.pop('background', None)
+
+        async with self._lock.write():
+            if index_name in self._indexes:
+                return index_name
+            index = self._build_index(index_name, index_keys, unique=unique, sparse=sparse, **kwargs)
+            self._notify("create_index", None, index.describe())
+
+        self._log_operation('create_index', index=index_name, fields=index.fields)
+        logger.info(f"Created index '{index_name}' on collection '{self.name}' for fields: {index.fields}")
         return index_name
 
+    def _build_index(self, name: str, keys: List[Tuple[str, Any]], **options: Any) -> CollectionIndex:
+        """Build an index over the stored documents and register it."""
+        index = CollectionIndex(name, keys, **options)
+        for key, doc in self._by_id.items():
+            index.check(key, doc)
+            index.add(key, doc)
+        self._indexes[name] = index
+        if options.get('expireAfterSeconds') is not None:
+            self._expiry.add_rule(name, index.fields[0], options['expireAfterSeconds'])
+            self._expiry.rebuild(self._by_id.items())
+        return index
+
     def list_indexes(self) -> list:
         """List all indexes on this collection."""
-        if not hasattr(self, '_indexes'):
-            return []
-        return [
-            {
-                'name': name,
-                'key': {field: 1 for field in config['fields']},
-                **{k: v for k, v in config.items() if k not in ['fields', 'name']}
-            }
-            for name, config in self._indexes.items()
-        ]
+        return [index.describe() for index in self._indexes.values()]
 
     async def drop_index(self, index_name: str) -> bool:
         """Drop an index by name."""
-        if not hasattr(self, '_indexes'):
+        async with self._lock.write():
+            index = self._indexes.pop(index_name, None)
+            self._expiry.remove_rule(index_name)
+        if index is None:
             return False
+        index.clear()
+        self._notify("drop_index", index.describe(), None)
+        logger.info(f"Dropped index '{index_name}' from collection '{self.name}'")
+        return True
 
-        if index_name in self._indexes:
-            del self._indexes[index_name]
-            logger.info(f"Dropped index '{index_name}' from collection '{self.name}'")
-            return True
-        return False
+    def watch(self, pipeline=None, full_document=None, resume_after=None, **kwargs) -> InMemoryChangeStream:
+        """
+        Open a change stream of inserts, updates, replaces and deletes.
+
+        Mirrors Motor's ``AsyncIOMotorCollection.watch``: use it as
+        ``async with collection.watch() as stream: async for change in stream``.
+        Writes are published in-process as they commit, so consumers are
+        woken immediately instead of polling.
+
+        Args:
+            pipeline: Aggregation stages ($match, $project, ...) applied to events
+            full_document: "updateLookup" includes the updated document in update events
+            resume_after: Resume token of a change seen by an earlier stream
+            **kwargs: start_after, full_document_before_change,
+                max_await_time_ms and batch_size; other Motor options are ignored
+
+        Returns:
+            An InMemoryChangeStream
+        """
+        if self._change_feed is None:
+            self._change_feed = ChangeFeed()
+            self.add_write_listener(self._change_feed.publish)
+        stream = InMemoryChangeStream(
+            self._change_feed,
+            pipeline=pipeline,
+            full_document=full_document,
+            full_document_before_change=kwargs.get('full_document_before_change'),
+            resume_after=resume_after,
+            start_after=kwargs.get('start_after'),
+            max_await_time_ms=kwargs.get('max_await_time_ms'),
+            batch_size=kwargs.get('batch_size'),
+            on_close=self._stream_closed,
+        )
+        self._open_streams += 1
+        return stream
+
+    def _stream_closed(self) -> None:
+        self._open_streams -= 1
+
+    def _snapshot_state(self) -> Dict[str, Any]:
+        """
+        Capture the collection's documents and index definitions.
+
+        The document list holds references to stored documents, which
+        copy-on-write updates never mutate, so it can be serialized later
+        (even from another thread) while writes continue.
+        """
+        return {
+            "documents": list(self._by_id.values()),
+            "indexes": [index.describe() for index in self._indexes.values()],
+            "id_counter": self._id_counter,
+        }
+
+    def _restore_state(self, state: Dict[str, Any]) -> None:
+        """Replace the collection's contents with a captured state."""
+        self._by_id = self._new_store({freeze(doc["_id"]): doc for doc in state["documents"]})
+        self._indexes = {}
+        self._expiry.clear()
+        for spec in state["indexes"]:
+            self._replay("create_index", spec)
+        self._id_counter = state["id_counter"]
+        self._generation += 1
+        self._query_cache.clear()
+
+    def _replay(self, operation: str, payload: Any) -> None:
+        """
+        Re-apply a journaled write without notifying write listeners.
+
+        Args:
+            operation: "insert", "update", "delete", "create_index" or "drop_index"
+            payload: The stored document for inserts and updates, the _id
+                for deletes, the index description for create_index and the
+                index name for drop_index
+        """
+        listeners, self._write_listeners = self._write_listeners, []
+        try:
+            if operation == "insert":
+                self._store(payload)
+                if isinstance(payload["_id"], int) and payload["_id"] >= self._id_counter:
+                    self._id_counter = payload["_id"] + 1
+            elif operation == "update":
+                self._replace(freeze(payload["_id"]), payload)
+            elif operation == "delete":
+                doc = self._by_id.get(freeze(payload))
+                if doc is not None:
+                    self._unindex(doc)
+            elif operation == "create_index":
+                spec = dict(payload)
+                name = spec.pop("name")
+                if name not in self._indexes:
+                    self._build_index(name, list(spec.pop("key").items()), **spec)
+            elif operation == "drop_index":
+                index = self._indexes.pop(payload, None)
+                self._expiry.remove_rule(payload)
+                if index is not None:
+                    index.clear()
+            else:
+                raise ValueError(f"Unknown journal operation: {operation}")
+        finally:
+            self._write_listeners = listeners
+        self._query_cache.clear()
+
+    async def expire_documents(self, now: Optional[float] = None) -> int:
+        """
+        Delete documents whose TTL index expiry time has passed.
+
+        Only due entries are popped from the expiry queue, so a sweep costs
+        O(expired log n) rather than a collection scan. Expired documents
+        are deleted like any other write, so listeners (and the journal)
+        see each deletion.
+
+        Args:
+            now: Unix timestamp to expire against (defaults to the current time)
+
+        Returns:
+            Number of documents deleted
+        """
+        if not self._expiry:
+            return 0
+        async with self._lock.write():
+            started = time.perf_counter()
+            now = time.time() if now is None else now
+            expired = skipped = 0
+            with self._write_batch():
+                for _, key, index_name in self._expiry.pop_due(now):
+                    doc = self._by_id.get(key)
+                    expires_at = None if doc is None else self._expiry.expires_at(doc, index_name)
+                    if expires_at is None or expires_at > now:
+                        # Deleted, updated to a later expiry, or index dropped
+                        skipped += 1
+                        continue
+                    self._unindex(doc)
+                    expired += 1
+            if self._expiry.needs_rebuild(len(self._by_id)):
+                self._expiry.rebuild(self._by_id.items())
+            self._expiry.record_sweep(started, expired, skipped)
+        if expired:
+            logger.debug(f"Expired {expired} documents from collection '{self.name}'")
+        return expired
 
     async def __aenter__(self):
         """
-        Enter the async context manager by acquiring the lock.
+        Enter the async context manager by acquiring the write lock.
 
         This allows for batch operations where the caller wants to perform
         multiple database operations atomically without releasing the lock
-        between operations. Uses a reentrant approach to prevent deadlocks
-        when collection methods are called within the context.
+        between operations. The write lock is reentrant for the holding
+        task, so collection methods called within the context don't deadlock.
         """
-        await self._lock.acquire()
-        # Mark that we're in a context to avoid re-acquiring the lock
-        self._in_context = True
+        await self._lock.acquire_write()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """Exit the async context manager by releasing the lock."""
-        self._in_context = False
-        self._lock.release()
+        """Exit the async context manager by releasing the write lock."""
+        self._lock.release_write()
         # Return False to propagate any exceptions
         return False
 
     async def _acquire_lock_if_needed(self):
-        """Acquire lock only if not already in context manager."""
-        if not getattr(self, '_in_context', False):
-            await self._lock.acquire()
+        """Acquire the write lock unless the current task already holds it."""
+        if not self._lock.owned():
+            await self._lock.acquire_write()
             return True
         return False
 
     def _release_lock_if_acquired(self, was_acquired):
-        """Release lock only if we acquired it."""
+        """Release the write lock only if we acquired it."""
         if was_acquired:
-            self._lock.release()
+            self._lock.release_write()
+
+    def _cached_candidates(self, cache_key: Any, record_stats: bool = True) -> Optional[List[Any]]:
+        """
+        Look up cached candidate keys, refreshing the entry's LRU position.
 
-    async def _cache_result(self, cache_key: str, result: List[Dict[str, Any]], timestamp: float):
-        """Cache query result with size management."""
-        # Remove oldest entries if cache is full
-        if len(self._query_cache) >= self._max_cache_size:
-            # Remove oldest 20% of entries
-            sorted_items = sorted(self._query_cache.items(), key=lambda x: x[1][1])
-            remove_count = len(sorted_items) // 5
-            for key, _ in sorted_items[:remove_count]:
-                del self._query_cache[key]
+        Args:
+            cache_key: Canonical query key
+            record_stats: Count the lookup in the hit/miss statistics
+                (write paths reuse the cache without skewing read hit rates)
+        """
+        entry = self._query_cache.get(cache_key)
+        if entry is not None and time.time() - entry.timestamp > self._cache_ttl:
+            del self._query_cache[cache_key]
+            entry = None
+        if record_stats:
+            self._stats['total_queries'] += 1
+            self._stats['cache_hits' if entry is not None else 'cache_misses'] += 1
+        if entry is None:
+            return None
+        self._query_cache.move_to_end(cache_key)
+        return entry.keys
+
+    def _cache_result(
+        self,
+        cache_key: Any,
+        result: List[Dict[str, Any]],
+        matcher: Matcher,
+        fields: FrozenSet[str],
+    ) -> None:
+        """Cache the keys of a query's matching documents, evicting the LRU entry when full."""
+        self._query_cache[cache_key] = _CachedQuery(
+            [freeze(doc["_id"]) for doc in result], fields, matcher, time.time()
+        )
+        self._query_cache.move_to_end(cache_key)
+        while len(self._query_cache) > self._max_cache_size:
+            self._query_cache.popitem(last=False)
+            self._stats['cache_evictions'] += 1
 
-        self._query_cache[cache_key] = (result, timestamp)
+    def _invalidate_for_document(self, doc: Dict[str, Any]) -> None:
+        """Drop cached queries that a newly stored document would match."""
+        if not self._query_cache:
+            return
+        stale = [key for key, entry in self._query_cache.items() if entry.matcher(doc)]
+        for key in stale:
+            del self._query_cache[key]
+        self._stats['cache_invalidations'] += len(stale)
+
+    def _invalidate_for_documents(self, docs: List[Dict[str, Any]]) -> None:
+        """Drop cached queries that any of a batch of new documents would match."""
+        if not self._query_cache or not docs:
+            return
+        if len(docs) * len(self._query_cache) > BATCH_INVALIDATION_LIMIT:
+            self._stats['cache_invalidations'] += len(self._query_cache)
+            self._query_cache.clear()
+            return
+        stale = [
+            key for key, entry in self._query_cache.items()
+            if any(entry.matcher(doc) for doc in docs)
+        ]
+        for key in stale:
+            del self._query_cache[key]
+        self._stats['cache_invalidations'] += len(stale)
+
+    def _invalidate_for_fields(self, fields: FrozenSet[str]) -> None:
+        """Drop cached queries that read any of the given top-level fields."""
+        if not self._query_cache:
+            return
+        stale = [key for key, entry in self._query_cache.items() if entry.fields & fields]
+        for key in stale:
+            del self._query_cache[key]
+        self._stats['cache_invalidations'] += len(stale)
 
     async def _cleanup_cache(self):
         """Remove expired cache entries."""
         current_time = time.time()
         expired_keys = [
-            key for key, (_, timestamp) in self._query_cache.items()
-            if current_time - timestamp > self._cache_ttl
+            key for key, entry in self._query_cache.items()
+            if current_time - entry.timestamp > self._cache_ttl
         ]
         for key in expired_keys:
             del self._query_cache[key]
@@ -394,6 +1190,8 @@ class InMemoryCollection:
             'cache_misses': self._stats['cache_misses'],
             'hit_rate': hit_rate,
             'total_queries': self._stats['total_queries'],
+            'evictions': self._stats['cache_evictions'],
+            'invalidations': self._stats['cache_invalidations'],
             'cached_entries': len(self._query_cache),
             'cache_size_limit': self._max_cache_size
         }
@@ -422,5 +1220,6 @@ class InMemoryCollection:
             A deep copy of the current data for safe external access
         """
         import copy
-        async with self._lock:
+        # The read side waits out any batch a writer is holding the lock for
+        async with self._lock.read():
             return copy.deepcopy(self.data)
@@ -4,17 +4,111 @@ In-Memory Cursor Implementation
 This module provides a cursor implementation for the in-memory database.
 """
 
+import asyncio
+import heapq
 import logging
-from typing import Any, List, Optional, Union, Tuple, Iterable
+from collections import deque
+from itertools import islice
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .index import get_field, sort_key
 
 logger = logging.getLogger(__name__)
 
+SortSpecs = List[Tuple[str, int]]
+
+# Use a bounded heap instead of a full sort when the requested window
+# (skip + limit) is at most 1/HEAP_SORT_RATIO of the documents to sort.
+HEAP_SORT_RATIO = 8
+
+# Motor's default first batch size
+DEFAULT_BATCH_SIZE = 101
+# Async iteration yields to the event loop after scanning this many candidates
+SCAN_CHUNK = 1000
+
+
+class _Pause:
+    """Marker emitted by paced scans where async iteration may yield."""
+
+
+_PAUSE = _Pause()
+
+
+def _paced(items: Iterable[Any]) -> Iterator[Any]:
+    """Pass items through, emitting a pause marker every SCAN_CHUNK items."""
+    for i, item in enumerate(items, 1):
+        yield item
+        if i % SCAN_CHUNK == 0:
+            yield _PAUSE
+
+
+class _Descending:
+    """Inverts the ordering of a wrapped sort key."""
+
+    __slots__ = ("key",)
+
+    def __init__(self, key: Any):
+        self.key = key
+
+    def __lt__(self, other: "_Descending") -> bool:
+        return other.key < self.key
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Descending) and self.key == other.key
+
+
+def compile_sort_key(sort_specs: SortSpecs) -> Tuple[Callable[[Dict[str, Any]], Any], bool]:
+    """
+    Build a single composite key function for a multi-field sort.
+
+    Values are compared by type bracket first, so mixed types never raise
+    and None/missing values sort last in ascending order, as before.
+
+    Returns:
+        The key function and whether to sort in reverse
+    """
+    fields = [field for field, _ in sort_specs]
+    directions = {direction for _, direction in sort_specs}
+    if len(directions) == 1:
+        # Uniform direction: a plain key plus the reverse flag
+        if len(fields) == 1:
+            field = fields[0]
+            return (lambda doc: sort_key(get_field(doc, field))), directions == {-1}
+        return (lambda doc: tuple(sort_key(get_field(doc, f)) for f in fields)), directions == {-1}
+
+    def key(doc: Dict[str, Any]) -> Tuple[Any, ...]:
+        return tuple(
+            sort_key(get_field(doc, field)) if direction == 1
+            else _Descending(sort_key(get_field(doc, field)))
+            for field, direction in sort_specs
+        )
+    return key, False
+
 
 class InMemoryCursor:
     """In-memory cursor implementation for testing."""
 
-    def __init__(self, data):
-        self.data = data.copy() if data else []
+    def __init__(
+        self,
+        data,
+        matcher: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        on_exhausted: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+        sorted_source: Optional[Callable[[SortSpecs], Optional[Iterable[Dict[str, Any]]]]] = None,
+        projector: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+    ):
+        # Candidate documents are held by reference. Collections never mutate
+        # stored documents in place, so this is a stable snapshot; filtering,
+        # skip/limit and copying are deferred until the cursor is consumed.
+        self.data = list(data) if data else []
+        self._matcher = matcher
+        # Called with every matching document once the snapshot has been
+        # fully scanned; the collection uses it to populate its query cache
+        self._on_exhausted = on_exhausted
+        # Given sort specs, returns candidate documents already in that order
+        # (from a covering sorted index), or None when no index applies
+        self._sorted_source = sorted_source
+        # Builds each returned document (a projection, or a shallow copy)
+        self._emit = projector or dict.copy
         self.skip_count = 0
         self.limit_count = None
         # Keep old attributes for backward compatibility
@@ -22,6 +116,11 @@ class InMemoryCursor:
         self.sort_direction = 1
         # New attribute for multi-field sorting
         self.sort_specs = []
+        # Async iteration state
+        self._batch_size = DEFAULT_BATCH_SIZE
+        self._stream: Optional[Iterator[Any]] = None
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._batches = 0
 
     def skip(self, n):
         """Skip n documents."""
@@ -100,38 +199,167 @@ class InMemoryCursor:
         # Not implemented for in-memory cursor
         return self
 
+    def batch_size(self, batch_size: int):
+        """
+        Set how many documents async iteration materializes per batch.
+
+        Args:
+            batch_size: Documents per batch (0 restores the default)
+
+        Returns:
+            This cursor, for chaining
+        """
+        if not isinstance(batch_size, int) or isinstance(batch_size, bool):
+            raise TypeError("batch_size must be an integer")
+        if batch_size < 0:
+            raise ValueError("batch_size must be >= 0")
+        self._batch_size = batch_size or DEFAULT_BATCH_SIZE
+        return self
+
+    def _matched(self, paced: bool = False) -> Iterable[Any]:
+        """
+        Lazily filter the snapshot with the cursor's matcher.
+
+        Args:
+            paced: Interleave pause markers for async iteration
+        """
+        docs: Iterable[Any] = _paced(self.data) if paced else self.data
+        if self._matcher is None:
+            return docs
+        if paced:
+            matcher = self._matcher
+            matched: Iterable[Any] = (d for d in docs if d is _PAUSE or matcher(d))
+        else:
+            matched = filter(self._matcher, docs)
+        if self._on_exhausted is None:
+            return matched
+        return self._collect(matched)
+
+    def _collect(self, matched: Iterable[Any]) -> Iterable[Any]:
+        """Pass documents through, reporting them all if the scan completes."""
+        seen = []
+        for doc in matched:
+            if doc is not _PAUSE:
+                seen.append(doc)
+            yield doc
+        self._on_exhausted(seen)
+
+    def _window(self, length: Optional[int] = None, paced: bool = False) -> Iterator[Any]:
+        """
+        Iterate the documents inside the skip/limit window, uncopied.
+
+        Without a sort, documents are matched only until the window is full.
+        Sorted reads walk a covering index when the collection offers one,
+        use a bounded heap when the window is small, and otherwise sort
+        references once with a composite key.
+        """
+        stop = self.limit_count
+        if length is not None:
+            stop = length if stop is None else min(stop, length)
+
+        start = self.skip_count or 0
+        sort_specs = self.sort_specs
+        if not sort_specs and self.sort_field:
+            # For backward compatibility with old code
+            sort_specs = [(self.sort_field, self.sort_direction)]
+
+        result: Iterable[Any]
+        ordered = self._sorted_source(sort_specs) if sort_specs and self._sorted_source else None
+        if ordered is not None:
+            # Already in sort order: filter lazily and stop at the window.
+            # Async iteration awaits between batches, so take a snapshot of
+            # the index range (references only) instead of walking it live.
+            if paced:
+                ordered = _paced(list(ordered))
+            if self._matcher is None:
+                result = ordered
+            else:
+                matcher = self._matcher
+                result = (d for d in ordered if d is _PAUSE or matcher(d))
+        elif sort_specs:
+            docs = list(self._matched())
+            key, reverse = compile_sort_key(sort_specs)
+            needed = None if stop is None else start + stop
+            if needed is not None and needed * HEAP_SORT_RATIO <= len(docs):
+                # Top-k: O(N log k) and stable, like sorted()[:k]
+                pick = heapq.nlargest if reverse else heapq.nsmallest
+                result = pick(needed, docs, key=key)
+            else:
+                result = sorted(docs, key=key, reverse=reverse)
+        else:
+            result = self._matched(paced)
+
+        end = None if stop is None else start + stop
+        if not paced:
+            return islice(result, start, end)
+        return self._slice_paced(result, start, end)
+
+    @staticmethod
+    def _slice_paced(items: Iterable[Any], start: int, end: Optional[int]) -> Iterator[Any]:
+        """islice that passes pause markers through without counting them."""
+        if end is not None and end <= start:
+            return
+        seen = 0
+        for item in items:
+            if item is _PAUSE:
+                yield item
+                continue
+            seen += 1
+            if seen > start:
+                yield item
+            if end is not None and seen >= end:
+                return
+
     async def to_list(self, length):
-        """Convert cursor to list."""
-        result = self.data.copy()  # Always work on a copy to avoid mutations
-
-        # Apply sorting if specified
-        if self.sort_specs:
-            # Sort by each field in reverse order to get proper multi-field sorting
-            for field, direction in reversed(self.sort_specs):
-                reverse = direction == -1
-                result = sorted(
-                    result,
-                    key=lambda x, f=field: (x.get(f) is None, x.get(f)),
-                    reverse=reverse
-                )
-        # For backward compatibility with old code
-        elif self.sort_field:
-            reverse = self.sort_direction == -1
-            result = sorted(
-                result,
-                key=lambda x: (x.get(self.sort_field) is None, x.get(self.sort_field)),
-                reverse=reverse
-            )
-
-        # Apply skip and limit
-        if self.skip_count:
-            result = result[self.skip_count:]
-
-        if self.limit_count is not None:
-            result = result[:self.limit_count]
-
-        if length is None:
-            return result
-        if length < 0:
+        """
+        Convert cursor to list.
+
+        Only the documents inside the skip/limit window are copied.
+        """
+        if length is not None and length < 0:
             raise ValueError("length must be >= 0")
-        return result[:length]
\ No newline at end of file
+        emit = self._emit
+        return [emit(doc) for doc in self._window(length)]
+
+    def __aiter__(self):
+        """Iterate documents with ``async for``, one batch at a time."""
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        if not self._buffer:
+            await self._fill_buffer()
+            if not self._buffer:
+                raise StopAsyncIteration
+        return self._buffer.popleft()
+
+    async def next(self) -> Dict[str, Any]:
+        """
+        Return the next document.
+
+        Raises:
+            StopAsyncIteration: When the cursor is exhausted
+        """
+        return await self.__anext__()
+
+    async def _fill_buffer(self) -> None:
+        """
+        Materialize the next batch of documents.
+
+        The event loop gets control between batches and every SCAN_CHUNK
+        candidates scanned, so long scans don't starve other tasks and at
+        most one batch of copies is alive at a time.
+        """
+        if self._stream is None:
+            self._stream = self._window(paced=True)
+        elif self._batches:
+            await asyncio.sleep(0)
+        self._batches += 1
+
+        while len(self._buffer) < self._batch_size:
+            item = next(self._stream, None)
+            if item is None:
+                return
+            if item is _PAUSE:
+                await asyncio.sleep(0)
+                continue
+            self._buffer.append(self._emit(item))
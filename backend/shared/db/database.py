@@ -4,12 +4,15 @@ In-Memory Database Implementation
 This module provides the main database class for the in-memory database.
 """
 
+import asyncio
 import logging
 import threading
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 # Import related classes
-from .collection import InMemoryCollection
+from .changes import ChangeFeed, InMemoryChangeStream
+from .collection import InMemoryCollection, WriteListener
+from .persistence import DatabasePersistence
 
 logger = logging.getLogger(__name__)
 
@@ -17,10 +20,35 @@ logger = logging.getLogger(__name__)
 class InMemoryDB:
     """In-memory database implementation for testing."""
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        persistence: Optional[DatabasePersistence] = None,
+        collection_storage: Optional[Dict[str, str]] = None,
+        ttl_interval: float = 60.0,
+    ) -> None:
+        """
+        Initialize the database.
+
+        Args:
+            persistence: Optional snapshot/journal storage; state is loaded
+                from it by open() and saved by close()
+            collection_storage: Storage mode per collection name (e.g.
+                {"cards": "columnar"}); unlisted collections use "dict"
+            ttl_interval: Seconds between TTL expiry sweeps once opened
+                (0 disables the background sweeper)
+        """
+        self._collection_storage = dict(collection_storage or {})
         # Dedicated store and lock to avoid attribute collisions and ensure thread-safety
         self._collections: Dict[str, InMemoryCollection] = {}
         self._lock = threading.RLock()
+        # Listeners attached to every collection, including ones created later
+        self._write_listeners: List[WriteListener] = []
+        self._persistence = persistence
+        self._ttl_interval = ttl_interval
+        self._ttl_task: Optional[asyncio.Task] = None
+        # Change log for database-wide watch(), created by the first stream
+        self._change_feed: Optional[ChangeFeed] = None
+        self._opened = False
         # Pre-create commonly used collections
         self._pre_create_collections()
     
@@ -43,15 +71,134 @@ class InMemoryDB:
             'outbox', 'users', 'cards', 'transactions', 'status_checks'
         ]
         for name in common_collections:
-            self._collections[name] = InMemoryCollection(name)
+            self._collections[name] = self._new_collection(name)
+
+    def _new_collection(self, name: str) -> InMemoryCollection:
+        """Create a collection with its configured storage mode."""
+        storage = self._collection_storage.get(name)
+        if storage is None:
+            return InMemoryCollection(name)
+        return InMemoryCollection(name, storage=storage)
 
     def _get_or_create(self, name: str) -> InMemoryCollection:
-        """Thread-safe method to get or create a collection by name."""
+        """
+        Thread-safe method to get or create a collection by name.
+
+        Existing collections are returned without taking the lock: entries
+        are only ever added, and a single dict read is atomic. Creation is
+        double-checked under the lock so a collection is built only once.
+        """
+        collection = self._collections.get(name)
+        if collection is not None:
+            return collection
         with self._lock:
             if name not in self._collections:
-                self._collections[name] = InMemoryCollection(name)
+                collection = self._new_collection(name)
+                for listener in self._write_listeners:
+                    collection.add_write_listener(listener)
+                self._collections[name] = collection
             return self._collections[name]
 
+    def add_write_listener(self, listener: WriteListener) -> None:
+        """Register a write callback on every current and future collection."""
+        with self._lock:
+            self._write_listeners.append(listener)
+            for collection in self._collections.values():
+                collection.add_write_listener(listener)
+
+    def remove_write_listener(self, listener: WriteListener) -> None:
+        """Unregister a write callback from every collection."""
+        with self._lock:
+            if listener in self._write_listeners:
+                self._write_listeners.remove(listener)
+            for collection in self._collections.values():
+                collection.remove_write_listener(listener)
+
+    def watch(self, pipeline=None, full_document=None, resume_after=None, **kwargs) -> InMemoryChangeStream:
+        """
+        Open a change stream over every collection, like Motor's database watch().
+
+        Args:
+            pipeline: Aggregation stages applied to events (e.g. a $match on ns.coll)
+            full_document: "updateLookup" includes the updated document in update events
+            resume_after: Resume token of a change seen by an earlier stream
+            **kwargs: Options accepted by InMemoryCollection.watch
+
+        Returns:
+            An InMemoryChangeStream
+        """
+        with self._lock:
+            if self._change_feed is None:
+                self._change_feed = ChangeFeed()
+                self.add_write_listener(self._change_feed.publish)
+        return InMemoryChangeStream(
+            self._change_feed,
+            pipeline=pipeline,
+            full_document=full_document,
+            full_document_before_change=kwargs.get('full_document_before_change'),
+            resume_after=resume_after,
+            start_after=kwargs.get('start_after'),
+            max_await_time_ms=kwargs.get('max_await_time_ms'),
+            batch_size=kwargs.get('batch_size'),
+        )
+
+    def _snapshot_state(self) -> Dict[str, Dict[str, Any]]:
+        """Capture every collection's documents and indexes for a snapshot."""
+        with self._lock:
+            return {
+                name: collection._snapshot_state()
+                for name, collection in self._collections.items()
+            }
+
+    async def expire_documents(self, now: Optional[float] = None) -> int:
+        """
+        Run a TTL sweep over every collection with a TTL index.
+
+        Args:
+            now: Unix timestamp to expire against (defaults to the current time)
+
+        Returns:
+            Number of documents deleted
+        """
+        expired = 0
+        for collection in list(self._collections.values()):
+            expired += await collection.expire_documents(now)
+        return expired
+
+    async def _ttl_loop(self) -> None:
+        """Sweep expired documents every ttl_interval seconds."""
+        while True:
+            await asyncio.sleep(self._ttl_interval)
+            try:
+                await self.expire_documents()
+            except Exception as e:
+                logger.error(f"In-memory database TTL sweep failed: {e}")
+
+    async def open(self) -> None:
+        """Load persisted state and start journaling (if configured) and the TTL sweeper."""
+        if self._opened:
+            return
+        if self._persistence is not None:
+            await self._persistence.attach(self)
+        if self._ttl_interval > 0:
+            self._ttl_task = asyncio.create_task(self._ttl_loop())
+        self._opened = True
+
+    async def close(self) -> None:
+        """Stop the TTL sweeper, then flush the journal and write a final snapshot if configured."""
+        if not self._opened:
+            return
+        if self._ttl_task is not None:
+            self._ttl_task.cancel()
+            try:
+                await self._ttl_task
+            except asyncio.CancelledError:
+                pass
+            self._ttl_task = None
+        if self._persistence is not None:
+            await self._persistence.close()
+        self._opened = False
+
     def __getattr__(self, name: str) -> InMemoryCollection:
         """Allow attribute-style access (db.collection_name). Creates on first access."""
         if name.startswith('_'):
@@ -0,0 +1,342 @@
+"""
+In-Memory Index Implementation
+
+This module provides the secondary indexes used by the in-memory database.
+Every index keeps a hash map for equality lookups; non-hashed indexes also
+keep a sorted entry list for prefix and range scans.
+"""
+
+import logging
+from bisect import bisect_left
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+
+class _Missing:
+    """Sentinel type for a field that is absent from a document."""
+
+    _instance: Optional["_Missing"] = None
+
+    def __new__(cls) -> "_Missing":
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __repr__(self) -> str:
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+# Sort brackets, loosely following BSON comparison order. None and missing
+# values sort last, matching the cursor's historical "None goes last" rule.
+_BRACKET_NUMBER = 1
+_BRACKET_STRING = 2
+_BRACKET_OBJECT = 3
+_BRACKET_ARRAY = 4
+_BRACKET_BYTES = 5
+_BRACKET_BOOL = 6
+_BRACKET_DATE = 7
+_BRACKET_OTHER = 8
+_BRACKET_NULL = 9
+# Compares greater than every sort key, used to bound prefix scans
+_TOP = (_BRACKET_NULL + 1,)
+
+
+def get_field(doc: Dict[str, Any], field: str) -> Any:
+    """
+    Return a document field value, or MISSING when absent.
+
+    Dotted paths walk embedded documents, and numeric segments index lists
+    (e.g. "metadata.name" or "items.0.id").
+    """
+    if "." not in field:
+        return doc.get(field, MISSING)
+    value: Any = doc
+    for part in field.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, MISSING)
+        elif isinstance(value, list) and part.isdigit():
+            position = int(part)
+            value = value[position] if position < len(value) else MISSING
+        else:
+            return MISSING
+        if value is MISSING:
+            return MISSING
+    return value
+
+
+# Hashable types that freeze() returns unchanged, checked before anything else
+_SCALAR_TYPES = frozenset([str, int, float, bool, type(None), bytes, datetime])
+
+
+def freeze(value: Any) -> Any:
+    """Convert a value into a hashable equivalent with the same equality."""
+    if type(value) in _SCALAR_TYPES:
+        return value
+    if isinstance(value, dict):
+        # Dict equality ignores key order, so the frozen form must too
+        return ("__dict__", tuple(sorted(((str(k), freeze(v)) for k, v in value.items()),
+                                         key=lambda item: item[0])))
+    if isinstance(value, (list, tuple)):
+        return ("__list__", tuple([freeze(v) for v in value]))
+    if isinstance(value, set):
+        return ("__set__", frozenset(freeze(v) for v in value))
+    try:
+        hash(value)
+    except TypeError:
+        return ("__repr__", repr(value))
+    return value
+
+
+def sort_key(value: Any) -> Tuple[Any, ...]:
+    """Totally ordered key for any value, so mixed types never raise TypeError."""
+    if value is None or value is MISSING:
+        return (_BRACKET_NULL,)
+    if isinstance(value, bool):
+        return (_BRACKET_BOOL, value)
+    if isinstance(value, (int, float)):
+        return (_BRACKET_NUMBER, value)
+    if isinstance(value, str):
+        return (_BRACKET_STRING, value)
+    if isinstance(value, dict):
+        return (_BRACKET_OBJECT, tuple((k, sort_key(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return (_BRACKET_ARRAY, tuple(sort_key(v) for v in value))
+    if isinstance(value, (bytes, bytearray)):
+        return (_BRACKET_BYTES, bytes(value))
+    if isinstance(value, datetime):
+        # Naive and aware datetimes do not compare; order on the timestamp
+        return (_BRACKET_DATE, value.timestamp())
+    return (_BRACKET_OTHER, type(value).__name__, str(value))
+
+
+def normalize_index_keys(keys: Union[str, Sequence[Any], Dict[str, Any]]) -> List[Tuple[str, Any]]:
+    """Normalize pymongo-style index specifications to [(field, direction), ...]."""
+    if isinstance(keys, str):
+        return [(keys, 1)]
+    if isinstance(keys, dict):
+        return list(keys.items())
+    normalized: List[Tuple[str, Any]] = []
+    for key in keys:
+        if isinstance(key, str):
+            normalized.append((key, 1))
+        else:
+            normalized.append((key[0], key[1]))
+    return normalized
+
+
+class CollectionIndex:
+    """
+    Secondary index over one or more document fields.
+
+    The index remembers the key it stored for every document id, so entries
+    can be removed even after the document was mutated in place.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        keys: List[Tuple[str, Any]],
+        unique: bool = False,
+        sparse: bool = False,
+        **options: Any,
+    ):
+        self.name = name
+        self.keys = keys
+        self.fields = [field for field, _ in keys]
+        # Plain top-level fields can skip dotted-path resolution
+        self._top_level = not any("." in field for field in self.fields)
+        self.unique = unique
+        self.sparse = sparse
+        self.options = options
+        # Hashed indexes only answer equality; everything else is also sorted
+        self.hashed = any(direction == "hashed" for _, direction in keys)
+
+        # frozen key -> insertion-ordered set of document ids
+        self._hash: Dict[Any, Dict[Any, None]] = {}
+        # (sort key, sequence, id) entries; the sequence keeps ties stable
+        self._sorted: List[Tuple[Tuple[Any, ...], int, Any]] = []
+        # Entries are appended and sorted lazily before the next read, so a
+        # batch of k inserts costs one O(n + k log k) merge instead of k insorts
+        self._unsorted = False
+        # document id -> (frozen key, sorted entry) currently stored
+        self._entries: Dict[Any, Tuple[Any, Optional[Tuple[Tuple[Any, ...], int, Any]]]] = {}
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def extract(self, doc: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+        """Return the raw key values for a document, or None if sparse-skipped."""
+        if self._top_level:
+            values = tuple([doc.get(field, MISSING) for field in self.fields])
+        else:
+            values = tuple([get_field(doc, field) for field in self.fields])
+        if self.sparse and all(v is MISSING for v in values):
+            return None
+        return values
+
+    def check(self, doc_id: Any, doc: Dict[str, Any]) -> None:
+        """Raise DuplicateKeyError if storing ``doc`` would violate uniqueness."""
+        if not self.unique:
+            return
+        values = self.extract(doc)
+        if values is None:
+            return
+        bucket = self._hash.get(freeze(values))
+        if bucket and any(other != doc_id for other in bucket):
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error index: {self.name} dup key: "
+                f"{dict(zip(self.fields, values))}"
+            )
+
+    def add(self, doc_id: Any, doc: Dict[str, Any]) -> None:
+        """Index a document (the caller checks uniqueness first)."""
+        values = self.extract(doc)
+        if values is None:
+            return
+        frozen = freeze(values)
+        self._hash.setdefault(frozen, {})[doc_id] = None
+        entry = None
+        if not self.hashed:
+            self._seq += 1
+            entry = (tuple([sort_key(v) for v in values]), self._seq, doc_id)
+            if self._sorted and not self._unsorted and entry < self._sorted[-1]:
+                self._unsorted = True
+            self._sorted.append(entry)
+        self._entries[doc_id] = (frozen, entry)
+
+    def remove(self, doc_id: Any) -> None:
+        """Drop whatever entry is stored for a document id."""
+        stored = self._entries.pop(doc_id, None)
+        if stored is None:
+            return
+        frozen, entry = stored
+        bucket = self._hash.get(frozen)
+        if bucket is not None:
+            bucket.pop(doc_id, None)
+            if not bucket:
+                del self._hash[frozen]
+        if entry is not None:
+            entries = self._sorted_entries()
+            i = bisect_left(entries, entry)
+            if i < len(entries) and entries[i] == entry:
+                del entries[i]
+
+    def update(self, doc_id: Any, doc: Dict[str, Any]) -> None:
+        """Re-index a document whose fields may have changed."""
+        stored = self._entries.get(doc_id)
+        values = self.extract(doc)
+        if stored is not None and values is not None and stored[0] == freeze(values):
+            return
+        self.remove(doc_id)
+        self.add(doc_id, doc)
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        self._hash.clear()
+        self._sorted.clear()
+        self._unsorted = False
+        self._entries.clear()
+
+    def lookup(self, values: Tuple[Any, ...]) -> List[Any]:
+        """Return ids whose full key equals ``values`` (O(1) hash lookup)."""
+        bucket = self._hash.get(freeze(values))
+        return list(bucket) if bucket else []
+
+    def count(self, values: Tuple[Any, ...]) -> int:
+        """Return how many documents have exactly this full key."""
+        bucket = self._hash.get(freeze(values))
+        return len(bucket) if bucket else 0
+
+    def _sorted_entries(self) -> List[Tuple[Tuple[Any, ...], int, Any]]:
+        """Return the sorted entry list, merging in entries appended since the last read."""
+        if self._unsorted:
+            # Timsort merges the sorted prefix with the appended run
+            self._sorted.sort()
+            self._unsorted = False
+        return self._sorted
+
+    def _bounds(
+        self,
+        prefix: Tuple[Any, ...],
+        lower: Optional[Tuple[Any, bool]],
+        upper: Optional[Tuple[Any, bool]],
+    ) -> Tuple[int, int]:
+        """Return the [lo, hi) positions in the sorted entries for a range."""
+        if self.hashed:
+            raise ValueError(f"Index '{self.name}' is hashed and cannot be scanned")
+        entries = self._sorted_entries()
+        head = tuple(sort_key(v) for v in prefix)
+        depth = len(head)
+
+        if lower is not None:
+            lo_key = head + (sort_key(lower[0]),)
+            lo = bisect_left(entries, (lo_key,) if lower[1] else (lo_key + (_TOP,),))
+        elif upper is not None:
+            # Start of the upper bound's type bracket
+            lo = bisect_left(entries, (head + (sort_key(upper[0])[:1],),))
+        else:
+            lo = bisect_left(entries, (head,)) if depth else 0
+        if upper is not None:
+            hi_key = head + (sort_key(upper[0]),)
+            hi = bisect_left(entries, (hi_key + (_TOP,),) if upper[1] else (hi_key,))
+        elif lower is not None:
+            # End of the lower bound's type bracket
+            hi = bisect_left(entries, (head + ((sort_key(lower[0])[0] + 1,),),))
+        else:
+            hi = bisect_left(entries, (head + (_TOP,),)) if depth else len(entries)
+        return lo, max(lo, hi)
+
+    def range_size(
+        self,
+        prefix: Tuple[Any, ...] = (),
+        lower: Optional[Tuple[Any, bool]] = None,
+        upper: Optional[Tuple[Any, bool]] = None,
+    ) -> int:
+        """Return how many entries a scan would yield, in O(log n)."""
+        lo, hi = self._bounds(prefix, lower, upper)
+        return hi - lo
+
+    def scan(
+        self,
+        prefix: Tuple[Any, ...] = (),
+        lower: Optional[Tuple[Any, bool]] = None,
+        upper: Optional[Tuple[Any, bool]] = None,
+        reverse: bool = False,
+    ) -> Iterator[Any]:
+        """
+        Yield ids in key order from the sorted entries.
+
+        A one-sided range stays within the bound's type bracket, so
+        ``lower=(5, False)`` does not run on into string or null keys.
+
+        Args:
+            prefix: Equality values for the leading index fields
+            lower: Optional (value, inclusive) bound on the next field
+            upper: Optional (value, inclusive) bound on the next field
+            reverse: Walk the range from the highest key down
+
+        Yields:
+            Document ids
+        """
+        lo, hi = self._bounds(prefix, lower, upper)
+        entries = self._sorted
+        indices = range(hi - 1, lo - 1, -1) if reverse else range(lo, hi)
+        for i in indices:
+            yield entries[i][2]
+
+    def describe(self) -> Dict[str, Any]:
+        """Return pymongo-style index information."""
+        return {
+            "name": self.name,
+            "key": dict(self.keys),
+            "unique": self.unique,
+            "sparse": self.sparse,
+            **self.options,
+        }
@@ -0,0 +1,140 @@
+"""
+In-Memory Database Locks
+
+This module provides the reader/writer lock used by in-memory collections.
+"""
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Optional, Tuple
+
+_READ = "read"
+_WRITE = "write"
+
+
+class AsyncReadWriteLock:
+    """
+    Asyncio reader/writer lock: many readers or one writer.
+
+    Waiters are served in arrival order, and a new reader queues behind any
+    waiting writer, so a steady stream of reads cannot starve writes. The
+    write side is reentrant for the task that holds it, so a task inside a
+    batch context can call write methods without deadlocking on itself.
+    Releasing never blocks, so it is safe from synchronous code.
+    """
+
+    def __init__(self) -> None:
+        self._readers = 0
+        self._writer: Optional[asyncio.Task] = None
+        self._write_depth = 0
+        # (mode, task, future) for every task waiting to acquire
+        self._waiters: Deque[Tuple[str, Optional[asyncio.Task], asyncio.Future]] = deque()
+
+    @property
+    def readers(self) -> int:
+        """Number of read holds currently granted."""
+        return self._readers
+
+    def locked(self) -> bool:
+        """Return True if a writer holds the lock."""
+        return self._writer is not None
+
+    def owned(self) -> bool:
+        """Return True if the current task holds the write side."""
+        return self._writer is not None and self._writer is asyncio.current_task()
+
+    async def acquire_read(self) -> None:
+        """Wait until no writer holds or is queued ahead, then hold the read side."""
+        if self.owned() or (self._writer is None and not self._waiters):
+            # A writer may read what it is writing; otherwise uncontended
+            self._readers += 1
+            return
+        await self._wait(_READ)
+
+    def release_read(self) -> None:
+        """Release the read side."""
+        if self._readers <= 0:
+            raise RuntimeError("Read lock released too many times")
+        self._readers -= 1
+        self._wake()
+
+    async def acquire_write(self) -> None:
+        """Wait until there are no readers or other writers, then hold the write side."""
+        if self.owned():
+            self._write_depth += 1
+            return
+        if self._writer is None and self._readers == 0 and not self._waiters:
+            self._writer = asyncio.current_task()
+            self._write_depth = 1
+            return
+        await self._wait(_WRITE)
+
+    def release_write(self) -> None:
+        """Release one level of the write side."""
+        if not self.owned():
+            raise RuntimeError("Write lock released by a task that does not hold it")
+        self._write_depth -= 1
+        if self._write_depth == 0:
+            self._writer = None
+            self._wake()
+
+    async def _wait(self, mode: str) -> None:
+        """Queue for the lock; _wake() grants it before resolving the future."""
+        task = asyncio.current_task()
+        future = asyncio.get_running_loop().create_future()
+        entry = (mode, task, future)
+        self._waiters.append(entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as we were cancelled: hand it back
+                if mode == _WRITE:
+                    self.release_write()
+                else:
+                    self.release_read()
+            else:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                # A cancelled writer may have been holding queued readers back
+                self._wake()
+            raise
+
+    def _wake(self) -> None:
+        """Grant the lock to the waiters at the head of the queue that can take it."""
+        while self._waiters and self._writer is None:
+            mode, task, future = self._waiters[0]
+            if future.done():
+                # Cancelled; the waiter cleans up when it resumes
+                self._waiters.popleft()
+                continue
+            if mode == _WRITE:
+                if self._readers:
+                    return
+                self._waiters.popleft()
+                self._writer = task
+                self._write_depth = 1
+                future.set_result(None)
+                return
+            self._waiters.popleft()
+            self._readers += 1
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def read(self) -> AsyncIterator[None]:
+        """Hold the read side for the duration of the block."""
+        await self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @asynccontextmanager
+    async def write(self) -> AsyncIterator[None]:
+        """Hold the write side for the duration of the block."""
+        await self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
@@ -0,0 +1,339 @@
+"""
+In-Memory Database Persistence
+
+This module provides optional durability for the in-memory database: a
+periodic snapshot of every collection plus a write-ahead journal of the
+writes made since, so a restart loads the snapshot and replays the
+journal tail instead of starting empty.
+
+On-disk layout inside the persistence directory:
+
+    snapshot.pickle        - latest complete snapshot (pickle protocol 5)
+    journal.<seq>.log      - journal segments, replayed in sequence order
+
+Journal records are framed as ``<length><crc32><pickle payload>`` so a
+record torn by a crash is detected and the replay stops at the last
+complete write. Each snapshot starts a new journal segment and, once it
+is safely on disk, deletes the segments it supersedes.
+"""
+
+import asyncio
+import logging
+import os
+import pickle
+import re
+import struct
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "snapshot.pickle"
+SNAPSHOT_VERSION = 1
+PICKLE_PROTOCOL = 5
+
+_FRAME = struct.Struct("<II")
+_JOURNAL_PATTERN = re.compile(r"^journal\.(\d+)\.log$")
+
+# (operation, collection name, payload); see InMemoryCollection._replay
+JournalRecord = Tuple[str, str, Any]
+
+
+def _encode_records(records: List[JournalRecord]) -> bytes:
+    """Serialize journal records into length- and checksum-prefixed frames."""
+    frames = []
+    for record in records:
+        payload = pickle.dumps(record, protocol=PICKLE_PROTOCOL)
+        frames.append(_FRAME.pack(len(payload), zlib.crc32(payload)))
+        frames.append(payload)
+    return b"".join(frames)
+
+
+def _decode_records(data: bytes) -> Tuple[List[JournalRecord], bool]:
+    """
+    Decode journal frames.
+
+    Returns:
+        The complete records, and whether decoding stopped at a torn or
+        corrupt frame
+    """
+    records = []
+    offset = 0
+    while offset < len(data):
+        if offset + _FRAME.size > len(data):
+            return records, True
+        length, checksum = _FRAME.unpack_from(data, offset)
+        start = offset + _FRAME.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return records, True
+        records.append(pickle.loads(payload))
+        offset = start + length
+    return records, False
+
+
+def _write_durably(path: str, data: bytes, append: bool) -> None:
+    """Write bytes to a file and fsync them before returning."""
+    with open(path, "ab" if append else "wb") as handle:
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+class DatabasePersistence:
+    """
+    Snapshot and journal storage for an InMemoryDB.
+
+    Writes are recorded synchronously into an in-memory buffer (no I/O on
+    the write path); a background task appends the buffer to the current
+    journal segment and fsyncs it every ``fsync_interval`` seconds, so at
+    most that much acknowledged work can be lost on a crash. Another task
+    writes a fresh snapshot every ``snapshot_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        fsync_interval: float = 1.0,
+        snapshot_interval: float = 300.0,
+    ):
+        """
+        Initialize persistence storage.
+
+        Args:
+            directory: Directory holding the snapshot and journal files
+            fsync_interval: Seconds between journal flushes
+            snapshot_interval: Seconds between snapshots (0 disables them)
+        """
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.snapshot_interval = snapshot_interval
+        self._db: Any = None
+        self._buffer: List[JournalRecord] = []
+        self._journal_seq = 0
+        # Serializes journal file appends so records stay in write order
+        self._io_lock = asyncio.Lock()
+        self._snapshot_lock = asyncio.Lock()
+        self._tasks: List[asyncio.Task] = []
+        self._stats = {
+            'records_journaled': 0, 'journal_flushes': 0, 'snapshots_written': 0,
+            'records_replayed': 0, 'last_flush': None, 'last_snapshot': None,
+        }
+
+    def _journal_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"journal.{seq}.log")
+
+    def _journal_segments(self) -> List[int]:
+        """Return the sequence numbers of journal files on disk, ascending."""
+        segments = []
+        for name in os.listdir(self.directory):
+            match = _JOURNAL_PATTERN.match(name)
+            if match:
+                segments.append(int(match.group(1)))
+        return sorted(segments)
+
+    def _read_state(self) -> Tuple[Optional[Dict[str, Any]], List[JournalRecord], int]:
+        """
+        Read the snapshot and the journal records written after it.
+
+        Returns:
+            (snapshot or None, records to replay, next journal sequence)
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        snapshot = None
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "rb") as handle:
+                snapshot = pickle.load(handle)
+            if snapshot.get("version") != SNAPSHOT_VERSION:
+                raise ValueError(f"Unsupported snapshot version: {snapshot.get('version')}")
+
+        first_seq = snapshot["journal_seq"] if snapshot else 0
+        records: List[JournalRecord] = []
+        segments = self._journal_segments()
+        for seq in segments:
+            if seq < first_seq:
+                continue
+            with open(self._journal_path(seq), "rb") as handle:
+                decoded, torn = _decode_records(handle.read())
+            records.extend(decoded)
+            if torn:
+                logger.warning(
+                    f"Journal segment {seq} ends with an incomplete record; "
+                    f"replaying the {len(decoded)} complete records before it"
+                )
+        next_seq = max([first_seq - 1] + segments) + 1
+        return snapshot, records, next_seq
+
+    async def attach(self, db: Any) -> None:
+        """
+        Load persisted state into a database and start journaling its writes.
+
+        Args:
+            db: The InMemoryDB to restore and record
+        """
+        started = time.perf_counter()
+        snapshot, records, next_seq = await asyncio.to_thread(self._read_state)
+
+        # Restore before attaching the listener so replayed writes aren't re-journaled
+        if snapshot is not None:
+            for name, state in snapshot["collections"].items():
+                db[name]._restore_state(state)
+        for operation, name, payload in records:
+            try:
+                db[name]._replay(operation, payload)
+            except Exception as e:
+                logger.error(f"Skipping journal record {operation} on '{name}': {e}")
+        self._stats['records_replayed'] = len(records)
+
+        self._db = db
+        # Never append to a segment that may end with a torn record
+        self._journal_seq = next_seq
+        db.add_write_listener(self.record)
+        self._tasks = [asyncio.create_task(self._flush_loop())]
+        if self.snapshot_interval > 0:
+            self._tasks.append(asyncio.create_task(self._snapshot_loop()))
+
+        logger.info(
+            f"Loaded in-memory database from {self.directory} "
+            f"({'snapshot + ' if snapshot else ''}{len(records)} journal records) "
+            f"in {time.perf_counter() - started:.3f}s"
+        )
+
+    def record(
+        self,
+        collection_name: str,
+        operation: str,
+        before: Optional[Dict[str, Any]],
+        after: Optional[Dict[str, Any]],
+    ) -> None:
+        """Write listener that buffers a journal record for the next flush."""
+        if operation in ("insert", "update", "create_index"):
+            payload = after
+        elif operation == "replace":
+            # Replays exactly like an update: the stored document is swapped in
+            operation, payload = "update", after
+        elif operation == "delete":
+            payload = before["_id"]
+        elif operation == "drop_index":
+            payload = before["name"]
+        else:
+            return
+        # Stored documents are immutable, so the reference is serialized at flush time
+        self._buffer.append((operation, collection_name, payload))
+        self._stats['records_journaled'] += 1
+
+    async def flush(self) -> None:
+        """
+        Append buffered records to the journal and fsync them.
+
+        If the write fails (e.g. ENOSPC or EIO) the records are put back at
+        the front of the buffer for the next flush, which goes to a new
+        segment: the failed append may have left a torn record, and replay
+        stops reading a segment there.
+        """
+        async with self._io_lock:
+            if not self._buffer:
+                return
+            records, self._buffer = self._buffer, []
+            path = self._journal_path(self._journal_seq)
+            try:
+                await asyncio.to_thread(lambda: _write_durably(path, _encode_records(records), append=True))
+            except Exception:
+                self._buffer[:0] = records
+                self._journal_seq += 1
+                raise
+            self._stats['journal_flushes'] += 1
+            self._stats['last_flush'] = time.time()
+
+    async def snapshot(self) -> None:
+        """
+        Write a snapshot of every collection and drop the journal it replaces.
+
+        The state is captured synchronously between writes; everything
+        journaled before that point is flushed to the old segment and later
+        writes go to a new one, which the snapshot records as its replay start.
+        """
+        if self._db is None:
+            return
+        async with self._snapshot_lock:
+            async with self._io_lock:
+                records, self._buffer = self._buffer, []
+                old_path = self._journal_path(self._journal_seq)
+                self._journal_seq += 1
+                state = {
+                    "version": SNAPSHOT_VERSION,
+                    "journal_seq": self._journal_seq,
+                    "created_at": time.time(),
+                    "collections": self._db._snapshot_state(),
+                }
+                if records:
+                    try:
+                        await asyncio.to_thread(
+                            lambda: _write_durably(old_path, _encode_records(records), append=True)
+                        )
+                    except Exception:
+                        # Keep them for the next flush, into the new segment
+                        self._buffer[:0] = records
+                        raise
+
+            started = time.perf_counter()
+            await asyncio.to_thread(self._write_snapshot, state)
+            self._stats['snapshots_written'] += 1
+            self._stats['last_snapshot'] = time.time()
+            logger.debug(
+                f"Wrote in-memory database snapshot in {time.perf_counter() - started:.3f}s"
+            )
+
+    def _write_snapshot(self, state: Dict[str, Any]) -> None:
+        """Atomically replace the snapshot file, then delete superseded journals."""
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        temp_path = f"{path}.tmp"
+        _write_durably(temp_path, pickle.dumps(state, protocol=PICKLE_PROTOCOL), append=False)
+        os.replace(temp_path, path)
+        for seq in self._journal_segments():
+            if seq < state["journal_seq"]:
+                os.remove(self._journal_path(seq))
+
+    async def _flush_loop(self) -> None:
+        """Flush the journal buffer every fsync_interval seconds."""
+        while True:
+            await asyncio.sleep(self.fsync_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush in-memory database journal: {e}")
+
+    async def _snapshot_loop(self) -> None:
+        """Write a snapshot every snapshot_interval seconds."""
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            try:
+                await self.snapshot()
+            except Exception as e:
+                logger.error(f"Failed to write in-memory database snapshot: {e}")
+
+    async def close(self) -> None:
+        """Stop background tasks, then write a final snapshot for a fast next start."""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if self._db is not None:
+            await self.snapshot()
+            self._db.remove_write_listener(self.record)
+            self._db = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get journal and snapshot statistics."""
+        return {
+            **self._stats,
+            'buffered_records': len(self._buffer),
+            'journal_seq': self._journal_seq,
+            'directory': self.directory,
+        }
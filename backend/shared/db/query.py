@@ -0,0 +1,388 @@
+"""
+In-Memory Query Compiler
+
+This module compiles MongoDB-style filters into matcher closures for the
+in-memory database. Filters are split into a *shape* (fields, operators and
+operand types) and a list of parameter values; the shape is compiled once and
+cached, so repeated queries with different values reuse the same closure.
+
+Supported operators: $eq, $ne, $gt, $gte, $lt, $lte, $in, $nin, $exists,
+$regex (with $options), $and, $or, $nor, plus dotted paths into embedded
+documents and lists.
+Plain equality stays exact, as before: the field must be present and equal.
+"""
+
+import logging
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from pymongo.errors import OperationFailure
+
+from .index import MISSING, freeze, get_field
+
+logger = logging.getLogger(__name__)
+
+Matcher = Callable[[Dict[str, Any]], bool]
+
+_LOGICAL_OPERATORS = ("$and", "$or", "$nor")
+_COMPARISON_OPERATORS = ("$gt", "$gte", "$lt", "$lte")
+_FIELD_OPERATORS = ("$eq", "$ne", "$in", "$nin", "$exists", "$regex", "$options") + _COMPARISON_OPERATORS
+_REGEX_FLAGS = {"i": re.IGNORECASE, "m": re.MULTILINE, "s": re.DOTALL, "x": re.VERBOSE}
+
+# Operand type classes for comparisons; a comparison only matches values of
+# the same class, so {"$gt": 5} never matches a string.
+_TYPE_NUMBER = "number"
+_TYPE_STRING = "string"
+_TYPE_DATE = "date"
+_TYPE_OTHER = "other"
+
+COMPILE_CACHE_SIZE = 256
+
+
+def _type_class(value: Any) -> str:
+    """Return the comparison type class of an operand."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return _TYPE_NUMBER
+    if isinstance(value, str):
+        return _TYPE_STRING
+    if isinstance(value, datetime):
+        return _TYPE_DATE
+    return _TYPE_OTHER
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_string(value: Any) -> bool:
+    return isinstance(value, str)
+
+
+def _is_date(value: Any) -> bool:
+    return isinstance(value, datetime)
+
+
+_TYPE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    _TYPE_NUMBER: _is_number,
+    _TYPE_STRING: _is_string,
+    _TYPE_DATE: _is_date,
+}
+
+
+def is_operator_dict(value: Any) -> bool:
+    """Check whether a filter value is an operator expression like {"$gt": 1}."""
+    return isinstance(value, dict) and bool(value) and all(
+        isinstance(k, str) and k.startswith("$") for k in value
+    )
+
+
+def _prepare_in(values: Any) -> Tuple[frozenset, Tuple[Any, ...]]:
+    """Prepare an $in/$nin operand as a set of frozen values."""
+    if not isinstance(values, (list, tuple, set, frozenset)):
+        raise OperationFailure("$in needs an array")
+    return frozenset(freeze(v) for v in values), tuple(values)
+
+
+def _prepare_regex(pattern: Any, options: Any) -> "re.Pattern":
+    """Compile a $regex operand with MongoDB-style $options letters."""
+    flags = 0
+    for letter in options or "":
+        if letter not in _REGEX_FLAGS:
+            raise OperationFailure(f"invalid flag in regex options: {letter}")
+        flags |= _REGEX_FLAGS[letter]
+    if isinstance(pattern, re.Pattern):
+        return re.compile(pattern.pattern, pattern.flags | flags)
+    if not isinstance(pattern, str):
+        raise OperationFailure("$regex has to be a string")
+    return re.compile(pattern, flags)
+
+
+def _extract_shape(query: Dict[str, Any], params: List[Any]) -> Tuple[Any, ...]:
+    """
+    Split a filter into a hashable shape and its parameter values.
+
+    Args:
+        query: MongoDB-style filter
+        params: List that receives parameter values in shape order
+
+    Returns:
+        The query shape
+
+    Raises:
+        OperationFailure: If the filter uses an unsupported operator
+    """
+    parts = []
+    for key, value in query.items():
+        if key in _LOGICAL_OPERATORS:
+            if not isinstance(value, (list, tuple)) or not value:
+                raise OperationFailure(f"{key} must be a nonempty array")
+            parts.append((key, tuple(_extract_shape(sub, params) for sub in value)))
+        elif key.startswith("$"):
+            raise OperationFailure(f"unknown top level operator: {key}")
+        elif is_operator_dict(value):
+            ops = []
+            for op, operand in value.items():
+                if op not in _FIELD_OPERATORS:
+                    raise OperationFailure(f"unknown operator: {op}")
+                if op == "$options":
+                    if "$regex" not in value:
+                        raise OperationFailure("$options needs a $regex")
+                    continue
+                if op in ("$in", "$nin"):
+                    params.append(_prepare_in(operand))
+                    ops.append((op, None))
+                elif op == "$regex":
+                    params.append(_prepare_regex(operand, value.get("$options")))
+                    ops.append((op, None))
+                elif op == "$exists":
+                    params.append(bool(operand))
+                    ops.append((op, None))
+                elif op in _COMPARISON_OPERATORS:
+                    params.append(operand)
+                    ops.append((op, _type_class(operand)))
+                else:
+                    params.append(operand)
+                    ops.append((op, None))
+            parts.append((key, "$ops", tuple(ops)))
+        else:
+            params.append(value)
+            parts.append((key, "$eq"))
+    return tuple(parts)
+
+
+def _getter(field: str) -> Callable[[Dict[str, Any]], Any]:
+    """Build a field accessor, avoiding path splitting for top-level fields."""
+    if "." not in field:
+        return lambda doc: doc.get(field, MISSING)
+    return lambda doc: get_field(doc, field)
+
+
+def _compile_operator(get, op: str, type_class: Optional[str], i: int):
+    """Compile one field operator into a test taking (doc, params)."""
+    if op == "$eq":
+        def test(doc, p):
+            value = get(doc)
+            return value is not MISSING and value == p[i]
+    elif op == "$ne":
+        def test(doc, p):
+            value = get(doc)
+            if value is MISSING:
+                # Like MongoDB, {"$ne": None} excludes documents without the field
+                return p[i] is not None
+            return value != p[i]
+    elif op in ("$in", "$nin"):
+        def contains(doc, p):
+            value = get(doc)
+            if value is MISSING:
+                return False
+            try:
+                return value in p[i][0]
+            except TypeError:
+                return freeze(value) in p[i][0]
+        if op == "$in":
+            test = contains
+        else:
+            def test(doc, p):
+                return not contains(doc, p)
+    elif op == "$exists":
+        def test(doc, p):
+            return (get(doc) is not MISSING) is p[i]
+    elif op == "$regex":
+        def test(doc, p):
+            value = get(doc)
+            return isinstance(value, str) and p[i].search(value) is not None
+    else:
+        check = _TYPE_CHECKS.get(type_class)
+        compare = {
+            "$gt": lambda a, b: a > b,
+            "$gte": lambda a, b: a >= b,
+            "$lt": lambda a, b: a < b,
+            "$lte": lambda a, b: a <= b,
+        }[op]
+        if check is not None:
+            def test(doc, p):
+                value = get(doc)
+                if not check(value):
+                    return False
+                try:
+                    return compare(value, p[i])
+                except TypeError:
+                    # e.g. naive vs aware datetimes
+                    return False
+        else:
+            def test(doc, p):
+                value = get(doc)
+                if value is MISSING or value is None:
+                    return False
+                try:
+                    return compare(value, p[i])
+                except TypeError:
+                    return False
+    return test
+
+
+def _all_of(tests):
+    """Combine tests with AND, short-circuiting on the first failure."""
+    if len(tests) == 1:
+        return tests[0]
+
+    def test(doc, p):
+        for t in tests:
+            if not t(doc, p):
+                return False
+        return True
+    return test
+
+
+def _compile_parts(shape: Tuple[Any, ...], counter: List[int]):
+    """Compile a shape; ``counter`` tracks the next parameter slot."""
+    tests = []
+    for part in shape:
+        key = part[0]
+        if key in _LOGICAL_OPERATORS:
+            subs = [_compile_parts(sub, counter) for sub in part[1]]
+            if key == "$and":
+                tests.append(_all_of(subs))
+            elif key == "$or":
+                tests.append(lambda doc, p, subs=subs: any(s(doc, p) for s in subs))
+            else:
+                tests.append(lambda doc, p, subs=subs: not any(s(doc, p) for s in subs))
+            continue
+        get = _getter(key)
+        if part[1] == "$eq":
+            tests.append(_compile_operator(get, "$eq", None, counter[0]))
+            counter[0] += 1
+        else:
+            for op, type_class in part[2]:
+                tests.append(_compile_operator(get, op, type_class, counter[0]))
+                counter[0] += 1
+    if not tests:
+        return lambda doc, p: True
+    return _all_of(tests)
+
+
+@lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def _compile_shape(shape: Tuple[Any, ...]):
+    """Compile a query shape into a test taking (doc, params); cached by shape."""
+    return _compile_parts(shape, [0])
+
+
+def compile_query(query: Optional[Dict[str, Any]]) -> Matcher:
+    """
+    Compile a filter into a matcher closure.
+
+    Args:
+        query: MongoDB-style filter (None or {} matches everything)
+
+    Returns:
+        A function taking a document and returning whether it matches
+
+    Raises:
+        OperationFailure: If the filter uses an unsupported operator
+    """
+    if not query:
+        return lambda doc: True
+    params: List[Any] = []
+    test = _compile_shape(_extract_shape(query, params))
+    return lambda doc: test(doc, params)
+
+
+def compile_cache_info():
+    """Return hit/miss statistics for the compiled shape cache."""
+    return _compile_shape.cache_info()
+
+
+def _canonical(value: Any) -> Any:
+    """Canonical, hashable form of a filter value that keeps type distinctions."""
+    if isinstance(value, dict):
+        return ("dict", tuple(sorted(((str(k), _canonical(v)) for k, v in value.items()),
+                                     key=lambda item: item[0])))
+    if isinstance(value, (list, tuple)):
+        return ("list", tuple(_canonical(v) for v in value))
+    try:
+        hash(value)
+    except TypeError:
+        return ("repr", repr(value))
+    # Keep 1, 1.0 and True apart: they compare equal but bracket differently
+    return (type(value).__name__, value)
+
+
+def query_key(query: Optional[Dict[str, Any]]) -> Any:
+    """
+    Return a canonical cache key for a filter.
+
+    Filters that differ only in key order produce the same key.
+    """
+    return _canonical(query or {})
+
+
+def query_fields(query: Optional[Dict[str, Any]]) -> frozenset:
+    """Return the top-level field names a filter reads, including inside $and/$or/$nor."""
+    fields = set()
+    clauses = [query or {}]
+    while clauses:
+        clause = clauses.pop()
+        for key, value in clause.items():
+            if key in _LOGICAL_OPERATORS:
+                clauses.extend(value)
+            elif not key.startswith("$"):
+                fields.add(key.split(".", 1)[0])
+    return frozenset(fields)
+
+
+class QueryConditions(NamedTuple):
+    """Index-usable conditions extracted from a filter."""
+
+    equals: Dict[str, Any]
+    ins: Dict[str, Tuple[Any, ...]]
+    ranges: Dict[str, Tuple[Optional[Tuple[Any, bool]], Optional[Tuple[Any, bool]]]]
+    # True when the filter is nothing but plain top-level equalities
+    exact: bool
+
+
+def analyze_query(query: Optional[Dict[str, Any]]) -> QueryConditions:
+    """
+    Extract the conditions an index can answer from a filter.
+
+    Top-level $and clauses are flattened; $or/$nor are left to the matcher.
+    The result only narrows candidates, so callers still apply the matcher.
+    """
+    equals: Dict[str, Any] = {}
+    ins: Dict[str, Tuple[Any, ...]] = {}
+    ranges: Dict[str, Tuple[Optional[Tuple[Any, bool]], Optional[Tuple[Any, bool]]]] = {}
+    exact = True
+
+    clauses = [query or {}]
+    while clauses:
+        clause = clauses.pop()
+        for key, value in clause.items():
+            if key == "$and" and isinstance(value, (list, tuple)):
+                clauses.extend(value)
+                exact = False
+                continue
+            if key.startswith("$"):
+                exact = False
+                continue
+            if not is_operator_dict(value):
+                equals.setdefault(key, value)
+                continue
+            exact = False
+            lower = upper = None
+            for op, operand in value.items():
+                if op == "$eq":
+                    equals.setdefault(key, operand)
+                elif op == "$in" and isinstance(operand, (list, tuple)):
+                    ins.setdefault(key, tuple(operand))
+                elif op in ("$gt", "$gte"):
+                    lower = (operand, op == "$gte")
+                elif op in ("$lt", "$lte"):
+                    upper = (operand, op == "$lte")
+            if lower is not None and upper is not None and (
+                _type_class(lower[0]) != _type_class(upper[0])
+            ):
+                continue
+            if lower is not None or upper is not None:
+                ranges.setdefault(key, (lower, upper))
+    return QueryConditions(equals, ins, ranges, exact)
@@ -0,0 +1,91 @@
+"""
+In-Memory Write Results
+
+This module provides the write results returned by the in-memory database.
+They are dicts, so existing ``result["inserted_id"]`` callers keep working,
+and also expose their fields as attributes like pymongo's result classes,
+so code written against Motor (``result.inserted_id``) runs unchanged.
+"""
+
+from typing import Any, Dict, List
+
+
+class WriteResult(dict):
+    """Dict-backed write result with attribute access to its fields."""
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    @property
+    def acknowledged(self) -> bool:
+        """In-memory writes are always acknowledged."""
+        return True
+
+
+class InsertOneResult(WriteResult):
+    """Result of insert_one: ``inserted_id``."""
+
+    def __init__(self, inserted_id: Any):
+        super().__init__(inserted_id=inserted_id)
+
+
+class InsertManyResult(WriteResult):
+    """Result of insert_many: ``inserted_ids`` in input order."""
+
+    def __init__(self, inserted_ids: List[Any]):
+        super().__init__(inserted_ids=inserted_ids)
+
+
+class UpdateResult(WriteResult):
+    """Result of an update: ``matched_count``, ``modified_count`` and ``upserted_id``."""
+
+    def __init__(self, matched_count: int, modified_count: int, upserted_id: Any = None):
+        super().__init__(
+            modified_count=modified_count,
+            matched_count=matched_count,
+            upserted_id=upserted_id,
+        )
+
+
+class DeleteResult(WriteResult):
+    """Result of a delete: ``deleted_count``."""
+
+    def __init__(self, deleted_count: int):
+        super().__init__(deleted_count=deleted_count)
+
+
+class BulkWriteResult(WriteResult):
+    """
+    Result of bulk_write.
+
+    ``upserted_ids`` maps the position of each upserting request in the
+    input list to the _id of the document it inserted.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(
+            inserted_count=0,
+            matched_count=0,
+            modified_count=0,
+            deleted_count=0,
+            upserted_count=0,
+            upserted_ids={},
+        )
+
+    def details(self, write_errors: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Return the server-style ``details`` document for a BulkWriteError."""
+        return {
+            "writeErrors": write_errors,
+            "writeConcernErrors": [],
+            "nInserted": self["inserted_count"],
+            "nUpserted": self["upserted_count"],
+            "nMatched": self["matched_count"],
+            "nModified": self["modified_count"],
+            "nRemoved": self["deleted_count"],
+            "upserted": [
+                {"index": index, "_id": _id} for index, _id in self["upserted_ids"].items()
+            ],
+        }
@@ -0,0 +1,295 @@
+"""
+In-Memory Document Storage
+
+This module provides the document stores behind InMemoryCollection. The
+default store is a plain dict of frozen ``_id`` -> document. For large,
+mostly-cold collections the columnar store keeps the same mapping
+interface but holds documents as columns:
+
+- field names are interned, and each distinct field layout ("shape") is
+  stored once and referenced by a small id;
+- low-cardinality string fields keep one shared object per distinct value;
+- homogeneous int and float fields live in typed ``array`` columns
+  instead of one Python object per value;
+- deletes leave a tombstone and the columns are compacted once enough
+  of them accumulate, instead of shifting every later document;
+- frozen ``_id`` keys are the stable row ids: compaction only remaps keys
+  to new slots, so indexes and cached query results stay valid.
+
+Reads materialize a fresh dict per document, trading some read CPU for
+memory. Because every read returns a new dict, stored rows can never be
+mutated through a returned document, which preserves the copy-on-write
+guarantees the collection relies on.
+"""
+
+import sys
+from array import array
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+STORAGE_DICT = "dict"
+STORAGE_COLUMNAR = "columnar"
+STORAGE_MODES = (STORAGE_DICT, STORAGE_COLUMNAR)
+
+# Compact once tombstones exceed this share of the slots (and the minimum)
+COMPACT_RATIO = 0.25
+COMPACT_MIN_TOMBSTONES = 1024
+# String columns share one object per distinct value (statuses, chains,
+# factions) until they see more distinct values than this
+SHARED_VALUES_LIMIT = 256
+# Documents examined when estimating memory use
+MEMORY_SAMPLE_SIZE = 1000
+
+_TOMBSTONE = -1
+# Key placeholder for deleted slots (None is a valid _id)
+_DELETED = object()
+_TYPED_COLUMNS = {int: "q", float: "d"}
+
+Column = Union[array, List[Any]]
+
+
+class ColumnarDocumentStore(MutableMapping):
+    """
+    Mapping of frozen ``_id`` -> document, stored column-wise.
+
+    Slots are positions in the column arrays, assigned in insertion order.
+    Updates rewrite a document's slot in place, so iteration order matches
+    the dict store (inserts append, updates keep their position).
+    """
+
+    def __init__(self, documents: Optional[Dict[Any, Dict[str, Any]]] = None):
+        self._slot_of: Dict[Any, int] = {}
+        # slot -> frozen key (_DELETED for tombstones) and shape id (-1 for tombstones)
+        self._keys: List[Any] = []
+        self._shape_of = array("i")
+        self._shapes: List[Tuple[str, ...]] = []
+        self._shape_ids: Dict[Tuple[str, ...], int] = {}
+        self._columns: Dict[str, Column] = {}
+        # field -> canonical string values, or None once the field proves high-cardinality
+        self._shared_values: Dict[str, Optional[Dict[str, str]]] = {}
+        self._tombstones = 0
+        self.compactions = 0
+        if documents:
+            for key, doc in documents.items():
+                self[key] = doc
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._slot_of
+
+    def __iter__(self) -> Iterator[Any]:
+        keys = self._keys
+        return (key for key in keys if key is not _DELETED)
+
+    def __getitem__(self, key: Any) -> Dict[str, Any]:
+        return self._materialize(self._slot_of[key])
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        slot = self._slot_of.get(key)
+        return default if slot is None else self._materialize(slot)
+
+    def values(self) -> Iterator[Dict[str, Any]]:  # type: ignore[override]
+        """Materialize every live document in slot (insertion) order."""
+        shape_of = self._shape_of
+        return (
+            self._materialize(slot) for slot in range(len(shape_of))
+            if shape_of[slot] != _TOMBSTONE
+        )
+
+    def items(self) -> Iterator[Tuple[Any, Dict[str, Any]]]:  # type: ignore[override]
+        """Yield (key, document) pairs in slot order."""
+        keys = self._keys
+        return (
+            (keys[slot], self._materialize(slot)) for slot in range(len(keys))
+            if keys[slot] is not _DELETED
+        )
+
+    def _materialize(self, slot: int) -> Dict[str, Any]:
+        columns = self._columns
+        return {field: columns[field][slot] for field in self._shapes[self._shape_of[slot]]}
+
+    def __setitem__(self, key: Any, doc: Dict[str, Any]) -> None:
+        slot = self._slot_of.get(key)
+        if slot is None:
+            slot = len(self._keys)
+            self._keys.append(key)
+            self._shape_of.append(_TOMBSTONE)
+            for column in self._columns.values():
+                column.append(0 if isinstance(column, array) else None)
+            self._slot_of[key] = slot
+        self._write(slot, doc)
+
+    def _write(self, slot: int, doc: Dict[str, Any]) -> None:
+        """Store a document's values into an existing slot."""
+        shape = tuple(sys.intern(field) if type(field) is str else field for field in doc)
+        previous = self._shape_of[slot]
+        shape_id = self._shape_ids.get(shape)
+        if shape_id is None:
+            shape_id = len(self._shapes)
+            self._shapes.append(shape)
+            self._shape_ids[shape] = shape_id
+        self._shape_of[slot] = shape_id
+
+        columns = self._columns
+        if previous not in (shape_id, _TOMBSTONE):
+            # Release values of fields this version of the document dropped
+            for field in set(self._shapes[previous]).difference(shape):
+                column = columns[field]
+                if not isinstance(column, array):
+                    column[slot] = None
+        for field, value in zip(shape, doc.values()):
+            column = columns.get(field)
+            if column is None:
+                column = self._new_column(field, value)
+            if isinstance(column, array):
+                if _TYPED_COLUMNS.get(type(value)) == column.typecode:
+                    try:
+                        column[slot] = value
+                        continue
+                    except OverflowError:
+                        pass
+                # Heterogeneous after all: fall back to a generic column
+                column = columns[field] = list(column)
+            if type(value) is str:
+                value = self._share(field, value)
+            column[slot] = value
+
+    def _share(self, field: str, value: str) -> str:
+        """Return the shared copy of a repeated string value."""
+        shared = self._shared_values.get(field)
+        if shared is None:
+            if field in self._shared_values:
+                return value
+            shared = self._shared_values[field] = {}
+        canonical = shared.setdefault(value, value)
+        if len(shared) > SHARED_VALUES_LIMIT:
+            # Mostly unique values (ids, names): sharing would only cost memory
+            self._shared_values[field] = None
+        return canonical
+
+    def _new_column(self, field: str, value: Any) -> Column:
+        """Create a column for a new field, typed when the first value allows."""
+        slots = len(self._keys)
+        typecode = _TYPED_COLUMNS.get(type(value))
+        column: Column
+        if typecode is not None:
+            column = array(typecode, [0]) * slots
+        else:
+            column = [None] * slots
+        self._columns[field] = column
+        return column
+
+    def __delitem__(self, key: Any) -> None:
+        slot = self._slot_of.pop(key)
+        self._keys[slot] = _DELETED
+        # Drop object references so deleted values can be freed before compaction
+        for field in self._shapes[self._shape_of[slot]]:
+            column = self._columns[field]
+            if not isinstance(column, array):
+                column[slot] = None
+        self._shape_of[slot] = _TOMBSTONE
+        self._tombstones += 1
+        if self._tombstones >= max(COMPACT_MIN_TOMBSTONES, COMPACT_RATIO * len(self._keys)):
+            self.compact()
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def compact(self) -> None:
+        """Drop tombstoned slots and renumber the live ones, keeping their order."""
+        live = [slot for slot in range(len(self._keys)) if self._keys[slot] is not _DELETED]
+        for field, column in list(self._columns.items()):
+            if isinstance(column, array):
+                self._columns[field] = array(column.typecode, (column[slot] for slot in live))
+            else:
+                self._columns[field] = [column[slot] for slot in live]
+        self._keys = [self._keys[slot] for slot in live]
+        self._shape_of = array("i", (self._shape_of[slot] for slot in live))
+        self._slot_of = {key: slot for slot, key in enumerate(self._keys)}
+        self._tombstones = 0
+        self.compactions += 1
+
+    def describe(self) -> Dict[str, Any]:
+        """Return layout statistics for metrics."""
+        return {
+            "slots": len(self._keys),
+            "tombstones": self._tombstones,
+            "compactions": self.compactions,
+            "shapes": len(self._shapes),
+            "typed_columns": sorted(
+                field for field, column in self._columns.items() if isinstance(column, array)
+            ),
+            "generic_columns": sorted(
+                field for field, column in self._columns.items() if not isinstance(column, array)
+            ),
+        }
+
+
+def _object_size(value: Any, seen: set) -> int:
+    """Size of an object and its contents, counting each object once."""
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_object_size(k, seen) + _object_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_object_size(v, seen) for v in value)
+    return size
+
+
+def estimate_memory(store: Any) -> Dict[str, Any]:
+    """
+    Estimate the bytes a document store uses.
+
+    Container overhead is measured exactly; document values are measured
+    on an evenly spaced sample and extrapolated, so the cost stays bounded
+    for large collections. Shared objects (interned keys and strings,
+    shapes) are counted once.
+
+    Args:
+        store: A plain dict store or a ColumnarDocumentStore
+
+    Returns:
+        Dict with total_bytes and bytes_per_document
+    """
+    count = len(store)
+    if count == 0:
+        return {"total_bytes": 0, "bytes_per_document": 0}
+    step = max(1, count // MEMORY_SAMPLE_SIZE)
+    seen: set = set()
+
+    if isinstance(store, ColumnarDocumentStore):
+        fixed = (
+            sys.getsizeof(store._slot_of) + sys.getsizeof(store._keys)
+            + sys.getsizeof(store._shape_of)
+            + sum(_object_size(shape, seen) for shape in store._shapes)
+            + sum(sys.getsizeof(column) for column in store._columns.values())
+            + sum(_object_size(shared, seen) for shared in store._shared_values.values() if shared)
+        )
+        sampled = 0
+        sample_count = 0
+        for index, key in enumerate(store):
+            if index % step:
+                continue
+            sample_count += 1
+            slot = store._slot_of[key]
+            sampled += _object_size(key, seen)
+            for field in store._shapes[store._shape_of[slot]]:
+                column = store._columns[field]
+                if not isinstance(column, array):
+                    sampled += _object_size(column[slot], seen)
+    else:
+        fixed = sys.getsizeof(store)
+        sampled = 0
+        sample_count = 0
+        for index, (key, doc) in enumerate(store.items()):
+            if index % step:
+                continue
+            sample_count += 1
+            sampled += _object_size(key, seen) + _object_size(doc, seen)
+
+    total = fixed + int(sampled * count / sample_count)
+    return {"total_bytes": total, "bytes_per_document": round(total / count, 1)}
@@ -0,0 +1,164 @@
+"""
+In-Memory TTL Expiry
+
+This module provides the expiry queue behind TTL indexes
+(``create_index(..., expireAfterSeconds=N)``) in the in-memory database.
+
+A document expires ``N`` seconds after the date in the indexed field; for
+an array of dates the earliest one counts, and documents whose field is
+missing or not a date never expire, as in MongoDB. Naive datetimes are
+taken to be UTC, the way pymongo stores them.
+
+Expiry times are kept in a min-heap, so a sweep pops only the entries that
+are due instead of scanning the collection. Entries are never removed when
+a document is updated or deleted; the sweep re-checks each popped entry
+against the stored document and skips stale ones, and the heap is rebuilt
+once stale entries outnumber live ones.
+"""
+
+import heapq
+import itertools
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .index import get_field
+
+# Rebuild the heap once it holds more than this many entries per live one
+# (plus a floor, so small collections never bother)
+REBUILD_FACTOR = 2
+REBUILD_MIN_ENTRIES = 1024
+
+
+def _timestamp(value: Any) -> Optional[float]:
+    """Return a date value as a UTC timestamp, or None for non-dates."""
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class ExpiryQueue:
+    """
+    Time-ordered queue of document expiry times for a collection's TTL indexes.
+
+    Heap entries are ``(expires_at, sequence, key, index name)``; the
+    sequence breaks ties so document keys are never compared.
+    """
+
+    def __init__(self) -> None:
+        # TTL index name -> (field, expireAfterSeconds)
+        self._rules: Dict[str, Tuple[str, float]] = {}
+        self._heap: List[Tuple[float, int, Any, str]] = []
+        self._seq = itertools.count()
+        self._stats = {
+            'sweeps': 0, 'documents_expired': 0, 'stale_entries_skipped': 0,
+            'heap_rebuilds': 0, 'last_sweep_ms': 0.0, 'max_sweep_ms': 0.0,
+            'total_sweep_ms': 0.0, 'last_sweep_at': None,
+        }
+
+    def __bool__(self) -> bool:
+        """True while the collection has at least one TTL index."""
+        return bool(self._rules)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def add_rule(self, index_name: str, field: str, seconds: float) -> None:
+        """Register a TTL index; the caller schedules existing documents."""
+        self._rules[index_name] = (field, float(seconds))
+
+    def remove_rule(self, index_name: str) -> None:
+        """Forget a dropped TTL index; its heap entries are skipped as stale."""
+        self._rules.pop(index_name, None)
+        if not self._rules:
+            self._heap = []
+
+    def clear(self) -> None:
+        """Drop every rule and scheduled entry, keeping the statistics."""
+        self._rules = {}
+        self._heap = []
+
+    def expires_at(self, doc: Dict[str, Any], index_name: str) -> Optional[float]:
+        """Return when a document expires under one TTL index, or None if it never does."""
+        rule = self._rules.get(index_name)
+        if rule is None:
+            return None
+        field, seconds = rule
+        value = get_field(doc, field)
+        if isinstance(value, list):
+            stamps = [stamp for stamp in map(_timestamp, value) if stamp is not None]
+            stamp = min(stamps) if stamps else None
+        else:
+            stamp = _timestamp(value)
+        return None if stamp is None else stamp + seconds
+
+    def schedule(
+        self, key: Any, doc: Dict[str, Any], previous: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Queue a stored document's expiry under every TTL index.
+
+        Args:
+            key: Frozen document id
+            doc: The stored document
+            previous: The version it replaced; unchanged expiry times are
+                already queued and are not pushed again
+        """
+        for index_name in self._rules:
+            expires_at = self.expires_at(doc, index_name)
+            if expires_at is None:
+                continue
+            if previous is not None and self.expires_at(previous, index_name) == expires_at:
+                continue
+            heapq.heappush(self._heap, (expires_at, next(self._seq), key, index_name))
+
+    def pop_due(self, now: float) -> List[Tuple[float, Any, str]]:
+        """Pop every entry due at ``now`` as (expires_at, key, index name)."""
+        heap = self._heap
+        due = []
+        while heap and heap[0][0] <= now:
+            expires_at, _, key, index_name = heapq.heappop(heap)
+            due.append((expires_at, key, index_name))
+        return due
+
+    def needs_rebuild(self, live_documents: int) -> bool:
+        """Return True once stale entries dominate the heap."""
+        limit = REBUILD_FACTOR * live_documents * len(self._rules)
+        return len(self._heap) > max(REBUILD_MIN_ENTRIES, limit)
+
+    def rebuild(self, documents: Iterable[Tuple[Any, Dict[str, Any]]]) -> None:
+        """Rebuild the heap from the stored documents, dropping stale entries."""
+        self._heap = []
+        for key, doc in documents:
+            for index_name in self._rules:
+                expires_at = self.expires_at(doc, index_name)
+                if expires_at is not None:
+                    self._heap.append((expires_at, next(self._seq), key, index_name))
+        heapq.heapify(self._heap)
+        self._stats['heap_rebuilds'] += 1
+
+    def record_sweep(self, started: float, expired: int, skipped: int) -> None:
+        """Record a sweep that began at ``started`` (a perf_counter reading)."""
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        stats = self._stats
+        stats['sweeps'] += 1
+        stats['documents_expired'] += expired
+        stats['stale_entries_skipped'] += skipped
+        stats['last_sweep_ms'] = round(elapsed_ms, 3)
+        stats['max_sweep_ms'] = round(max(stats['max_sweep_ms'], elapsed_ms), 3)
+        stats['total_sweep_ms'] = round(stats['total_sweep_ms'] + elapsed_ms, 3)
+        stats['last_sweep_at'] = time.time()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get TTL index, queue and sweep timing statistics."""
+        return {
+            'indexes': {
+                name: {'field': field, 'expire_after_seconds': seconds}
+                for name, (field, seconds) in self._rules.items()
+            },
+            'scheduled_entries': len(self._heap),
+            'next_expiry_at': self._heap[0][0] if self._heap else None,
+            **self._stats,
+        }
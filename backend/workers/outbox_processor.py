@@ -6,19 +6,45 @@ ensuring eventual consistency between database and blockchain state.
 """
 import asyncio
 import logging
-from typing import Any, Dict
+import os
+import socket
+import uuid
+from typing import Any, Dict, Optional, Set, Tuple
 from datetime import datetime, timezone
 
+from pymongo.errors import OperationFailure
+
 # Absolute imports rooted at 'backend'
-from backend.repository import TransactionOutboxRepository
-from backend.services.blockchain_handler import BlockchainHandler
+from backend.repository import AsyncTransactionOutboxRepository, TransactionOutboxRepository
+from backend.repository.transaction_outbox import (
+    add_entry_created_callback,
+    remove_entry_created_callback,
+)
+from backend.services.blockchain_handler import BlockchainHandler, LeaseLostError
 from backend.services.blockchain_service import BlockchainService
 
 logger = logging.getLogger(__name__)
 
+# Server error codes meaning change streams are not available at all: 40573 on
+# a standalone server, 40324 on servers predating $changeStream
+_CHANGE_STREAMS_UNSUPPORTED = frozenset([40573, 40324])
+
 
 class OutboxProcessor:
-    """Background processor for transaction outbox entries."""
+    """
+    Background processor for transaction outbox entries.
+
+    Each cycle claims entries for the free execution slots and starts them
+    as tasks without waiting for them, so a slow RPC only holds its own
+    slot (and its blockchain's concurrency limit) while other entries keep
+    flowing through later cycles.
+
+    Polling adapts to the queue: a full claim re-polls immediately, an
+    empty one backs off from min_poll_interval up to processing_interval.
+    A wake-up event cuts any wait short when an entry is created in this
+    process, when the outbox change stream reports an insert, or when an
+    in-flight entry frees its slot.
+    """
 
     def __init__(
         self,
@@ -26,6 +52,11 @@ class OutboxProcessor:
         blockchain_service: BlockchainService,
         processing_interval: int = 30,
         max_entries_per_batch: int = 10,
+        lease_seconds: float = 300,
+        worker_id: Optional[str] = None,
+        max_in_flight: Optional[int] = None,
+        min_poll_interval: float = 1.0,
+        use_change_stream: bool = True,
     ):
         """
         Initialize the outbox processor.
@@ -33,15 +64,37 @@ class OutboxProcessor:
         Args:
             db: Database connection
             blockchain_service: Initialized blockchain service
-            processing_interval: Seconds between processing cycles
+            processing_interval: Longest wait between processing cycles when idle
             max_entries_per_batch: Maximum entries to process per cycle
+            lease_seconds: Lease length; claimed entries renew it while they are processed
+            worker_id: Lease owner id; defaults to a unique host/pid-based id
+            max_in_flight: Maximum entries executing at once (default: max_entries_per_batch)
+            min_poll_interval: First backoff step once the queue is empty
+            use_change_stream: Also wake on outbox inserts seen through watch(),
+                when the database supports change streams
         """
-        self.outbox_repo = TransactionOutboxRepository(db)
+        self.db = db
+        # Async repository: database calls run on this loop with the app's client
+        self.outbox_repo = AsyncTransactionOutboxRepository(db)
         self.blockchain_handler = BlockchainHandler(self.outbox_repo, blockchain_service)
         self.processing_interval = processing_interval
         self.max_entries_per_batch = max_entries_per_batch
+        self.lease_seconds = lease_seconds
+        # Several processors may run against one outbox; each claims under its own id
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.max_in_flight = max_in_flight or max_entries_per_batch
+        self._in_flight: Set[asyncio.Task[None]] = set()
+        self.completed_count = 0
+        self.failed_count = 0
+        self.skipped_count = 0
+        self.min_poll_interval = min(min_poll_interval, processing_interval)
+        self.poll_interval = self.min_poll_interval
+        self.use_change_stream = use_change_stream
+        self._wake = asyncio.Event()
+        self._loop: asyncio.AbstractEventLoop | None = None
         self.is_running = False
         self._task: asyncio.Task[None] | None = None
+        self._watch_task: asyncio.Task[None] | None = None
 
     async def start(self) -> None:
         """Start the background processor."""
@@ -49,9 +102,18 @@ class OutboxProcessor:
             logger.warning("Outbox processor is already running")
             return
 
+        # Due-entry polls and claims rely on the {status, next_attempt_at} index
+        from backend.database.performance_optimizer import PerformanceOptimizer
+
+        await PerformanceOptimizer(self.db).ensure_required_indexes(["outbox"])
+
         self.is_running = True
+        self._loop = asyncio.get_running_loop()
+        add_entry_created_callback(self.notify)
+        if self.use_change_stream and hasattr(self.outbox_repo.collection, "watch"):
+            self._watch_task = asyncio.create_task(self._watch_new_entries())
         self._task = asyncio.create_task(self._processing_loop())
-        logger.info("Outbox processor started")
+        logger.info(f"Outbox processor started (worker: {self.worker_id})")
 
     async def stop(self) -> None:
         """Stop the background processor."""
@@ -59,6 +121,14 @@ class OutboxProcessor:
             return
 
         self.is_running = False
+        remove_entry_created_callback(self.notify)
+
+        if self._watch_task and not self._watch_task.done():
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
 
         if self._task and not self._task.done():
             self._task.cancel()
@@ -68,56 +138,164 @@ class OutboxProcessor:
                 logger.info("Outbox processor task cancelled successfully")
                 pass
 
+        # Let started entries finish: cancelling could abandon a sent transaction
+        if self._in_flight:
+            logger.info(f"Waiting for {len(self._in_flight)} in-flight outbox entries")
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
         logger.info("Outbox processor stopped")
 
+    def notify(self) -> None:
+        """Wake the processing loop now; safe to call from any thread."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            if asyncio.get_running_loop() is loop:
+                self._wake.set()
+                return
+        except RuntimeError:
+            pass
+        loop.call_soon_threadsafe(self._wake.set)
+
     async def _processing_loop(self) -> None:
         """Main processing loop."""
-        logger.info(f"Starting outbox processing loop (interval: {self.processing_interval}s)")
+        logger.info(
+            f"Starting outbox processing loop "
+            f"(interval: {self.min_poll_interval}s-{self.processing_interval}s)"
+        )
 
         while self.is_running:
             try:
-                await self._process_batch()
-                await asyncio.sleep(self.processing_interval)
+                dispatched, requested = await self._process_batch()
+                if requested == 0:
+                    # Every slot is busy; a finishing entry wakes the loop
+                    self.poll_interval = self.processing_interval
+                elif dispatched == requested:
+                    # Full claim: more work is likely waiting
+                    self.poll_interval = 0
+                elif dispatched:
+                    self.poll_interval = self.min_poll_interval
+                else:
+                    self.poll_interval = min(
+                        self.processing_interval,
+                        max(self.min_poll_interval, self.poll_interval * 2),
+                    )
+                await self._wait_for_work(self.poll_interval)
             except asyncio.CancelledError:
                 logger.info("Processing loop cancelled")
                 break
             except Exception as e:
                 logger.error(f"Error in processing loop: {e}")
-                # Sleep longer on errors to avoid spam
+                # Wait longer on errors to avoid spam
+                self.poll_interval = self.processing_interval
                 await asyncio.sleep(self.processing_interval * 2)
 
-    async def _process_batch(self) -> None:
-        """Process a batch of pending entries."""
+    async def _wait_for_work(self, timeout: float) -> None:
+        """Wait up to ``timeout`` seconds, returning early on a wake-up."""
+        if timeout <= 0:
+            await asyncio.sleep(0)
+            return
         try:
-            # BlockchainHandler exposes a synchronous API; offload to a thread
-            results = await asyncio.to_thread(
-                self.blockchain_handler.process_pending_entries,
-                max_entries=self.max_entries_per_batch,
-            )
+            await asyncio.wait_for(self._wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
 
-            if results["total_processed"] > 0:
-                logger.info(
-                    f"Processed batch: {results['total_processed']} total, "
-                    f"{results['successful']} successful, {results['failed']} failed"
-                )
+    async def _watch_new_entries(self) -> None:
+        """
+        Wake the loop for outbox inserts, including ones made by other processes.
 
-                # Log any errors
-                for error in results["errors"]:
-                    logger.warning(
-                        f"Entry {error['entry_id']} failed: {error['error']}"
-                    )
+        A stream that falls behind the change log or hits a transient error is
+        reopened with a short backoff, waking the loop so a poll picks up the
+        inserts it missed. Only a server without change streams ends the watch.
+        """
+        delay = self.min_poll_interval
+        while self.is_running:
+            try:
+                async with self.outbox_repo.collection.watch(
+                    [{"$match": {"operationType": "insert"}}]
+                ) as stream:
+                    async for _ in stream:
+                        delay = self.min_poll_interval
+                        self._wake.set()
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code in _CHANGE_STREAMS_UNSUPPORTED:
+                    logger.info(f"Outbox change stream unavailable, relying on polling: {e}")
+                    return
+                logger.warning(f"Outbox change stream interrupted, reopening in {delay}s: {e}")
+            except Exception as e:
+                logger.warning(f"Outbox change stream interrupted, reopening in {delay}s: {e}")
+            # Inserts made while the stream was down were never seen; poll for them
+            self._wake.set()
+            await asyncio.sleep(delay)
+            delay = min(self.processing_interval, delay * 2)
+
+    async def _process_batch(self) -> Tuple[int, int]:
+        """
+        Claim entries for the free execution slots and start them.
+
+        Returns:
+            Tuple of (entries dispatched, entries requested); (0, 0) means every slot is busy
 
+        Raises:
+            Exception: Claim errors, left to the processing loop's error backoff
+        """
+        free_slots = min(self.max_entries_per_batch, self.max_in_flight - len(self._in_flight))
+        if free_slots <= 0:
+            return 0, 0
+
+        entries = await self.outbox_repo.claim_batch(
+            self.worker_id, limit=free_slots, lease_seconds=self.lease_seconds
+        )
+        for entry in entries:
+            task = asyncio.create_task(self._run_entry(entry))
+            self._in_flight.add(task)
+            task.add_done_callback(self._entry_done)
+
+        if entries:
+            logger.info(
+                f"Dispatched {len(entries)} outbox entries ({len(self._in_flight)} in flight)"
+            )
+        return len(entries), free_slots
+
+    def _entry_done(self, task: "asyncio.Task[None]") -> None:
+        """Free the entry's slot and wake the loop to refill it."""
+        self._in_flight.discard(task)
+        self._wake.set()
+
+    async def _run_entry(self, entry: Any) -> None:
+        """Execute one claimed entry; failures are already recorded on the entry."""
+        try:
+            await self.blockchain_handler.process_entry_async(
+                entry, self.worker_id, self.lease_seconds
+            )
+            self.completed_count += 1
+        except LeaseLostError as e:
+            # Another worker took the entry over; it was never executed here
+            self.skipped_count += 1
+            logger.info(f"Entry {getattr(entry, 'outbox_id', 'unknown')} skipped: {e}")
         except Exception as e:
-            logger.error(f"Error processing outbox batch: {e}")
+            self.failed_count += 1
+            logger.warning(f"Entry {getattr(entry, 'outbox_id', 'unknown')} failed: {e}")
 
     async def get_health_status(self) -> Dict[str, Any]:
         """Get processor health status."""
-        stats = self.blockchain_handler.get_processing_stats()
+        stats = await self.outbox_repo.get_processing_stats()
 
         return {
             "is_running": self.is_running,
+            "worker_id": self.worker_id,
             "processing_interval": self.processing_interval,
+            "poll_interval": self.poll_interval,
             "max_batch_size": self.max_entries_per_batch,
+            "in_flight": len(self._in_flight),
+            "max_in_flight": self.max_in_flight,
+            "completed_count": self.completed_count,
+            "failed_count": self.failed_count,
+            "skipped_count": self.skipped_count,
             "last_check": datetime.now(timezone.utc).isoformat(),
             **stats,
         }
@@ -0,0 +1,235 @@
+import gzip
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.api.card_endpoints import _EXPORT_CHUNK_BYTES, _ndjson_chunks, router
+from backend.shared.card_catalog import CardCatalogIndex, get_catalog_index, publish_catalog
+
+
+FACTIONS = ["solaris", "umbral-eclipse", "aeonic", "primordial"]
+
+
+def _make_cards(n):
+    """Build a deterministic catalog of n valid cards."""
+    return [
+        {
+            "id": f"card-{i:05d}",
+            "name": f"Card {i}",
+            "description": f"Guardian unit number {i}",
+            "type": "unit",
+            "faction": FACTIONS[i % len(FACTIONS)],
+            "rarity": "common",
+            "cost": i % 10,
+        }
+        for i in range(n)
+    ]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """Database stand-in with a published catalog and no remote source."""
+    for name in ("CARDS_SOURCE_URL", "CARDS_SOURCE_FILE"):
+        monkeypatch.delenv(name, raising=False)
+    db = SimpleNamespace()
+    publish_catalog(db, CardCatalogIndex(_make_cards(1200)))
+    return db
+
+
+@pytest.fixture
+def client(db):
+    """Test client for the card router with the db attached to each request."""
+    app = FastAPI()
+    app.include_router(router)
+
+    @app.middleware("http")
+    async def attach_db(request, call_next):
+        request.state.db = db
+        return await call_next(request)
+
+    with TestClient(app) as client:
+        yield client
+
+
+class TestConditionalRequests:
+
+    def test_matching_etag_returns_304(self, client):
+        """Test that replaying the ETag of a search answers 304 without a body."""
+        # Arrange
+        first = client.get("/api/cards/search", params={"faction": "solaris"})
+        etag = first.headers["ETag"]
+
+        # Act
+        second = client.get(
+            "/api/cards/search",
+            params={"faction": "solaris"},
+            headers={"If-None-Match": f'W/{etag}'},
+        )
+
+        # Assert
+        assert first.status_code == 200
+        assert second.status_code == 304
+        assert second.content == b""
+        assert second.headers["ETag"] == etag
+
+    def test_etag_differs_per_request(self, client):
+        """Test that another query is not answered by a foreign validator."""
+        # Arrange
+        etag = client.get("/api/cards/card-00001").headers["ETag"]
+
+        # Act
+        response = client.get("/api/cards/card-00002", headers={"If-None-Match": etag})
+
+        # Assert
+        assert response.status_code == 200
+        assert response.json()["id"] == "card-00002"
+        assert response.headers["ETag"] != etag
+
+
+class TestBatchLookup:
+
+    def test_batch_returns_cards_in_request_order(self, client):
+        """Test that a batch resolves ids in order and reports the missing ones."""
+        # Act
+        response = client.post(
+            "/api/cards/batch",
+            json={"ids": ["card-00007", "nope", "card-00003", "card-00007"]},
+        )
+
+        # Assert
+        assert response.status_code == 200
+        body = response.json()
+        assert [c["id"] for c in body["cards"]] == ["card-00007", "card-00003"]
+        assert body["missing"] == ["nope"]
+
+    def test_batch_over_limit_is_rejected(self, client):
+        """Test that more than 500 ids is answered with 413."""
+        # Arrange
+        ids = [f"card-{i:05d}" for i in range(501)]
+
+        # Act
+        response = client.post("/api/cards/batch", json={"ids": ids})
+
+        # Assert
+        assert response.status_code == 413
+        assert response.json()["detail"] == "At most 500 ids per batch"
+
+
+class TestExport:
+
+    def test_chunks_are_bounded_and_line_aligned(self):
+        """Test that the export splits on line boundaries into bounded chunks."""
+        # Arrange
+        cards = _make_cards(1200)
+
+        # Act
+        chunks = list(_ndjson_chunks(cards, compress=False))
+
+        # Assert
+        assert len(chunks) > 1
+        assert all(chunk.endswith(b"\n") for chunk in chunks)
+        line_limit = max(len(json.dumps(c)) for c in cards) + 1
+        assert all(len(chunk) < _EXPORT_CHUNK_BYTES + line_limit for chunk in chunks)
+        assert [json.loads(line) for chunk in chunks for line in chunk.splitlines()] == cards
+
+    def test_export_streams_every_card(self, client, db):
+        """Test that the NDJSON export matches the catalog line for line."""
+        # Act
+        response = client.get("/api/cards/export")
+
+        # Assert
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = response.content.splitlines()
+        assert [json.loads(line) for line in lines] == get_catalog_index(db).cards
+
+    def test_gzip_export_decompresses_to_catalog(self, client, db):
+        """Test that gzip=true sends a gzip body holding the same NDJSON."""
+        # Act
+        with client.stream("GET", "/api/cards/export", params={"gzip": "true"}) as response:
+            raw = b"".join(response.iter_raw())
+
+        # Assert
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        lines = gzip.decompress(raw).splitlines()
+        assert [json.loads(line) for line in lines] == get_catalog_index(db).cards
+
+
+class TestCursorPagination:
+
+    def _walk(self, client, params):
+        """Follow nextCursor from the first page and collect every card id."""
+        ids = []
+        response = client.get("/api/cards/search", params=params).json()
+        while True:
+            ids.extend(c["id"] for c in response["cards"])
+            if response["nextCursor"] is None:
+                return ids
+            response = client.get(
+                "/api/cards/search", params={**params, "cursor": response["nextCursor"]}
+            ).json()
+
+    @pytest.mark.parametrize("params", [
+        {"faction": "solaris", "pageSize": 40},
+        {"search": "guardian", "costMin": 5, "pageSize": 75},
+    ])
+    def test_next_cursor_round_trip(self, client, db, params):
+        """Test that following nextCursor visits every match exactly once, in order."""
+        # Arrange
+        index = get_catalog_index(db)
+        expected = client.get(
+            "/api/cards/search", params={**params, "pageSize": len(index)}
+        ).json()["cards"]
+
+        # Act
+        ids = self._walk(client, params)
+
+        # Assert
+        assert ids == [c["id"] for c in expected]
+        assert len(ids) > params["pageSize"]
+
+    def test_malformed_cursor_is_rejected(self, client):
+        """Test that an undecodable cursor is answered with 400."""
+        # Act
+        response = client.get("/api/cards/search", params={"cursor": "not-a-cursor!"})
+
+        # Assert
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Invalid cursor"
+
+    def test_cursor_from_another_search_is_rejected(self, client):
+        """Test that a catalog-order cursor cannot resume a ranked text search."""
+        # Arrange
+        cursor = client.get("/api/cards/search", params={"pageSize": 5}).json()["nextCursor"]
+
+        # Act
+        response = client.get(
+            "/api/cards/search", params={"search": "guardian", "cursor": cursor}
+        )
+
+        # Assert
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Cursor does not match search"
+
+    def test_stale_cursor_resumes_after_its_last_card(self, client, db):
+        """Test that a cursor from an older catalog version re-anchors on its card id."""
+        # Arrange
+        first = client.get("/api/cards/search", params={"pageSize": 10}).json()
+        # Prepend new cards so every old position now points three cards earlier
+        added = [dict(card, id=f"new-{card['id']}") for card in _make_cards(3)]
+        publish_catalog(db, CardCatalogIndex(added + _make_cards(1200)))
+
+        # Act
+        response = client.get(
+            "/api/cards/search", params={"pageSize": 3, "cursor": first["nextCursor"]}
+        )
+
+        # Assert
+        assert response.status_code == 200
+        assert [c["id"] for c in response.json()["cards"]] == [
+            "card-00010", "card-00011", "card-00012",
+        ]
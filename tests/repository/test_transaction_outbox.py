@@ -1,10 +1,15 @@
+import asyncio
+
 import pytest
 from unittest.mock import MagicMock, patch
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Dict, Any
 
 from backend.repository.outbox_models import OutboxEntry, OutboxType, OutboxStatus
-from backend.repository.transaction_outbox import TransactionOutboxRepository
+from backend.repository.transaction_outbox import (
+    AsyncTransactionOutboxRepository,
+    TransactionOutboxRepository,
+)
 
 
 class TestTransactionOutboxRepository:
@@ -160,4 +165,174 @@ class TestTransactionOutboxRepository:
         assert stats["processing"] == 2
         assert stats["completed"] == 10
         assert stats["failed"] == 1
-        assert db_mock.outbox.count_documents.call_count == 4
\ No newline at end of file
+        assert db_mock.outbox.count_documents.call_count == 4
+
+class TestAsyncTransactionOutboxRepository:
+
+    @pytest.fixture
+    def repo(self):
+        """Create an async repository over a real in-memory database."""
+        from backend.shared.db import InMemoryDB
+        return AsyncTransactionOutboxRepository(db=InMemoryDB())
+
+    def test_entry_lifecycle(self, repo):
+        """Entries are created, listed as pending and updated without a sync bridge."""
+        async def scenario():
+            first = await repo.create_entry(OutboxType.MINT_NFT, {"card_id": "card-1"})
+            second = await repo.create_entry(OutboxType.TRANSFER_NFT, {"token_id": "token-1"})
+            await repo.increment_attempts(first.outbox_id, "Temporary error")
+            await repo.mark_completed(first.outbox_id, {"tx_hash": "0xabc"})
+            await repo.mark_failed(second.outbox_id, "Transaction failed")
+            third = await repo.create_entry(OutboxType.MINT_NFT, {"card_id": "card-2"})
+            return (
+                await repo.get_by_id(first.outbox_id),
+                await repo.get_pending(limit=10),
+                third,
+                await repo.get_processing_stats(),
+            )
+
+        # Act
+        completed, pending, third, stats = asyncio.run(scenario())
+
+        # Assert
+        assert completed.status == OutboxStatus.COMPLETED
+        assert completed.attempts == 1
+        assert completed.result == {"tx_hash": "0xabc"}
+        assert [entry.outbox_id for entry in pending] == [third.outbox_id]
+        assert stats == {"pending": 1, "processing": 0, "completed": 1, "failed": 1}
+
+    def test_get_pending_respects_limit(self, repo):
+        """get_pending returns at most ``limit`` entries."""
+        async def scenario():
+            for i in range(5):
+                await repo.create_entry(OutboxType.MINT_NFT, {"card_id": f"card-{i}"})
+            return await repo.get_pending(limit=3), await repo.get_pending(limit=0)
+
+        # Act
+        limited, empty = asyncio.run(scenario())
+
+        # Assert
+        assert len(limited) == 3
+        assert empty == []
+
+    def test_concurrent_claims_are_disjoint(self, repo):
+        """Workers claiming at the same time never receive the same entry."""
+        async def scenario():
+            for i in range(6):
+                await repo.create_entry(OutboxType.MINT_NFT, {"card_id": f"card-{i}"})
+            return await asyncio.gather(
+                repo.claim_batch("worker-a", limit=4),
+                repo.claim_batch("worker-b", limit=4),
+            )
+
+        # Act
+        batch_a, batch_b = asyncio.run(scenario())
+
+        # Assert
+        ids_a = {entry.outbox_id for entry in batch_a}
+        ids_b = {entry.outbox_id for entry in batch_b}
+        assert len(ids_a) + len(ids_b) == 6
+        assert not ids_a & ids_b
+        assert all(entry.status == OutboxStatus.PROCESSING for entry in batch_a + batch_b)
+        assert {entry.lease_owner for entry in batch_a} == {"worker-a"}
+
+    def test_expired_lease_is_reclaimed_and_fenced(self, repo):
+        """A crashed worker's entry is reclaimed, and its late updates are ignored."""
+        async def scenario():
+            entry = await repo.create_entry(OutboxType.MINT_NFT, {"card_id": "card-1"})
+            await repo.claim_batch("crashed", limit=1, lease_seconds=-1)
+            reclaimed = await repo.claim_batch("survivor", limit=1)
+            late = await repo.mark_failed(entry.outbox_id, "late failure", worker_id="crashed")
+            recorded = await repo.mark_completed(
+                entry.outbox_id, {"tx_hash": "0xabc"}, worker_id="survivor"
+            )
+            return reclaimed, late, recorded, await repo.get_by_id(entry.outbox_id)
+
+        # Act
+        reclaimed, late, recorded, final = asyncio.run(scenario())
+
+        # Assert
+        assert late is False
+        assert recorded is True
+        assert [entry.lease_owner for entry in reclaimed] == ["survivor"]
+        assert reclaimed[0].attempts == 1
+        assert final.status == OutboxStatus.COMPLETED
+        assert final.last_error != "late failure"
+        assert final.lease_owner is None
+
+    def test_manual_review_keeps_a_recorded_result(self, repo):
+        """An unrecorded result is parked for review without touching the recorded one."""
+        async def scenario():
+            entry = await repo.create_entry(OutboxType.MINT_NFT, {"card_id": "card-1"})
+            await repo.claim_batch("owner", limit=1)
+            await repo.mark_completed(entry.outbox_id, {"tx_hash": "0xaaa"}, worker_id="owner")
+            parked = await repo.mark_manual_review(
+                entry.outbox_id, "Lease lost during execution", {"tx_hash": "0xbbb"}
+            )
+            claimable = await repo.claim_batch("owner", limit=1)
+            return parked, claimable, await repo.collection.find_one({"outbox_id": entry.outbox_id})
+
+        # Act
+        parked, claimable, doc = asyncio.run(scenario())
+
+        # Assert
+        assert parked is True
+        assert claimable == []
+        assert doc["status"] == OutboxStatus.MANUAL_REVIEW.value
+        assert doc["result"] == {"tx_hash": "0xaaa"}
+        assert doc["review_result"] == {"tx_hash": "0xbbb"}
+        assert doc["lease_owner"] is None
+
+    def test_repeatedly_expired_lease_ends_in_failure(self, repo):
+        """Each reclaim counts as an attempt, so a worker-killing entry is eventually failed."""
+        async def scenario():
+            entry = await repo.create_entry(OutboxType.MINT_NFT, {"card_id": "card-1"}, max_attempts=2)
+            await repo.claim_batch("first", limit=1, lease_seconds=-1)
+            second = await repo.claim_batch("second", limit=1, lease_seconds=-1)
+            third = await repo.claim_batch("third", limit=1)
+            return second, third, await repo.get_by_id(entry.outbox_id)
+
+        # Act
+        second, third, final = asyncio.run(scenario())
+
+        # Assert
+        assert [entry.attempts for entry in second] == [1]
+        assert third == []
+        assert final.status == OutboxStatus.FAILED
+        assert final.attempts == 2
+
+    def test_rescheduled_entry_waits_for_next_attempt_at(self, repo):
+        """schedule_retry releases the lease; the entry is claimable again once due."""
+        async def scenario():
+            entry = await repo.create_entry(OutboxType.MINT_NFT, {"card_id": "card-1"})
+            await repo.claim_batch("worker-a", limit=1)
+            await repo.schedule_retry(
+                entry.outbox_id, datetime.now(timezone.utc) + timedelta(hours=1), worker_id="worker-a"
+            )
+            early = await repo.claim_batch("worker-b", limit=1)
+            await repo.schedule_retry(entry.outbox_id, datetime.now(timezone.utc))
+            due = await repo.claim_batch("worker-b", limit=1)
+            return early, due
+
+        # Act
+        early, due = asyncio.run(scenario())
+
+        # Assert
+        assert early == []
+        assert [entry.lease_owner for entry in due] == ["worker-b"]
+
+    def test_get_pending_skips_entries_not_yet_due(self, repo):
+        """Entries with a future next_attempt_at are left out until they are due."""
+        async def scenario():
+            waiting = await repo.create_entry(OutboxType.MINT_NFT, {"card_id": "card-1"})
+            due = await repo.create_entry(OutboxType.MINT_NFT, {"card_id": "card-2"})
+            await repo.schedule_retry(
+                waiting.outbox_id, datetime.now(timezone.utc) + timedelta(minutes=5)
+            )
+            return due, await repo.get_pending(limit=10)
+
+        # Act
+        due, pending = asyncio.run(scenario())
+
+        # Assert
+        assert [entry.outbox_id for entry in pending] == [due.outbox_id]
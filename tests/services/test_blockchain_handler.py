@@ -1,9 +1,15 @@
+import asyncio
+import threading
+import time
+
 import pytest
 from unittest.mock import MagicMock, patch
+from datetime import datetime, timezone
 from typing import Dict, Any
 
 from backend.services.blockchain_handler import BlockchainHandler
 from backend.repository.outbox_models import OutboxEntry, OutboxType, OutboxStatus
+from backend.repository.transaction_outbox import AsyncTransactionOutboxRepository
 
 
 class TestBlockchainHandler:
@@ -100,6 +106,25 @@ class TestBlockchainHandler:
             sample_outbox_entry.outbox_id,
             "Confirmation timeout"
         )
+
+    def test_failed_entry_is_rescheduled_without_sleeping(self, handler, sample_outbox_entry, mock_outbox_repo, mock_blockchain_service):
+        """A sync failure with attempts left stores a future next_attempt_at instead of sleeping."""
+        # Arrange
+        mock_outbox_repo.get_pending.return_value = [sample_outbox_entry]
+        mock_blockchain_service.mint_nft.side_effect = Exception("Transaction failed")
+
+        # Act
+        with patch("time.sleep") as sleep:
+            results = handler.process_pending_entries()
+
+        # Assert
+        assert results["failed"] == 1
+        sleep.assert_not_called()
+        mock_outbox_repo.schedule_retry.assert_called_once()
+        entry_id, next_attempt_at = mock_outbox_repo.schedule_retry.call_args.args
+        assert entry_id == sample_outbox_entry.outbox_id
+        assert next_attempt_at > datetime.now(timezone.utc)
+        mock_outbox_repo.mark_failed.assert_not_called()
     
     def test_get_processing_stats(self, handler, mock_outbox_repo):
         """Test getting processing stats."""
@@ -119,4 +144,141 @@ class TestBlockchainHandler:
         assert stats["processing"] == 2
         assert stats["completed"] == 10
         assert stats["failed"] == 1
-        mock_outbox_repo.get_processing_stats.assert_called_once()
\ No newline at end of file
+        mock_outbox_repo.get_processing_stats.assert_called_once()
+
+    def test_process_pending_entries_async(self, sample_outbox_entry, mock_blockchain_service):
+        """The async path awaits the repository and completes entries."""
+        # Arrange
+        async_repo = MagicMock(spec=AsyncTransactionOutboxRepository)
+        async_repo.get_pending.return_value = [sample_outbox_entry]
+        mock_blockchain_service.mint_nft.return_value = "0xabcdef1234567890"
+        mock_blockchain_service.wait_for_confirmation.return_value = {"status": 1}
+        handler = BlockchainHandler(
+            outbox_repo=async_repo,
+            blockchain_service=mock_blockchain_service
+        )
+
+        # Act
+        results = asyncio.run(handler.process_pending_entries_async(max_entries=10))
+
+        # Assert
+        assert results["successful"] == 1
+        async_repo.get_pending.assert_awaited_once_with(limit=10)
+        async_repo.mark_completed.assert_awaited_once_with(
+            sample_outbox_entry.outbox_id,
+            {
+                "tx_hash": "0xabcdef1234567890",
+                "status": "confirmed",
+                "receipt": {"status": 1}
+            }
+        )
+
+    def test_process_pending_entries_async_claims_with_worker_id(self, sample_outbox_entry, mock_blockchain_service):
+        """With a worker id, entries are claimed and updates are fenced to the lease."""
+        # Arrange
+        async_repo = MagicMock(spec=AsyncTransactionOutboxRepository)
+        async_repo.claim_batch.return_value = [sample_outbox_entry]
+        mock_blockchain_service.mint_nft.return_value = "0xabcdef1234567890"
+        mock_blockchain_service.wait_for_confirmation.return_value = {"status": 1}
+        handler = BlockchainHandler(
+            outbox_repo=async_repo,
+            blockchain_service=mock_blockchain_service
+        )
+
+        # Act
+        results = asyncio.run(handler.process_pending_entries_async(
+            max_entries=10, worker_id="worker-a", lease_seconds=60
+        ))
+
+        # Assert
+        assert results["successful"] == 1
+        async_repo.claim_batch.assert_awaited_once_with("worker-a", limit=10, lease_seconds=60)
+        async_repo.get_pending.assert_not_called()
+        assert async_repo.mark_completed.await_args.kwargs == {"worker_id": "worker-a"}
+
+    def test_entry_whose_lease_was_lost_is_skipped(self, sample_outbox_entry, mock_blockchain_service):
+        """A claimed entry whose lease is gone by execution time is skipped, not executed."""
+        # Arrange
+        async_repo = MagicMock(spec=AsyncTransactionOutboxRepository)
+        async_repo.claim_batch.return_value = [sample_outbox_entry]
+        async_repo.renew_lease.return_value = False
+        handler = BlockchainHandler(
+            outbox_repo=async_repo,
+            blockchain_service=mock_blockchain_service
+        )
+
+        # Act
+        results = asyncio.run(handler.process_pending_entries_async(
+            max_entries=10, worker_id="worker-a", lease_seconds=60
+        ))
+
+        # Assert
+        assert results["skipped"] == 1
+        assert results["successful"] == 0
+        assert results["failed"] == 0
+        mock_blockchain_service.mint_nft.assert_not_called()
+        async_repo.mark_completed.assert_not_called()
+
+    def test_failed_async_entry_is_rescheduled_not_slept_on(self, sample_outbox_entry, mock_blockchain_service):
+        """A failure with attempts left releases the entry with a future next_attempt_at."""
+        # Arrange
+        async_repo = MagicMock(spec=AsyncTransactionOutboxRepository)
+        async_repo.get_pending.return_value = [sample_outbox_entry]
+        mock_blockchain_service.mint_nft.side_effect = Exception("RPC timeout")
+        handler = BlockchainHandler(
+            outbox_repo=async_repo,
+            blockchain_service=mock_blockchain_service
+        )
+
+        # Act
+        results = asyncio.run(handler.process_pending_entries_async(max_entries=10))
+
+        # Assert
+        assert results["failed"] == 1
+        mock_blockchain_service.mint_nft.assert_called_once()
+        async_repo.increment_attempts.assert_awaited_once_with(sample_outbox_entry.outbox_id, "RPC timeout")
+        async_repo.schedule_retry.assert_awaited_once()
+        assert async_repo.schedule_retry.await_args.args[1] > datetime.now(timezone.utc)
+        async_repo.mark_failed.assert_not_called()
+
+    def test_async_entries_run_concurrently_within_chain_limit(self, mock_blockchain_service):
+        """Entries overlap, but never more than the blockchain's limit at once."""
+        # Arrange
+        entries = [
+            OutboxEntry.create_new(
+                outbox_type=OutboxType.MINT_NFT,
+                request_data={"blockchain": "ethereum", "recipient": "0x1", "card_id": f"card-{i}"},
+            )
+            for i in range(6)
+        ]
+        async_repo = MagicMock(spec=AsyncTransactionOutboxRepository)
+        async_repo.get_pending.return_value = entries
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def slow_execute(entry):
+            with lock:
+                running.append(entry)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(entry)
+            return {"status": "confirmed"}
+
+        handler = BlockchainHandler(
+            outbox_repo=async_repo,
+            blockchain_service=mock_blockchain_service
+        )
+        handler._execute = slow_execute
+
+        # Act
+        with patch(
+            "backend.services.blockchain_handler.BlockchainConfig.get_max_concurrency",
+            return_value=2,
+        ):
+            results = asyncio.run(handler.process_pending_entries_async(max_entries=10))
+
+        # Assert
+        assert results["successful"] == 6
+        assert max(peak) == 2
@@ -0,0 +1,190 @@
+import asyncio
+import random
+from typing import Any, Dict
+
+import pytest
+from pydantic import BaseModel
+from pymongo.errors import OperationFailure
+
+from backend.repository.base_repository import (
+    BaseRepository,
+    PaginationSpec,
+    QueryFilter,
+    SortDirection,
+    SortSpec,
+)
+from backend.shared.db import InMemoryCollection, InMemoryDB
+from backend.shared.db.aggregation import optimize_pipeline
+
+
+def run(coro):
+    """Run a coroutine to completion."""
+    return asyncio.run(coro)
+
+
+def aggregate(collection, pipeline):
+    """Run a pipeline and materialize the results."""
+    return run(collection.aggregate(pipeline).to_list(None))
+
+
+class TestAggregationPipeline:
+
+    @pytest.fixture
+    def collection(self):
+        """Outbox-like entries with statuses, chains and tags."""
+        rng = random.Random(9)
+        coll = InMemoryCollection("outbox")
+        run(coll.insert_many([
+            {
+                "status": rng.choice(["pending", "completed", "failed"]),
+                "chain": rng.choice(["ethereum", "solana"]),
+                "attempts": rng.randint(0, 4),
+                "tags": rng.sample(["nft", "mint", "transfer"], rng.randint(0, 2)),
+            }
+            for _ in range(300)
+        ]))
+        return coll
+
+    def test_group_counts_in_one_pass(self, collection):
+        """$group computes count, sum, avg, min and max per key."""
+        # Act
+        rows = aggregate(collection, [
+            {"$group": {
+                "_id": "$status",
+                "count": {"$count": {}},
+                "total": {"$sum": 1},
+                "attempts": {"$sum": "$attempts"},
+                "avg": {"$avg": "$attempts"},
+                "min": {"$min": "$attempts"},
+                "max": {"$max": "$attempts"},
+            }},
+            {"$sort": {"_id": 1}},
+        ])
+
+        # Assert
+        docs = collection.data
+        for row in rows:
+            group = [d["attempts"] for d in docs if d["status"] == row["_id"]]
+            assert row["count"] == row["total"] == len(group)
+            assert row["attempts"] == sum(group)
+            assert row["avg"] == pytest.approx(sum(group) / len(group))
+            assert (row["min"], row["max"]) == (min(group), max(group))
+        assert [r["_id"] for r in rows] == ["completed", "failed", "pending"]
+
+    def test_compound_group_key(self, collection):
+        """Group keys can be documents built from several fields."""
+        # Act
+        rows = aggregate(collection, [{"$group": {"_id": {"s": "$status", "c": "$chain"}, "n": {"$sum": 1}}}])
+
+        # Assert
+        assert sum(r["n"] for r in rows) == 300
+        assert len(rows) == len({(d["status"], d["chain"]) for d in collection.data})
+
+    def test_match_sort_skip_limit_project(self, collection):
+        """The repository-style pipeline returns the expected page and fields."""
+        # Act
+        rows = aggregate(collection, [
+            {"$match": {"status": "pending"}},
+            {"$sort": {"attempts": -1, "_id": 1}},
+            {"$skip": 2},
+            {"$limit": 5},
+            {"$project": {"attempts": 1, "state": "$status"}},
+        ])
+
+        # Assert
+        expected = sorted(
+            (d for d in collection.data if d["status"] == "pending"),
+            key=lambda d: (-d["attempts"], d["_id"]),
+        )[2:7]
+        assert rows == [{"_id": d["_id"], "attempts": d["attempts"], "state": "pending"} for d in expected]
+
+    def test_unwind_and_count(self, collection):
+        """$unwind emits one document per element; $count totals them."""
+        # Act
+        per_tag = aggregate(collection, [
+            {"$unwind": "$tags"},
+            {"$group": {"_id": "$tags", "n": {"$sum": 1}}},
+        ])
+        total = aggregate(collection, [{"$unwind": "$tags"}, {"$count": "n"}])
+        preserved = aggregate(collection, [
+            {"$unwind": {"path": "$tags", "preserveNullAndEmptyArrays": True}},
+            {"$count": "n"},
+        ])
+
+        # Assert
+        expected = sum(len(d["tags"]) for d in collection.data)
+        assert sum(r["n"] for r in per_tag) == expected
+        assert total == [{"n": expected}]
+        assert preserved == [{"n": expected + sum(1 for d in collection.data if not d["tags"])}]
+
+    def test_stored_documents_are_not_modified(self, collection):
+        """Projection and unwind build new documents."""
+        # Arrange
+        before = [dict(d) for d in collection.data]
+
+        # Act
+        aggregate(collection, [{"$unwind": "$tags"}, {"$project": {"tags": 0}}])
+
+        # Assert
+        assert collection.data == before
+
+    def test_optimizer_merges_and_hoists_matches(self):
+        """Adjacent $match stages merge and move ahead of $sort."""
+        # Act
+        stages = optimize_pipeline([
+            {"$sort": {"a": 1}},
+            {"$match": {"x": 1}},
+            {"$match": {"y": 2}},
+            {"$limit": 3},
+        ])
+
+        # Assert
+        assert stages == [("$match", {"x": 1, "y": 2}), ("$sort", {"a": 1}), ("$limit", 3)]
+
+    def test_invalid_stage_raises(self, collection):
+        """Unknown stages are rejected up front."""
+        with pytest.raises(OperationFailure):
+            collection.aggregate([{"$lookup": {}}])
+
+    def test_empty_count_emits_nothing(self, collection):
+        """$count over no documents returns no rows, like MongoDB."""
+        assert aggregate(collection, [{"$match": {"status": "missing"}}, {"$count": "n"}]) == []
+
+
+class _Item(BaseModel):
+    id: Any = None
+    name: str
+    score: int
+
+
+class _ItemRepository(BaseRepository[_Item, Any]):
+    def _get_entity_id(self, entity: _Item) -> Any:
+        return entity.id
+
+    def _create_model_from_dict(self, data: Dict[str, Any]) -> _Item:
+        return _Item(id=data.get("_id"), name=data["name"], score=data["score"])
+
+    def _model_to_dict(self, model: _Item) -> Dict[str, Any]:
+        return {"name": model.name, "score": model.score}
+
+
+class TestRepositoryOnInMemoryDB:
+
+    def test_find_many_runs_against_in_memory_collection(self):
+        """BaseRepository.find_many works end to end through aggregate()."""
+        # Arrange
+        db = InMemoryDB()
+        run(db.items.insert_many([{"name": f"item-{i}", "score": i % 7} for i in range(40)]))
+        repo = _ItemRepository(db, "items", _Item, enable_caching=False)
+
+        # Act
+        result = run(repo.find_many(
+            filters=[QueryFilter("score", "gte", 3), QueryFilter("name", "regex", "ITEM-1")],
+            sorts=[SortSpec("score", SortDirection.DESC)],
+            pagination=PaginationSpec(page=1, limit=3),
+        ))
+
+        # Assert
+        scores = [i % 7 for i in range(40) if i % 7 >= 3 and "item-1" in f"item-{i}"]
+        assert result.total_count == len(scores)
+        assert [item.score for item in result.data] == sorted(scores, reverse=True)[:3]
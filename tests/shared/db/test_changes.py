@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+from pymongo import ReplaceOne
+from pymongo.errors import OperationFailure
+
+from backend.shared.db import InMemoryCollection, InMemoryDB
+from backend.shared.db.changes import ChangeFeed, InMemoryChangeStream
+
+
+def run(coro):
+    """Run a coroutine to completion."""
+    return asyncio.run(coro)
+
+
+async def drain(stream):
+    """Collect every change already available without waiting."""
+    changes = []
+    while True:
+        change = await stream.try_next()
+        if change is None:
+            return changes
+        changes.append(change)
+
+
+class TestCollectionWatch:
+
+    def test_streams_every_write_kind(self):
+        """Inserts, updates, replaces and deletes arrive in order as change events."""
+        async def scenario():
+            coll = InMemoryCollection("outbox")
+            async with coll.watch(max_await_time_ms=0) as stream:
+                await coll.insert_one({"_id": 1, "status": "pending", "note": "x"})
+                await coll.update_one({"_id": 1}, {"$set": {"status": "processing"}})
+                await coll.bulk_write([ReplaceOne({"_id": 1}, {"status": "completed"})])
+                await coll.delete_one({"_id": 1})
+                return await drain(stream)
+
+        # Act
+        changes = run(scenario())
+
+        # Assert
+        assert [c["operationType"] for c in changes] == ["insert", "update", "replace", "delete"]
+        assert all(c["documentKey"] == {"_id": 1} for c in changes)
+        assert changes[0]["ns"]["coll"] == "outbox"
+        assert changes[0]["fullDocument"] == {"_id": 1, "status": "pending", "note": "x"}
+        assert changes[1]["updateDescription"]["updatedFields"] == {"status": "processing"}
+        assert changes[1]["updateDescription"]["removedFields"] == []
+        assert "fullDocument" not in changes[1]
+        assert changes[2]["fullDocument"] == {"_id": 1, "status": "completed"}
+
+    def test_pipeline_and_full_document_options(self):
+        """$match filters events and updateLookup adds the updated document."""
+        async def scenario():
+            coll = InMemoryCollection("outbox")
+            stream = coll.watch(
+                [{"$match": {"operationType": "update", "fullDocument.status": "failed"}}],
+                full_document="updateLookup",
+                max_await_time_ms=0,
+            )
+            await coll.insert_many([{"_id": i, "status": "pending"} for i in range(3)])
+            await coll.update_one({"_id": 0}, {"$set": {"status": "completed"}})
+            await coll.update_one({"_id": 2}, {"$set": {"status": "failed"}})
+            changes = await drain(stream)
+            await stream.close()
+            return changes
+
+        # Act
+        changes = run(scenario())
+
+        # Assert
+        assert [c["fullDocument"] for c in changes] == [{"_id": 2, "status": "failed"}]
+
+    def test_waiting_consumer_is_woken_by_a_write(self):
+        """A consumer blocked in async for resumes as soon as a write commits."""
+        async def scenario():
+            coll = InMemoryCollection("outbox")
+            stream = coll.watch()
+            seen = []
+
+            async def consume():
+                async for change in stream:
+                    seen.append(change["fullDocument"]["n"])
+
+            consumer = asyncio.create_task(consume())
+            await asyncio.sleep(0)
+            await coll.insert_one({"n": 1})
+            await asyncio.sleep(0.01)
+            await stream.close()
+            await asyncio.wait_for(consumer, timeout=1)
+            return seen, coll.get_metrics()["change_streams"]["open"]
+
+        assert run(scenario()) == ([1], 0)
+
+    def test_resume_after_a_token(self):
+        """A new stream resumes right after the last change an earlier one saw."""
+        async def scenario():
+            coll = InMemoryCollection("outbox")
+            first = coll.watch(max_await_time_ms=0)
+            await coll.insert_many([{"n": i} for i in range(3)])
+            await first.next()
+            token = first.resume_token
+            await first.close()
+            resumed = coll.watch(resume_after=token, max_await_time_ms=0)
+            return [c["fullDocument"]["n"] for c in await drain(resumed)]
+
+        assert run(scenario()) == [1, 2]
+
+
+class TestChangeFeed:
+
+    def test_falling_behind_the_log_loses_history(self):
+        """A stream whose position was dropped from the log fails like a lost oplog."""
+        async def scenario():
+            feed = ChangeFeed(capacity=2)
+            stream = InMemoryChangeStream(feed, max_await_time_ms=0)
+            for n in range(3):
+                feed.publish("outbox", "insert", None, {"_id": n})
+            await stream.try_next()
+
+        with pytest.raises(OperationFailure) as error:
+            run(scenario())
+        assert error.value.code == 286
+
+    def test_database_watch_spans_collections(self):
+        """db.watch() reports writes to every collection, including new ones."""
+        async def scenario():
+            db = InMemoryDB()
+            async with db.watch(max_await_time_ms=0) as stream:
+                await db.outbox.insert_one({"_id": 1})
+                await db.deck_shares.insert_one({"_id": "abc"})
+                return [c["ns"]["coll"] for c in await drain(stream)]
+
+        assert run(scenario()) == ["outbox", "deck_shares"]
@@ -0,0 +1,363 @@
+import asyncio
+import random
+
+import pytest
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from backend.shared.db import InMemoryCollection, InMemoryCursor
+
+
+def run(coro):
+    """Run a coroutine to completion."""
+    return asyncio.run(coro)
+
+
+class TestCollectionIndexes:
+
+    @pytest.fixture
+    def collection(self):
+        """Create a collection with a spread of outbox-like documents."""
+        rng = random.Random(7)
+        coll = InMemoryCollection("outbox")
+
+        async def populate():
+            for i in range(300):
+                await coll.insert_one({
+                    "outbox_id": f"ob-{i:04d}",
+                    "status": rng.choice(["pending", "processing", "completed"]),
+                    "attempts": rng.randint(0, 5),
+                })
+        run(populate())
+        return coll
+
+    def _scan(self, coll, query):
+        """Reference linear scan."""
+        return [d for d in coll.data if all(k in d and d[k] == v for k, v in query.items())]
+
+    def test_indexed_queries_match_linear_scan(self, collection):
+        """Indexed find/count return the same documents as a full scan."""
+        # Arrange
+        run(collection.create_index("outbox_id", unique=True))
+        run(collection.create_index([("status", 1), ("attempts", 1)]))
+        queries = [
+            {"outbox_id": "ob-0042"},
+            {"outbox_id": "missing"},
+            {"status": "pending"},
+            {"status": "pending", "attempts": 3},
+            {"attempts": 2},
+        ]
+
+        for query in queries:
+            # Act
+            cursor = run(collection.find(query))
+            found = run(cursor.to_list(None))
+            count = run(collection.count_documents(query))
+
+            # Assert
+            expected = self._scan(collection, query)
+            assert sorted(d["_id"] for d in found) == sorted(d["_id"] for d in expected)
+            assert count == len(expected)
+
+    def test_indexes_stay_consistent_across_writes(self, collection):
+        """Updates and deletes move documents between index buckets."""
+        # Arrange
+        run(collection.create_index("status"))
+
+        # Act
+        run(collection.update_many({"status": "pending"}, {"$set": {"status": "retry"}}))
+        run(collection.update_one({"outbox_id": "ob-0001"}, {"$set": {"status": "pending"}}))
+        run(collection.delete_many({"status": "completed"}))
+
+        # Assert
+        for status in ["pending", "retry", "processing", "completed"]:
+            query = {"status": status}
+            assert run(collection.count_documents(query)) == len(self._scan(collection, query))
+        assert run(collection.count_documents({"status": "completed"})) == 0
+        assert run(collection.find_one({"outbox_id": "ob-0001"}))["status"] == "pending"
+
+    def test_unique_index_rejects_duplicates(self, collection):
+        """Unique indexes reject duplicate inserts and conflicting updates."""
+        # Arrange
+        run(collection.create_index("outbox_id", unique=True))
+
+        # Act / Assert
+        with pytest.raises(DuplicateKeyError):
+            run(collection.insert_one({"outbox_id": "ob-0000"}))
+        with pytest.raises(DuplicateKeyError):
+            run(collection.update_one({"outbox_id": "ob-0001"}, {"$set": {"outbox_id": "ob-0002"}}))
+
+        # The failed update left the original document untouched
+        assert run(collection.find_one({"outbox_id": "ob-0001"})) is not None
+        assert run(collection.count_documents({})) == 300
+
+    def test_create_unique_index_on_conflicting_data_fails(self):
+        """Building a unique index over duplicate values raises and registers nothing."""
+        # Arrange
+        coll = InMemoryCollection("users")
+        run(coll.insert_many([{"email": "a@x.io"}, {"email": "a@x.io"}]))
+
+        # Act / Assert
+        with pytest.raises(DuplicateKeyError):
+            run(coll.create_index("email", unique=True))
+        assert coll.list_indexes() == []
+
+    def test_range_scan_on_sorted_index(self, collection):
+        """Sorted indexes return ids in key order within a range."""
+        # Arrange
+        run(collection.create_index("attempts"))
+        index = collection._indexes["attempts_1"]
+
+        # Act
+        keys = list(index.scan(lower=(1, False), upper=(3, True)))
+
+        # Assert
+        values = [collection._by_id[k]["attempts"] for k in keys]
+        assert values == sorted(values)
+        assert set(values) <= {2, 3}
+        assert len(keys) == sum(1 for d in collection.data if 1 < d["attempts"] <= 3)
+
+    def test_drop_index_and_list_indexes(self, collection):
+        """Dropped indexes disappear and queries fall back to scanning."""
+        # Arrange
+        name = run(collection.create_index({"status": 1}))
+
+        # Act
+        dropped = run(collection.drop_index(name))
+
+        # Assert
+        assert dropped is True
+        assert collection.list_indexes() == []
+        assert run(collection.count_documents({"status": "pending"})) == len(
+            self._scan(collection, {"status": "pending"})
+        )
+
+
+class TestCopyOnWrite:
+
+    @pytest.fixture
+    def collection(self):
+        """Create a collection with sequential documents."""
+        coll = InMemoryCollection("cards")
+        run(coll.insert_many([{"n": i, "kind": "even" if i % 2 == 0 else "odd"} for i in range(1000)]))
+        return coll
+
+    def test_limit_only_matches_and_copies_the_window(self, collection):
+        """An unsorted find().skip().limit() stops once the window is full."""
+        # Arrange
+        calls = []
+
+        def matcher(doc):
+            calls.append(doc["n"])
+            return doc["kind"] == "even"
+
+        cursor = InMemoryCursor(collection.data, matcher=matcher)
+
+        # Act
+        docs = run(cursor.skip(2).limit(3).to_list(None))
+
+        # Assert
+        assert [d["n"] for d in docs] == [4, 6, 8]
+        assert len(calls) == 9
+
+    def test_cursor_is_a_snapshot(self, collection):
+        """Writes after find() do not leak into an unconsumed cursor."""
+        # Arrange
+        cursor = run(collection.find({"kind": "odd"}))
+
+        # Act
+        run(collection.update_many({"kind": "odd"}, {"$set": {"kind": "changed"}}))
+        run(collection.delete_one({"n": 1}))
+        docs = run(cursor.limit(2).to_list(None))
+
+        # Assert
+        assert [(d["n"], d["kind"]) for d in docs] == [(1, "odd"), (3, "odd")]
+
+    def test_returned_documents_are_private_copies(self, collection):
+        """Mutating a returned document never changes the stored one."""
+        # Arrange
+        doc = run(collection.find_one({"n": 5}))
+
+        # Act
+        doc["kind"] = "tampered"
+        listed = run(run(collection.find({"n": 5})).to_list(None))
+
+        # Assert
+        assert run(collection.find_one({"n": 5}))["kind"] == "odd"
+        assert listed[0]["kind"] == "odd"
+
+    def test_find_one_and_update_returns_untouched_original(self, collection):
+        """The BEFORE document is the pre-update snapshot."""
+        # Act
+        before = run(collection.find_one_and_update({"n": 7}, {"$inc": {"n": 100}}))
+        after = run(collection.find_one_and_update({"n": 107}, {"$set": {"x": 1}}, return_document="after"))
+
+        # Assert
+        assert before["n"] == 7
+        assert after["n"] == 107 and after["x"] == 1
+
+    def test_find_one_and_update_honours_sort(self, collection):
+        """With sort, the first match in sort order is the one updated."""
+        # Act
+        lowest = run(collection.find_one_and_update(
+            {"kind": "odd"}, {"$set": {"x": 1}}, sort=[("n", 1)]
+        ))
+        highest = run(collection.find_one_and_update(
+            {"kind": "odd"}, {"$set": {"x": 2}}, sort=[("n", -1)]
+        ))
+
+        # Assert
+        assert (lowest["n"], highest["n"]) == (1, 999)
+        assert run(collection.count_documents({"x": {"$exists": True}})) == 2
+
+
+class TestQueryCache:
+
+    @pytest.fixture
+    def collection(self):
+        """Create an unindexed collection so queries need a full scan."""
+        coll = InMemoryCollection("transactions", max_cache_size=3)
+        run(coll.insert_many([
+            {"n": i, "status": "pending" if i % 3 else "done", "owner": f"u{i % 5}"}
+            for i in range(200)
+        ]))
+        return coll
+
+    def _find(self, coll, query):
+        return run(run(coll.find(query)).to_list(None))
+
+    def test_repeated_query_hits_cache(self, collection):
+        """Key order does not matter and hit rates are reported."""
+        # Act
+        first = self._find(collection, {"status": "pending", "owner": "u1"})
+        second = self._find(collection, {"owner": "u1", "status": "pending"})
+
+        # Assert
+        stats = collection.get_cache_stats()
+        assert first == second
+        assert stats["cache_hits"] == 1
+        assert stats["cache_misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_unrelated_field_update_keeps_entry_fresh(self, collection):
+        """Writes to fields a query doesn't read keep the entry, yet results stay current."""
+        # Arrange
+        self._find(collection, {"status": "done"})
+
+        # Act
+        run(collection.update_many({"status": "done"}, {"$set": {"note": "seen"}}))
+        docs = self._find(collection, {"status": "done"})
+
+        # Assert
+        assert collection.get_cache_stats()["cache_hits"] >= 1
+        assert all(d["note"] == "seen" for d in docs)
+
+    def test_writes_invalidate_affected_queries(self, collection):
+        """Updates to read fields and matching inserts evict; deletes are filtered out."""
+        # Arrange
+        self._find(collection, {"status": "done"})
+        self._find(collection, {"owner": "u2"})
+
+        # Act
+        run(collection.update_one({"n": 1}, {"$set": {"status": "done"}}))
+        run(collection.insert_one({"n": 999, "owner": "u2", "status": "pending"}))
+        run(collection.delete_one({"n": 3}))
+
+        # Assert
+        assert collection.get_cache_stats()["invalidations"] == 2
+        assert {d["n"] for d in self._find(collection, {"status": "done"})} == {
+            d["n"] for d in collection.data if d["status"] == "done"
+        }
+        assert 999 in {d["n"] for d in self._find(collection, {"owner": "u2"})}
+        assert 3 not in {d["n"] for d in self._find(collection, {"status": "done"})}
+
+    def test_lru_eviction(self, collection):
+        """The least recently used entry is evicted when the cache is full."""
+        # Arrange
+        for owner in ["u0", "u1", "u2"]:
+            self._find(collection, {"owner": owner})
+        self._find(collection, {"owner": "u0"})
+
+        # Act
+        self._find(collection, {"owner": "u3"})
+
+        # Assert
+        stats = collection.get_cache_stats()
+        assert stats["evictions"] == 1
+        assert stats["cached_entries"] == 3
+        self._find(collection, {"owner": "u1"})
+        assert collection.get_cache_stats()["cache_misses"] == stats["cache_misses"] + 1
+
+
+class TestBulkWrites:
+
+    @pytest.fixture
+    def collection(self):
+        """Create a collection with a unique index on outbox_id."""
+        coll = InMemoryCollection("outbox")
+        run(coll.create_index("outbox_id", unique=True))
+        run(coll.insert_many([{"outbox_id": f"ob-{i}", "status": "pending"} for i in range(10)]))
+        return coll
+
+    def test_insert_many_returns_ids_with_attribute_access(self, collection):
+        """Results behave like dicts and like pymongo result objects."""
+        # Act
+        result = run(collection.insert_many([{"outbox_id": "ob-a"}, {"_id": "x", "outbox_id": "ob-b"}]))
+
+        # Assert
+        assert result.inserted_ids == result["inserted_ids"] == [11, "x"]
+        assert result.acknowledged is True
+        assert run(collection.count_documents({})) == 12
+
+    @pytest.mark.parametrize("ordered, inserted", [(True, 1), (False, 2)])
+    def test_insert_many_duplicate_handling(self, collection, ordered, inserted):
+        """Ordered batches stop at the first error; unordered ones continue."""
+        # Arrange
+        docs = [{"outbox_id": "ob-new-1"}, {"outbox_id": "ob-0"}, {"outbox_id": "ob-new-2"}]
+
+        # Act
+        with pytest.raises(BulkWriteError) as excinfo:
+            run(collection.insert_many(docs, ordered=ordered))
+
+        # Assert
+        details = excinfo.value.details
+        assert details["nInserted"] == inserted
+        assert [(e["index"], e["code"]) for e in details["writeErrors"]] == [(1, 11000)]
+        assert run(collection.count_documents({})) == 10 + inserted
+
+    def test_bulk_write_mixed_requests(self, collection):
+        """Inserts, updates, replaces, upserts and deletes apply in order."""
+        # Act
+        result = run(collection.bulk_write([
+            InsertOne({"outbox_id": "ob-10", "status": "pending"}),
+            UpdateOne({"outbox_id": "ob-10"}, {"$set": {"status": "processing"}}),
+            UpdateMany({"status": "pending"}, {"$inc": {"attempts": 1}}),
+            ReplaceOne({"outbox_id": "ob-1"}, {"outbox_id": "ob-1", "status": "done"}),
+            UpdateOne({"outbox_id": "ob-99"}, {"$set": {"status": "new"}}, upsert=True),
+            DeleteOne({"outbox_id": "ob-2"}),
+            DeleteMany({"attempts": 1}),
+        ]))
+
+        # Assert
+        assert result.inserted_count == 1
+        assert result.matched_count == 1 + 10 + 1
+        assert result.upserted_count == 1 and list(result.upserted_ids) == [4]
+        assert result.deleted_count == 1 + 8
+        remaining = {d["outbox_id"]: d["status"] for d in collection.data}
+        assert remaining == {"ob-1": "done", "ob-10": "processing", "ob-99": "new"}
+        assert "attempts" not in run(collection.find_one({"outbox_id": "ob-1"}))
+
+    def test_bulk_write_invalidates_cache_once(self):
+        """A batch leaves no stale cached results and counts each entry once."""
+        # Arrange
+        coll = InMemoryCollection("events")
+        run(coll.insert_many([{"n": i, "kind": "a"} for i in range(100)]))
+        run(run(coll.find({"kind": "a"})).to_list(None))
+
+        # Act
+        run(coll.bulk_write([InsertOne({"n": 100 + i, "kind": "a"}) for i in range(50)]))
+        found = run(run(coll.find({"kind": "a"})).to_list(None))
+
+        # Assert
+        assert len(found) == 150
+        assert coll.get_cache_stats()["invalidations"] == 1
@@ -0,0 +1,192 @@
+import asyncio
+import random
+
+import pytest
+
+from backend.shared.db import InMemoryCollection, InMemoryCursor
+
+
+def run(coro):
+    """Run a coroutine to completion."""
+    return asyncio.run(coro)
+
+
+def _reference_sort(docs, specs):
+    """Multi-pass stable sort mirroring the original cursor behaviour."""
+    result = list(docs)
+    for field, direction in reversed(specs):
+        result.sort(key=lambda d, f=field: (d.get(f) is None, d.get(f)), reverse=direction == -1)
+    return result
+
+
+class TestCursorSorting:
+
+    @pytest.fixture
+    def docs(self):
+        """Players with duplicate scores and some missing values."""
+        rng = random.Random(3)
+        docs = []
+        for i in range(500):
+            doc = {"_id": i, "score": rng.randint(0, 50), "level": rng.randint(1, 5)}
+            if i % 11 == 0:
+                doc["score"] = None
+            docs.append(doc)
+        return docs
+
+    @pytest.mark.parametrize("specs", [
+        [("score", -1)],
+        [("score", 1)],
+        [("level", 1), ("score", -1)],
+        [("level", -1), ("score", -1), ("_id", 1)],
+    ])
+    @pytest.mark.parametrize("skip, limit", [(0, 10), (5, 20), (0, None), (490, 30)])
+    def test_matches_reference_sort(self, docs, specs, skip, limit):
+        """Heap and full sorts return the same page as the old multi-pass sort."""
+        # Arrange
+        cursor = InMemoryCursor(docs).sort(specs).skip(skip)
+        if limit is not None:
+            cursor.limit(limit)
+
+        # Act
+        page = run(cursor.to_list(None))
+
+        # Assert
+        expected = _reference_sort(docs, specs)[skip:None if limit is None else skip + limit]
+        assert [d["_id"] for d in page] == [d["_id"] for d in expected]
+
+    def test_mixed_types_do_not_raise(self):
+        """Values of different types sort by type bracket instead of failing."""
+        # Arrange
+        docs = [{"v": "b"}, {"v": 2}, {"v": None}, {"v": 1.5}, {}, {"v": "a"}]
+
+        # Act
+        values = [d.get("v") for d in run(InMemoryCursor(docs).sort("v", 1).to_list(None))]
+
+        # Assert
+        assert values == [1.5, 2, "a", "b", None, None]
+
+
+class TestIndexCoveredSort:
+
+    @pytest.fixture
+    def collection(self):
+        """A leaderboard collection with score and (status, created) indexes."""
+        rng = random.Random(5)
+        coll = InMemoryCollection("leaderboard")
+
+        async def populate():
+            await coll.create_index("score")
+            await coll.create_index([("status", 1), ("created", 1)])
+            for i in range(1000):
+                await coll.insert_one({
+                    "score": rng.randint(0, 10_000),
+                    "status": rng.choice(["pending", "completed"]),
+                    "created": rng.random(),
+                })
+        run(populate())
+        return coll
+
+    @pytest.mark.parametrize("query, specs", [
+        ({}, [("score", -1)]),
+        ({"score": {"$gte": 5000}}, [("score", 1)]),
+        ({"status": "pending"}, [("created", 1)]),
+        ({"status": "pending"}, [("created", -1)]),
+    ])
+    def test_covering_index_is_used_and_correct(self, collection, query, specs):
+        """Sorts covered by an index return the same top-N as a full sort."""
+        # Arrange
+        cursor = run(collection.find(query)).sort(specs).limit(10)
+
+        # Act
+        page = run(cursor.to_list(None))
+
+        # Assert
+        matching = [d for d in collection.data if all(
+            d.get(k) == v if not isinstance(v, dict) else d[k] >= v["$gte"]
+            for k, v in query.items()
+        )]
+        expected = _reference_sort(matching, specs)[:10]
+        assert [d[specs[0][0]] for d in page] == [d[specs[0][0]] for d in expected]
+        assert collection._sorted_candidates(query, specs, len(collection.data)) is not None
+
+    def test_mixed_directions_fall_back_to_sorting(self, collection):
+        """A sort the ascending index cannot walk is still answered correctly."""
+        # Act
+        page = run(run(collection.find({})).sort([("status", 1), ("created", -1)]).limit(5).to_list(None))
+
+        # Assert
+        expected = _reference_sort(collection.data, [("status", 1), ("created", -1)])[:5]
+        assert [d["_id"] for d in page] == [d["_id"] for d in expected]
+        assert collection._sorted_candidates({}, [("status", 1), ("created", -1)], 1000) is None
+
+
+class TestAsyncIteration:
+
+    @pytest.fixture
+    def collection(self):
+        """A collection large enough to span several batches and scan chunks."""
+        coll = InMemoryCollection("events")
+        run(coll.insert_many([{"n": i, "even": i % 2 == 0} for i in range(2500)]))
+        return coll
+
+    def test_async_for_matches_to_list(self, collection):
+        """async for yields the same documents as to_list, in order."""
+        async def consume():
+            cursor = await collection.find({"even": True})
+            via_iter = [doc["n"] async for doc in cursor.sort("n", -1).skip(3).limit(500).batch_size(64)]
+            cursor = await collection.find({"even": True})
+            via_list = await cursor.sort("n", -1).skip(3).limit(500).to_list(None)
+            return via_iter, [doc["n"] for doc in via_list]
+
+        # Act
+        via_iter, via_list = run(consume())
+
+        # Assert
+        assert via_iter == via_list
+        assert len(via_iter) == 500
+
+    def test_next_raises_when_exhausted(self, collection):
+        """next() walks the cursor and then raises StopAsyncIteration."""
+        async def consume():
+            cursor = (await collection.find({"n": {"$lt": 2}})).batch_size(1)
+            first = await cursor.next()
+            second = await cursor.next()
+            with pytest.raises(StopAsyncIteration):
+                await cursor.next()
+            return first["n"], second["n"]
+
+        assert run(consume()) == (0, 1)
+
+    def test_iteration_yields_to_event_loop(self, collection):
+        """Other tasks make progress while a large scan is iterated."""
+        async def consume():
+            ticks = []
+
+            async def ticker():
+                while True:
+                    ticks.append(len(seen))
+                    await asyncio.sleep(0)
+
+            seen = []
+            task = asyncio.create_task(ticker())
+            await asyncio.sleep(0)
+            async for doc in (await collection.find({"even": False})).batch_size(100):
+                seen.append(doc["n"])
+            task.cancel()
+            return ticks, seen
+
+        # Act
+        ticks, seen = run(consume())
+
+        # Assert
+        assert len(seen) == 1250
+        # The ticker ran between batches, not only before and after the scan
+        assert any(0 < t < 1250 for t in ticks)
+
+    def test_batch_size_validation(self, collection):
+        """Invalid batch sizes are rejected."""
+        cursor = run(collection.find({}))
+        with pytest.raises(ValueError):
+            cursor.batch_size(-1)
+        with pytest.raises(TypeError):
+            cursor.batch_size("10")
@@ -0,0 +1,159 @@
+import asyncio
+import threading
+
+import pytest
+
+from backend.shared.db import InMemoryCollection, InMemoryDB
+from backend.shared.db.locks import AsyncReadWriteLock
+
+
+def run(coro):
+    """Run a coroutine to completion."""
+    return asyncio.run(coro)
+
+
+class TestAsyncReadWriteLock:
+
+    def test_readers_share_and_writers_exclude(self):
+        """Several readers hold the lock at once; a writer waits for all of them."""
+        async def scenario():
+            lock = AsyncReadWriteLock()
+            events = []
+
+            async def reader(name):
+                async with lock.read():
+                    events.append(f"{name} in ({lock.readers})")
+                    await asyncio.sleep(0.01)
+                    events.append(f"{name} out")
+
+            async def writer():
+                await asyncio.sleep(0)
+                async with lock.write():
+                    events.append(f"writer in ({lock.readers})")
+
+            await asyncio.gather(reader("r1"), reader("r2"), writer())
+            return events
+
+        # Act
+        events = run(scenario())
+
+        # Assert
+        assert events[:2] == ["r1 in (1)", "r2 in (2)"]
+        assert events[-1] == "writer in (0)"
+
+    def test_waiting_writer_blocks_new_readers(self):
+        """Readers arriving after a queued writer wait behind it."""
+        async def scenario():
+            lock = AsyncReadWriteLock()
+            order = []
+            await lock.acquire_read()
+
+            async def writer():
+                async with lock.write():
+                    order.append("writer")
+
+            async def late_reader():
+                async with lock.read():
+                    order.append("reader")
+
+            tasks = [asyncio.create_task(writer())]
+            await asyncio.sleep(0)
+            tasks.append(asyncio.create_task(late_reader()))
+            await asyncio.sleep(0)
+            lock.release_read()
+            await asyncio.gather(*tasks)
+            return order
+
+        assert run(scenario()) == ["writer", "reader"]
+
+    def test_write_side_is_reentrant_and_cancellation_safe(self):
+        """The holder can re-enter; a cancelled waiter does not wedge the lock."""
+        async def scenario():
+            lock = AsyncReadWriteLock()
+            async with lock.write():
+                async with lock.write():
+                    assert lock.owned()
+                waiter = asyncio.create_task(lock.acquire_write())
+                await asyncio.sleep(0)
+                waiter.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await waiter
+            async with lock.read():
+                return lock.locked()
+
+        assert run(scenario()) is False
+
+
+class TestCollectionLocking:
+
+    def test_reads_do_not_wait_for_a_held_write_lock(self):
+        """find and count_documents complete while a batch holds the write lock."""
+        async def scenario():
+            coll = InMemoryCollection("outbox")
+            await coll.insert_many([{"n": i} for i in range(10)])
+            inside = asyncio.Event()
+            release = asyncio.Event()
+
+            async def batch():
+                async with coll:
+                    # Write methods re-enter the lock held by this task
+                    await coll.update_one({"n": 1}, {"$set": {"n": 100}})
+                    inside.set()
+                    await release.wait()
+
+            task = asyncio.create_task(batch())
+            await inside.wait()
+            count = await asyncio.wait_for(coll.count_documents({}), timeout=1)
+            found = await asyncio.wait_for((await coll.find({"n": 100})).to_list(None), timeout=1)
+            release.set()
+            await task
+            return count, len(found)
+
+        assert run(scenario()) == (10, 1)
+
+    def test_clone_data_waits_for_the_batch(self):
+        """clone_data takes the read side, so it sees the batch's final state."""
+        async def scenario():
+            coll = InMemoryCollection("outbox")
+            await coll.insert_one({"_id": 1, "state": "start"})
+            inside = asyncio.Event()
+
+            async def batch():
+                async with coll:
+                    await coll.update_one({"_id": 1}, {"$set": {"state": "half"}})
+                    inside.set()
+                    await asyncio.sleep(0.01)
+                    await coll.update_one({"_id": 1}, {"$set": {"state": "done"}})
+
+            task = asyncio.create_task(batch())
+            await inside.wait()
+            cloned = await coll.clone_data()
+            await task
+            return cloned
+
+        assert run(scenario()) == [{"_id": 1, "state": "done"}]
+
+    def test_existing_collection_lookup_skips_the_lock(self):
+        """Lookups of existing collections succeed even while the DB lock is held elsewhere."""
+        # Arrange
+        db = InMemoryDB()
+        outbox = db.outbox
+
+        held = threading.Event()
+        done = threading.Event()
+
+        def holder():
+            with db._lock:
+                held.set()
+                done.wait(1)
+
+        # Act: the RLock is re-entrant, so hold it from another thread
+        thread = threading.Thread(target=holder)
+        thread.start()
+        held.wait(1)
+        looked_up = db["outbox"]
+        done.set()
+        thread.join()
+
+        # Assert
+        assert looked_up is outbox
@@ -0,0 +1,203 @@
+import asyncio
+import os
+
+import pytest
+
+from backend.shared.db import DatabasePersistence, InMemoryDB
+from backend.shared.db import persistence as persistence_module
+
+
+def run(coro):
+    """Run a coroutine to completion."""
+    return asyncio.run(coro)
+
+
+def open_db(directory, **kwargs):
+    """Create an InMemoryDB backed by the directory and load its state."""
+    db = InMemoryDB(persistence=DatabasePersistence(str(directory), **kwargs))
+    run(db.open())
+    return db
+
+
+class TestDatabasePersistence:
+
+    def test_state_survives_restart(self, tmp_path):
+        """Documents, updates, deletes and indexes are restored after close()."""
+        # Arrange
+        async def write():
+            db = InMemoryDB(persistence=DatabasePersistence(str(tmp_path)))
+            await db.open()
+            await db.outbox.create_index("outbox_id", unique=True)
+            await db.outbox.insert_many([{"outbox_id": f"ob-{i}", "status": "pending"} for i in range(50)])
+            await db.outbox.update_many({"outbox_id": {"$in": ["ob-1", "ob-2"]}}, {"$set": {"status": "done"}})
+            await db.outbox.delete_one({"outbox_id": "ob-3"})
+            await db.game_sessions.insert_one({"_id": "s1", "turn": 4})
+            await db.close()
+
+        run(write())
+
+        # Act
+        db = open_db(tmp_path)
+
+        # Assert
+        assert run(db.outbox.count_documents({})) == 49
+        assert run(db.outbox.count_documents({"status": "done"})) == 2
+        assert run(db.outbox.find_one({"outbox_id": "ob-3"})) is None
+        assert [index["name"] for index in db.outbox.list_indexes()] == ["outbox_id_1"]
+        assert run(db.game_sessions.find_one({"_id": "s1"}))["turn"] == 4
+        # Auto-assigned ids continue after the restored ones
+        assert run(db.outbox.insert_one({"outbox_id": "ob-new"}))["inserted_id"] == 51
+
+    def test_journal_replay_without_snapshot(self, tmp_path):
+        """Flushed journal records are replayed when no snapshot was written."""
+        # Arrange
+        async def write():
+            db = InMemoryDB(persistence=DatabasePersistence(str(tmp_path), snapshot_interval=0))
+            await db.open()
+            await db.users.insert_one({"_id": "u1", "name": "Ada"})
+            await db.users.update_one({"_id": "u1"}, {"$inc": {"wins": 3}})
+            await db._persistence.flush()
+            # Simulate a crash: nothing after the flush is persisted
+            await db.users.insert_one({"_id": "u2", "name": "lost"})
+
+        run(write())
+
+        # Act
+        db = open_db(tmp_path)
+
+        # Assert
+        assert not os.path.exists(tmp_path / "snapshot.pickle")
+        assert run(db.users.find_one({"_id": "u1"})) == {"_id": "u1", "name": "Ada", "wins": 3}
+        assert run(db.users.find_one({"_id": "u2"})) is None
+
+    def test_torn_journal_tail_is_ignored(self, tmp_path):
+        """A partially written final record does not prevent recovery."""
+        # Arrange
+        async def write():
+            db = InMemoryDB(persistence=DatabasePersistence(str(tmp_path), snapshot_interval=0))
+            await db.open()
+            await db.cards.insert_many([{"_id": i} for i in range(5)])
+            await db._persistence.flush()
+
+        run(write())
+        journal = tmp_path / "journal.0.log"
+        data = journal.read_bytes()
+        journal.write_bytes(data[:-3])
+
+        # Act
+        db = open_db(tmp_path)
+
+        # Assert
+        assert sorted(d["_id"] for d in db.cards.data) == [0, 1, 2, 3]
+        # New writes go to a fresh segment rather than after the torn record
+        assert db._persistence.get_stats()["journal_seq"] == 1
+
+    def test_snapshot_compacts_journal(self, tmp_path):
+        """A snapshot supersedes older segments and later writes replay on top."""
+        # Arrange
+        async def write():
+            db = InMemoryDB(persistence=DatabasePersistence(str(tmp_path), snapshot_interval=0))
+            await db.open()
+            await db.transactions.insert_many([{"n": i} for i in range(10)])
+            await db._persistence.flush()
+            await db._persistence.snapshot()
+            await db.transactions.delete_many({"n": {"$gte": 5}})
+            await db._persistence.flush()
+
+        run(write())
+
+        # Act
+        db = open_db(tmp_path)
+
+        # Assert
+        assert sorted(os.listdir(tmp_path)) == ["journal.1.log", "snapshot.pickle"]
+        assert sorted(d["n"] for d in db.transactions.data) == [0, 1, 2, 3, 4]
+
+    def test_replay_is_not_rejournaled(self, tmp_path):
+        """Opening a database does not append the replayed records again."""
+        # Arrange
+        async def write():
+            db = InMemoryDB(persistence=DatabasePersistence(str(tmp_path), snapshot_interval=0))
+            await db.open()
+            await db.status_checks.insert_one({"ok": True})
+            await db._persistence.flush()
+
+        run(write())
+
+        # Act
+        db = open_db(tmp_path, snapshot_interval=0)
+        stats = db._persistence.get_stats()
+
+        # Assert
+        assert stats["records_replayed"] == 1
+        assert stats["records_journaled"] == 0
+
+    @pytest.mark.parametrize("write", ["flush", "snapshot"])
+    def test_failed_journal_write_keeps_records(self, tmp_path, monkeypatch, write):
+        """Records from a failed, torn journal append are written by the next flush."""
+        # Arrange
+        real_write = persistence_module._write_durably
+        failures = []
+
+        def write_once_torn(path, data, append):
+            if not failures:
+                failures.append(path)
+                real_write(path, data[:-3], append)
+                raise OSError(28, "No space left on device")
+            real_write(path, data, append)
+
+        async def scenario():
+            db = InMemoryDB(persistence=DatabasePersistence(str(tmp_path), snapshot_interval=0))
+            await db.open()
+            await db.cards.insert_many([{"_id": i} for i in range(3)])
+            monkeypatch.setattr(persistence_module, "_write_durably", write_once_torn)
+            with pytest.raises(OSError):
+                await getattr(db._persistence, write)()
+            await db.cards.insert_one({"_id": 3})
+            await db._persistence.flush()
+
+        run(scenario())
+
+        # Act
+        db = open_db(tmp_path)
+
+        # Assert
+        assert failures
+        assert sorted(d["_id"] for d in db.cards.data) == [0, 1, 2, 3]
+
+    def test_in_memory_db_without_persistence_is_unchanged(self):
+        """open() and close() are no-ops when persistence isn't configured."""
+        # Arrange
+        db = InMemoryDB()
+
+        # Act / Assert
+        run(db.open())
+        run(db.close())
+        assert db._persistence is None
+
+
+@pytest.mark.parametrize("listener_fails", [False, True])
+def test_write_listeners_see_committed_writes(listener_fails):
+    """Listeners receive before/after documents; failures never break writes."""
+    # Arrange
+    db = InMemoryDB()
+    events = []
+
+    def listener(name, operation, before, after):
+        events.append((name, operation, before and before.get("v"), after and after.get("v")))
+        if listener_fails:
+            raise RuntimeError("boom")
+
+    db.add_write_listener(listener)
+
+    # Act
+    run(db.later.insert_one({"_id": 1, "v": "a"}))
+    run(db.later.update_one({"_id": 1}, {"$set": {"v": "b"}}))
+    run(db.later.delete_one({"_id": 1}))
+
+    # Assert
+    assert events == [
+        ("later", "insert", None, "a"),
+        ("later", "update", "a", "b"),
+        ("later", "delete", "b", None),
+    ]
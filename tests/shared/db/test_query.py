@@ -0,0 +1,170 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo.errors import OperationFailure
+
+from backend.shared.db import InMemoryCollection
+from backend.shared.db.query import analyze_query, compile_cache_info, compile_query
+
+
+def run(coro):
+    """Run a coroutine to completion."""
+    return asyncio.run(coro)
+
+
+class TestCompileQuery:
+
+    @pytest.fixture
+    def docs(self):
+        """Documents covering nested fields, lists and mixed types."""
+        return [
+            {"_id": 1, "status": "pending", "attempts": 0, "meta": {"chain": "ethereum"}},
+            {"_id": 2, "status": "failed", "attempts": 3, "meta": {"chain": "solana"}},
+            {"_id": 3, "status": "pending", "attempts": "3", "tags": ["a", "b"]},
+            {"_id": 4, "status": "completed", "attempts": 5, "items": [{"id": "x"}]},
+            {"_id": 5, "attempts": None},
+        ]
+
+    @pytest.mark.parametrize("query, expected", [
+        ({"status": "pending"}, [1, 3]),
+        ({"attempts": {"$gt": 0}}, [2, 4]),
+        ({"attempts": {"$gte": 0, "$lt": 5}}, [1, 2]),
+        ({"attempts": {"$lte": "3"}}, [3]),
+        ({"status": {"$in": ["failed", "completed"]}}, [2, 4]),
+        ({"status": {"$nin": ["pending"]}}, [2, 4, 5]),
+        ({"status": {"$ne": "pending"}}, [2, 4, 5]),
+        ({"status": {"$ne": None}}, [1, 2, 3, 4]),
+        ({"tags": {"$exists": True}}, [3]),
+        ({"meta": {"$exists": False}}, [3, 4, 5]),
+        ({"meta.chain": "solana"}, [2]),
+        ({"items.0.id": "x"}, [4]),
+        ({"tags": ["a", "b"]}, [3]),
+        ({"$or": [{"status": "failed"}, {"attempts": {"$gte": 5}}]}, [2, 4]),
+        ({"$and": [{"status": "pending"}, {"attempts": {"$exists": True}}]}, [1, 3]),
+        ({"$nor": [{"status": "pending"}, {"status": "failed"}]}, [4, 5]),
+    ])
+    def test_operators(self, docs, query, expected):
+        """Each operator matches the documents MongoDB would return."""
+        # Act
+        matches = compile_query(query)
+
+        # Assert
+        assert [d["_id"] for d in docs if matches(d)] == expected
+
+    def test_datetime_comparisons(self):
+        """Range operators work on datetimes."""
+        # Arrange
+        now = datetime(2024, 1, 1)
+        docs = [{"_id": i, "at": now + timedelta(minutes=i)} for i in range(5)]
+
+        # Act
+        matches = compile_query({"at": {"$lte": now + timedelta(minutes=2)}})
+
+        # Assert
+        assert [d["_id"] for d in docs if matches(d)] == [0, 1, 2]
+
+    def test_shape_is_compiled_once(self):
+        """Queries that differ only in values reuse the compiled shape."""
+        # Arrange
+        compile_query({"shape_probe": {"$gt": 1}, "other": "x"})
+        before = compile_cache_info()
+
+        # Act
+        matches = compile_query({"shape_probe": {"$gt": 10}, "other": "y"})
+
+        # Assert
+        after = compile_cache_info()
+        assert after.hits == before.hits + 1
+        assert after.misses == before.misses
+        assert matches({"shape_probe": 11, "other": "y"})
+        assert not matches({"shape_probe": 11, "other": "x"})
+
+    def test_unknown_operator_raises(self):
+        """Unsupported operators fail loudly instead of matching nothing."""
+        with pytest.raises(OperationFailure):
+            compile_query({"name": {"$regexx": "a"}})
+        with pytest.raises(OperationFailure):
+            compile_query({"$where": "true"})
+
+    def test_analyze_query_flattens_and(self):
+        """Top-level $and clauses contribute index conditions."""
+        # Act
+        conditions = analyze_query({
+            "$and": [{"status": "pending"}, {"attempts": {"$gte": 1, "$lt": 4}}],
+            "chain": {"$in": ["ethereum"]},
+        })
+
+        # Assert
+        assert conditions.equals == {"status": "pending"}
+        assert conditions.ranges == {"attempts": ((1, True), (4, False))}
+        assert conditions.ins == {"chain": ("ethereum",)}
+        assert conditions.exact is False
+
+
+class TestCollectionOperatorQueries:
+
+    @pytest.fixture
+    def collection(self):
+        """Create an indexed collection with mixed values."""
+        rng = random.Random(11)
+        coll = InMemoryCollection("outbox")
+
+        async def populate():
+            await coll.create_index([("status", 1), ("attempts", 1)])
+            await coll.create_index("chain", unique=False)
+            for i in range(400):
+                doc = {
+                    "status": rng.choice(["pending", "retry", "completed"]),
+                    "chain": rng.choice(["ethereum", "solana", "etherlink"]),
+                }
+                if i % 7:
+                    doc["attempts"] = rng.choice([0, 1, 2, 3, 4, "n/a", None])
+                await coll.insert_one(doc)
+        run(populate())
+        return coll
+
+    @pytest.mark.parametrize("query", [
+        {"status": "pending", "attempts": {"$lt": 3}},
+        {"status": "retry", "attempts": {"$gte": 2}},
+        {"status": {"$in": ["pending", "retry"]}},
+        {"status": "pending", "attempts": {"$in": [1, "n/a"]}},
+        {"chain": {"$in": ["solana"]}, "attempts": {"$exists": False}},
+        {"attempts": {"$gt": 1}},
+        {"$or": [{"chain": "solana"}, {"status": "completed"}]},
+    ])
+    def test_indexed_results_match_full_scan(self, collection, query):
+        """Index-narrowed queries agree with the matcher over every document."""
+        # Arrange
+        matches = compile_query(query)
+        expected = sorted(d["_id"] for d in collection.data if matches(d))
+
+        # Act
+        found = run(run_find(collection, query))
+        count = run(collection.count_documents(query))
+
+        # Assert
+        assert sorted(d["_id"] for d in found) == expected
+        assert count == len(expected)
+
+    def test_operator_updates_and_deletes(self, collection):
+        """Write paths accept operator filters too."""
+        # Act
+        run(collection.update_many({"attempts": {"$gte": 3}}, {"$set": {"status": "failed"}}))
+        deleted = run(collection.delete_many({"status": {"$in": ["completed"]}}))
+
+        # Assert
+        assert deleted["deleted_count"] > 0
+        assert run(collection.count_documents({"status": "completed"})) == 0
+        assert run(collection.count_documents({"status": "failed"})) == sum(
+            1 for d in collection.data
+            if isinstance(d.get("attempts"), int) and d["attempts"] >= 3
+            and d["status"] == "failed"
+        )
+
+
+async def run_find(collection, query):
+    """Run find and materialize the cursor."""
+    cursor = await collection.find(query)
+    return await cursor.to_list(None)
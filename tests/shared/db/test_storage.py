@@ -0,0 +1,162 @@
+import asyncio
+import json
+import random
+
+import pytest
+
+from backend.shared.db import InMemoryCollection, InMemoryDB
+from backend.shared.db.storage import COMPACT_MIN_TOMBSTONES, ColumnarDocumentStore
+
+
+def run(coro):
+    """Run a coroutine to completion."""
+    return asyncio.run(coro)
+
+
+def card_documents(count):
+    """Card-like documents decoded from JSON, so no strings are shared literals."""
+    rng = random.Random(11)
+    return json.loads(json.dumps([
+        {
+            "card_id": f"card-{i}",
+            "faction": rng.choice(["solaris", "umbral", "aeonic"]),
+            "cost": rng.randint(0, 10),
+            "power": rng.random(),
+            "tags": rng.sample(["flying", "shield", "rush"], rng.randint(0, 2)),
+        }
+        for i in range(count)
+    ]))
+
+
+class TestColumnarDocumentStore:
+
+    def test_round_trips_values_with_their_types(self):
+        """Typed columns fall back to generic ones without changing any value."""
+        # Arrange
+        store = ColumnarDocumentStore()
+        docs = {
+            1: {"_id": 1, "n": 1, "x": 1.5, "big": 2, "s": "a"},
+            2: {"_id": 2, "n": "two", "x": 2, "big": 2 ** 70, "nested": {"a": [1]}},
+            3: {"_id": 3, "flag": True, "none": None},
+        }
+
+        # Act
+        for key, doc in docs.items():
+            store[key] = doc
+        restored = {key: store[key] for key in store}
+
+        # Assert
+        assert restored == docs
+        assert [type(restored[2][field]) for field in ("n", "x", "big")] == [str, int, int]
+        assert list(restored[1]) == ["_id", "n", "x", "big", "s"]
+
+    def test_updates_keep_position_and_deletes_tombstone(self):
+        """Iteration follows insertion order like a dict, across updates and deletes."""
+        # Arrange
+        store = ColumnarDocumentStore()
+        for i in range(5):
+            store[i] = {"_id": i, "v": i}
+
+        # Act
+        store[2] = {"_id": 2, "v": "changed", "extra": True}
+        del store[1]
+        store[1] = {"_id": 1}
+
+        # Assert
+        assert list(store) == [0, 2, 3, 4, 1]
+        assert store[2] == {"_id": 2, "v": "changed", "extra": True}
+        assert store.describe()["tombstones"] == 1
+        assert None not in store
+
+    def test_compaction_preserves_documents(self):
+        """Enough deletes trigger compaction, which keeps every live document."""
+        # Arrange
+        store = ColumnarDocumentStore()
+        total = COMPACT_MIN_TOMBSTONES * 2
+        for i in range(total):
+            store[i] = {"_id": i, "v": i * 2}
+
+        # Act
+        for i in range(0, total, 2):
+            del store[i]
+
+        # Assert
+        layout = store.describe()
+        assert layout["compactions"] == 1
+        assert layout["slots"] == len(store) == total // 2
+        assert [doc["v"] for doc in store.values()] == [i * 2 for i in range(1, total, 2)]
+
+
+class TestColumnarCollection:
+
+    @pytest.fixture
+    def collections(self):
+        """The same data loaded into a dict and a columnar collection."""
+        docs = card_documents(2000)
+        result = []
+        for storage in ("dict", "columnar"):
+            coll = InMemoryCollection("cards", storage=storage)
+            run(coll.create_index("faction"))
+            run(coll.insert_many(docs))
+            result.append(coll)
+        return result
+
+    def test_operations_match_dict_storage(self, collections):
+        """Queries, updates, deletes and aggregations give identical results."""
+        async def exercise(coll):
+            await coll.update_many({"faction": "umbral"}, {"$inc": {"cost": 1}})
+            await coll.update_one({"card_id": "card-7"}, {"$set": {"faction": "solaris", "new": [1]}})
+            await coll.delete_many({"cost": {"$gte": 9}})
+            found = await (await coll.find({"faction": "solaris"})).sort("cost", -1).limit(25).to_list(None)
+            grouped = await coll.aggregate([
+                {"$group": {"_id": "$faction", "n": {"$sum": 1}, "cost": {"$avg": "$cost"}}},
+                {"$sort": {"_id": 1}},
+            ]).to_list(None)
+            return found, grouped, await coll.count_documents({"tags": "rush"}), coll.data
+
+        # Act
+        dict_result, columnar_result = (run(exercise(coll)) for coll in collections)
+
+        # Assert
+        assert dict_result == columnar_result
+
+    def test_metrics_report_lower_memory_per_document(self, collections):
+        """get_metrics reports memory per document, which columnar storage reduces."""
+        # Act
+        dict_metrics, columnar_metrics = (coll.get_metrics() for coll in collections)
+
+        # Assert
+        assert columnar_metrics["storage"] == "columnar"
+        assert 0 < columnar_metrics["memory_per_document"] < dict_metrics["memory_per_document"]
+        assert "cost" in columnar_metrics["storage_layout"]["typed_columns"]
+
+    def test_set_storage_converts_in_place(self, collections):
+        """Converting keeps documents and indexes and reports before/after memory."""
+        # Arrange
+        coll = collections[0]
+        expected = coll.data
+
+        # Act
+        report = run(coll.set_storage("columnar"))
+
+        # Assert
+        assert report["memory_per_document_after"] < report["memory_per_document_before"]
+        assert coll.data == expected
+        assert run(coll.count_documents({"faction": "aeonic"})) == sum(
+            1 for d in expected if d["faction"] == "aeonic"
+        )
+
+    def test_database_applies_configured_storage(self):
+        """InMemoryDB creates listed collections with their storage mode."""
+        # Act
+        db = InMemoryDB(collection_storage={"cards": "columnar", "history": "columnar"})
+
+        # Assert
+        assert db.cards.storage == "columnar"
+        assert db.history.storage == "columnar"
+        assert db.users.storage == "dict"
+
+    def test_unknown_storage_mode_is_rejected(self):
+        """Typos in the storage mode fail fast."""
+        with pytest.raises(ValueError):
+            InMemoryCollection("cards", storage="columns")
@@ -0,0 +1,130 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo.errors import OperationFailure
+
+from backend.shared.db import InMemoryCollection, InMemoryDB
+
+NOW = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def run(coro):
+    """Run a coroutine to completion."""
+    return asyncio.run(coro)
+
+
+def at(seconds):
+    """Unix timestamp ``seconds`` after NOW."""
+    return (NOW + timedelta(seconds=seconds)).timestamp()
+
+
+class TestTTLIndexes:
+
+    @pytest.fixture
+    def collection(self):
+        """Collection with a one-hour TTL index on created_at."""
+        coll = InMemoryCollection("outbox_history")
+        run(coll.create_index("created_at", expireAfterSeconds=3600))
+        return coll
+
+    def test_expires_only_due_documents(self, collection):
+        """Dates past their TTL are deleted; missing and non-date values never expire."""
+        # Arrange
+        run(collection.insert_many([
+            {"_id": "aware", "created_at": NOW},
+            {"_id": "naive", "created_at": NOW.replace(tzinfo=None)},
+            {"_id": "array", "created_at": [NOW + timedelta(hours=5), NOW]},
+            {"_id": "later", "created_at": NOW + timedelta(hours=2)},
+            {"_id": "string", "created_at": "2025-01-01"},
+            {"_id": "missing"},
+        ]))
+
+        # Act
+        early = run(collection.expire_documents(now=at(3599)))
+        expired = run(collection.expire_documents(now=at(3600)))
+
+        # Assert
+        assert (early, expired) == (0, 3)
+        assert sorted(doc["_id"] for doc in collection.data) == ["later", "missing", "string"]
+        assert run(collection.count_documents({"created_at": {"$exists": True}})) == 2
+
+    def test_updates_reschedule_and_deletes_are_skipped(self, collection):
+        """Stale queue entries from updates and deletes are skipped, not re-scanned."""
+        # Arrange
+        run(collection.insert_many([{"_id": i, "created_at": NOW} for i in range(3)]))
+        run(collection.update_one({"_id": 0}, {"$set": {"created_at": NOW + timedelta(days=1)}}))
+        run(collection.update_one({"_id": 1}, {"$set": {"note": "unchanged expiry"}}))
+        run(collection.delete_one({"_id": 2}))
+
+        # Act
+        expired = run(collection.expire_documents(now=at(3600)))
+
+        # Assert
+        ttl = collection.get_metrics()["ttl"]
+        assert expired == 1
+        assert [doc["_id"] for doc in collection.data] == [0]
+        assert ttl["stale_entries_skipped"] == 2
+        assert ttl["scheduled_entries"] == 1
+
+    def test_metrics_report_sweep_timing(self, collection):
+        """get_metrics exposes the TTL index, queue size and sweep timings."""
+        # Arrange
+        run(collection.insert_one({"created_at": NOW}))
+
+        # Act
+        run(collection.expire_documents(now=at(3600)))
+        ttl = collection.get_metrics()["ttl"]
+
+        # Assert
+        assert ttl["indexes"] == {
+            "created_at_1": {"field": "created_at", "expire_after_seconds": 3600.0}
+        }
+        assert ttl["sweeps"] == 1
+        assert ttl["documents_expired"] == 1
+        assert ttl["last_sweep_ms"] >= 0 and ttl["total_sweep_ms"] >= ttl["last_sweep_ms"]
+        assert collection.list_indexes()[0]["expireAfterSeconds"] == 3600
+
+    def test_dropping_the_index_stops_expiry(self, collection):
+        """Documents outlive a dropped TTL index."""
+        # Arrange
+        run(collection.insert_one({"created_at": NOW}))
+
+        # Act
+        run(collection.drop_index("created_at_1"))
+        expired = run(collection.expire_documents(now=at(7200)))
+
+        # Assert
+        assert expired == 0
+        assert len(collection.data) == 1
+        assert "ttl" not in collection.get_metrics()
+
+    @pytest.mark.parametrize("keys, seconds", [
+        ([("created_at", 1), ("status", 1)], 60),
+        ("created_at", -1),
+        ("created_at", "60"),
+    ])
+    def test_invalid_ttl_indexes_are_rejected(self, keys, seconds):
+        """TTL indexes need a single field and a non-negative number of seconds."""
+        coll = InMemoryCollection("history")
+        with pytest.raises(OperationFailure):
+            run(coll.create_index(keys, expireAfterSeconds=seconds))
+
+
+class TestTTLSweeper:
+
+    def test_open_database_sweeps_in_the_background(self):
+        """An opened InMemoryDB deletes expired documents on its own."""
+        async def scenario():
+            db = InMemoryDB(ttl_interval=0.01)
+            await db.deck_shares.create_index("created_at", expireAfterSeconds=0)
+            await db.deck_shares.insert_many([
+                {"_id": "old", "created_at": datetime.now(timezone.utc) - timedelta(minutes=1)},
+                {"_id": "new", "created_at": datetime.now(timezone.utc) + timedelta(hours=1)},
+            ])
+            await db.open()
+            await asyncio.sleep(0.05)
+            await db.close()
+            return [doc["_id"] for doc in db.deck_shares.data]
+
+        assert run(scenario()) == ["new"]
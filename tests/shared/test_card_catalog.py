@@ -0,0 +1,331 @@
+import asyncio
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+from backend.shared.card_catalog import (
+    FETCHED_AT_ATTR,
+    CardCatalogIndex,
+    CardCatalogRefresher,
+    SerializedResponseCache,
+    get_catalog_index,
+)
+
+
+FACTIONS = ["solaris", "umbral-eclipse", "aeonic", "primordial"]
+TYPES = ["unit", "spell", "hero"]
+RARITIES = ["common", "uncommon", "rare", "legendary"]
+
+
+def _naive_search(cards, faction=None, card_type=None, rarity=None,
+                  cost_min=None, cost_max=None, text=None):
+    """Reference implementation mirroring the original linear scan."""
+    results = []
+    for c in cards:
+        if faction and c.get("faction") != faction:
+            continue
+        if card_type and c.get("type") != card_type:
+            continue
+        if rarity and c.get("rarity") != rarity:
+            continue
+        if cost_min is not None and int(c.get("cost", 0)) < cost_min:
+            continue
+        if cost_max is not None and int(c.get("cost", 0)) > cost_max:
+            continue
+        if text:
+            s = text.lower()
+            if (
+                s not in str(c.get("name", "")).lower()
+                and s not in str(c.get("description", "")).lower()
+            ):
+                continue
+        results.append(c)
+    return results
+
+
+class TestCardCatalogIndex:
+
+    @pytest.fixture
+    def cards(self):
+        """Create a deterministic pseudo-random catalog."""
+        rng = random.Random(42)
+        return [
+            {
+                "id": f"card-{i:04d}",
+                "name": f"{rng.choice(['Solar', 'Shadow', 'Time', 'Bio'])} "
+                        f"{rng.choice(['Guard', 'Operative', 'Titan', 'Drone'])} {i}",
+                "description": rng.choice(["Shielded unit.", "Stealth unit.", "Ancient beast."]),
+                "type": rng.choice(TYPES),
+                "faction": rng.choice(FACTIONS),
+                "rarity": rng.choice(RARITIES),
+                "cost": rng.randint(0, 10),
+            }
+            for i in range(500)
+        ]
+
+    @pytest.fixture
+    def index(self, cards):
+        """Create an index over the sample catalog."""
+        return CardCatalogIndex(cards)
+
+    def test_no_filters_returns_catalog_order(self, index, cards):
+        """Test that an unfiltered search returns every card in order."""
+        positions = index.search()
+
+        assert [index.cards[p] for p in positions] == cards
+
+    @pytest.mark.parametrize("filters", [
+        {"faction": "solaris"},
+        {"card_type": "spell", "rarity": "rare"},
+        {"cost_min": 3, "cost_max": 5},
+        {"faction": "aeonic", "cost_min": 9},
+        {"faction": "primordial", "card_type": "hero", "rarity": "common", "cost_max": 2},
+        {"cost_min": 7, "cost_max": 2},
+        {"faction": "unknown"},
+    ])
+    def test_matches_linear_scan(self, index, cards, filters):
+        """Test that indexed searches agree with the original linear scan."""
+        # Act
+        positions = index.search(**filters)
+
+        # Assert
+        assert [index.cards[p] for p in positions] == _naive_search(cards, **filters)
+
+    @pytest.mark.parametrize("filters", [
+        {"text": "guard"},
+        {"text": "ar"},
+        {"text": "a"},
+        {"text": "d 4"},
+        {"text": "STEALTH", "rarity": "legendary"},
+        {"text": "unit", "faction": "solaris", "cost_max": 1},
+        {"text": "titan 49"},
+        {"text": "zzz"},
+    ])
+    def test_text_search_matches_substring_semantics(self, index, cards, filters):
+        """Test that trigram-backed text search finds exactly the substring matches."""
+        # Act
+        positions = index.search(**filters)
+
+        # Assert
+        expected = _naive_search(cards, **filters)
+        assert sorted(index.cards[p]["id"] for p in positions) == sorted(c["id"] for c in expected)
+
+    def test_text_search_ranks_by_relevance(self):
+        """Test that name matches outrank description matches."""
+        index = CardCatalogIndex([
+            {"id": "desc", "name": "Sentinel", "type": "unit", "description": "Guards the gate"},
+            {"id": "inner", "name": "Vanguard", "type": "unit"},
+            {"id": "word", "name": "Solar Guard", "type": "unit"},
+            {"id": "prefix", "name": "Guardian", "type": "unit"},
+            {"id": "exact", "name": "Guard", "type": "unit"},
+        ])
+
+        positions = index.search(text="guard")
+
+        assert [index.cards[p]["id"] for p in positions] == [
+            "exact", "prefix", "word", "inner", "desc",
+        ]
+
+    def test_text_candidates_require_trigrams(self, index):
+        """Test that short needles fall back to scanning instead of the trigram index."""
+        assert index.text.candidates("ar") is None
+        assert index.text.candidates("qqq") == []
+
+    def test_malformed_cost_treated_as_zero(self):
+        """Test that non-numeric costs do not break range queries."""
+        index = CardCatalogIndex([
+            {"id": "a", "name": "A", "type": "unit", "cost": "3"},
+            {"id": "b", "name": "B", "type": "unit", "cost": None},
+            {"id": "c", "name": "C", "type": "unit", "faction": ["not", "hashable"]},
+        ])
+
+        assert index.search(cost_max=0) == [1, 2]
+        assert index.search(cost_min=3) == [0]
+        assert index.search(faction="not") == []
+
+    @pytest.mark.parametrize("filters", [
+        {},
+        {"faction": "solaris", "cost_min": 4},
+        {"text": "guard"},
+        {"text": "unit", "rarity": "rare"},
+    ])
+    def test_iter_search_resumes_after_key(self, index, filters):
+        """Test that keyset iteration pages through exactly the full result set."""
+        expected = index.search(**filters)
+
+        # Act
+        seen = []
+        after = None
+        while True:
+            page = []
+            for key, pos in index.iter_search(**filters, after=after):
+                page.append((key, pos))
+                if len(page) == 7:
+                    break
+            if not page:
+                break
+            seen.extend(pos for _, pos in page)
+            after = page[-1][0]
+
+        # Assert
+        assert seen == expected
+        assert index.count(**filters) == len(expected)
+
+    def test_sort_key_matches_iteration_keys(self, index):
+        """Test that sort keys rebuilt from a position agree with iteration."""
+        for key, pos in index.iter_search(text="titan"):
+            assert index.sort_key(pos, "TITAN") == key
+        assert index.sort_key(5) == (5,)
+        assert index.position_of("card-0005") == 5
+
+    def test_get_many_preserves_request_order(self, index):
+        """Test batch id resolution, including duplicates and unknown ids."""
+        found, missing = index.get_many(["card-0003", "nope", "card-0001", "card-0003"])
+
+        assert [c["id"] for c in found] == ["card-0003", "card-0001"]
+        assert missing == ["nope"]
+        assert index.get("card-0001") is index.cards[1]
+
+    def test_version_tracks_content(self, cards):
+        """Test that the catalog version changes only when card content changes."""
+        same = CardCatalogIndex([dict(c) for c in cards])
+        changed = CardCatalogIndex(cards[:-1] + [{**cards[-1], "cost": 99}])
+
+        assert CardCatalogIndex(cards).version == same.version
+        assert changed.version != same.version
+        assert changed.responses is not same.responses
+
+
+class TestSerializedResponseCache:
+
+    def test_evicts_least_recently_used(self):
+        """Test that reads refresh recency and the oldest entry is evicted."""
+        cache = SerializedResponseCache(max_entries=2)
+        cache.put("a", b"1")
+        cache.put("b", b"2")
+
+        assert cache.get("a") == b"1"
+        cache.put("c", b"3")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == b"1"
+        assert cache.get("c") == b"3"
+        assert (cache.hits, cache.misses) == (3, 1)
+
+
+class _CatalogHandler(BaseHTTPRequestHandler):
+    """Serve a JSON catalog with an ETag, honoring If-None-Match."""
+
+    payload = b"[]"
+    etag = '"v1"'
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", self.etag)
+        self.end_headers()
+        self.wfile.write(self.payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestCardCatalogRefresher:
+
+    @pytest.fixture
+    def server(self):
+        """Run a throwaway catalog server on an ephemeral port."""
+        _CatalogHandler.payload = json.dumps(
+            [{"id": "card-001", "name": "Solar Guard", "type": "unit"}]
+        ).encode()
+        _CatalogHandler.requests = []
+        httpd = HTTPServer(("127.0.0.1", 0), _CatalogHandler)
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{httpd.server_port}/cards.json"
+        httpd.shutdown()
+        httpd.server_close()
+
+    def test_refresh_publishes_then_revalidates(self, server):
+        """Test that a second refresh sends the ETag and keeps the current index on 304."""
+        db = SimpleNamespace()
+        refresher = CardCatalogRefresher(db, server)
+
+        # Act
+        first = asyncio.run(refresher.refresh())
+        index = get_catalog_index(db)
+        second = asyncio.run(refresher.refresh())
+
+        # Assert
+        assert first is True
+        assert [c["id"] for c in index.cards] == ["card-001"]
+        assert second is False
+        assert get_catalog_index(db) is index
+        assert _CatalogHandler.requests[1].get("If-None-Match") == '"v1"'
+        assert refresher.get_stats()["not_modified"] == 1
+
+    def test_failed_refresh_keeps_stale_catalog(self, server, monkeypatch):
+        """Test that an invalid payload never replaces the catalog and backs off refetching."""
+        from backend.api.card_endpoints import _cards_store
+
+        db = SimpleNamespace()
+        refresher = CardCatalogRefresher(db, server)
+        asyncio.run(refresher.refresh())
+        index = get_catalog_index(db)
+        monkeypatch.setenv("CARDS_SOURCE_URL", server)
+        request = SimpleNamespace(state=SimpleNamespace(db=db))
+
+        async def request_after_expiry():
+            setattr(db, FETCHED_AT_ATTR, 0)
+            served = _cards_store(request)
+            if refresher._inflight is not None:
+                await refresher._inflight
+            return served
+
+        # Act
+        _CatalogHandler.payload = b"not json"
+        _CatalogHandler.etag = '"v2"'
+        try:
+            refreshed = asyncio.run(refresher.refresh())
+            fetches = len(_CatalogHandler.requests)
+            served = asyncio.run(request_after_expiry())
+        finally:
+            _CatalogHandler.etag = '"v1"'
+
+        # Assert
+        assert refreshed is False
+        assert get_catalog_index(db) is index
+        assert served is index
+        assert refresher.in_backoff()
+        assert len(_CatalogHandler.requests) == fetches
+        assert refresher.get_stats()["failures"] == 1
+        assert refresher.get_stats()["consecutive_failures"] == 1
+
+    def test_successful_refresh_clears_backoff(self, server):
+        """Test that a refresh after the backoff window resets the failure streak."""
+        db = SimpleNamespace()
+        refresher = CardCatalogRefresher(db, server)
+        _CatalogHandler.payload = b"not json"
+        asyncio.run(refresher.refresh())
+        asyncio.run(refresher.refresh())
+        streak = refresher.get_stats()["consecutive_failures"]
+
+        # Act
+        _CatalogHandler.payload = json.dumps([{"id": "card-002", "name": "B", "type": "unit"}]).encode()
+        refreshed = asyncio.run(refresher.refresh())
+
+        # Assert
+        assert streak == 2
+        assert refreshed is True
+        assert not refresher.in_backoff()
+        assert refresher.get_stats()["consecutive_failures"] == 0
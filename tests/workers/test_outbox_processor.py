@@ -0,0 +1,306 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+from functools import partial
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from datetime import datetime, timezone
+from pymongo.errors import OperationFailure
+
+from backend.repository import AsyncTransactionOutboxRepository, OutboxStatus, OutboxType
+from backend.services.blockchain_handler import LeaseLostError
+from backend.services.blockchain_service import BlockchainService
+from backend.shared.db import InMemoryDB
+from backend.shared.db.changes import ChangeFeed
+from backend.workers.outbox_processor import OutboxProcessor
+
+
+def run(coro):
+    """Run a coroutine to completion."""
+    return asyncio.run(coro)
+
+
+MINT_REQUEST = {"blockchain": "ethereum", "recipient": "0x1", "card_id": "card-1"}
+
+
+def _external_entry(outbox_id):
+    """Pending outbox document as another process would insert it."""
+    now = datetime.now(timezone.utc)
+    return {
+        "outbox_id": outbox_id,
+        "outbox_type": OutboxType.MINT_NFT.value,
+        "status": OutboxStatus.PENDING.value,
+        "request_data": MINT_REQUEST,
+        "created_at": now,
+        "updated_at": now,
+        "attempts": 0,
+        "max_attempts": 5,
+    }
+
+
+class TestOutboxProcessorWakeUps:
+
+    @pytest.fixture
+    def blockchain_service(self):
+        """Blockchain service whose mints confirm immediately."""
+        service = MagicMock(spec=BlockchainService)
+        service.mint_nft.return_value = "0xabc"
+        service.wait_for_confirmation.return_value = {"status": 1}
+        return service
+
+    def test_create_entry_wakes_an_idle_processor(self, blockchain_service):
+        """An entry created in-process is dispatched without waiting out the poll interval."""
+        async def scenario():
+            db = InMemoryDB()
+            processor = OutboxProcessor(
+                db, blockchain_service, processing_interval=30, use_change_stream=False
+            )
+            await processor.start()
+            await asyncio.sleep(0.05)
+            entry = await AsyncTransactionOutboxRepository(db).create_entry(
+                OutboxType.MINT_NFT, MINT_REQUEST
+            )
+            await asyncio.sleep(0.2)
+            await processor.stop()
+            return await processor.outbox_repo.get_by_id(entry.outbox_id)
+
+        # Act
+        entry = run(scenario())
+
+        # Assert
+        assert entry.status == OutboxStatus.COMPLETED
+
+    def test_change_stream_wakes_on_external_inserts(self, blockchain_service):
+        """Inserts made outside the repository reach the processor through watch()."""
+        async def scenario():
+            db = InMemoryDB()
+            processor = OutboxProcessor(db, blockchain_service, processing_interval=30)
+            await processor.start()
+            await asyncio.sleep(0.05)
+            now = datetime.now(timezone.utc)
+            await db.outbox.insert_one({
+                "outbox_id": "external",
+                "outbox_type": OutboxType.MINT_NFT.value,
+                "status": OutboxStatus.PENDING.value,
+                "request_data": MINT_REQUEST,
+                "created_at": now,
+                "updated_at": now,
+                "attempts": 0,
+                "max_attempts": 5,
+            })
+            await asyncio.sleep(0.2)
+            await processor.stop()
+            return await processor.outbox_repo.get_by_id("external")
+
+        # Act
+        entry = run(scenario())
+
+        # Assert
+        assert entry.status == OutboxStatus.COMPLETED
+
+    def test_change_stream_reopens_after_losing_history(self, blockchain_service, caplog):
+        """A burst that overflows the change log reopens the watch and polls the missed inserts."""
+        async def scenario():
+            db = InMemoryDB()
+            processor = OutboxProcessor(
+                db, blockchain_service, processing_interval=30, min_poll_interval=0.02
+            )
+            await processor.start()
+            await asyncio.sleep(0.05)
+            await db.outbox.insert_many([_external_entry(f"burst-{i}") for i in range(8)])
+            await asyncio.sleep(0.3)
+            await db.outbox.insert_one(_external_entry("after"))
+            await asyncio.sleep(0.2)
+            watching = not processor._watch_task.done()
+            await processor.stop()
+            return watching, await db.outbox.count_documents(
+                {"status": OutboxStatus.COMPLETED.value}
+            )
+
+        # Act
+        with patch(
+            "backend.shared.db.collection.ChangeFeed", partial(ChangeFeed, capacity=4)
+        ):
+            watching, completed = run(scenario())
+
+        # Assert
+        assert "reopening" in caplog.text
+        assert watching
+        assert completed == 9
+
+    def test_change_streams_unsupported_ends_the_watch(self, blockchain_service, caplog):
+        """A server without change streams falls back to polling for good."""
+        async def scenario():
+            db = InMemoryDB()
+            processor = OutboxProcessor(
+                db, blockchain_service, processing_interval=30, min_poll_interval=0.01
+            )
+            processor.outbox_repo.collection.watch = MagicMock(side_effect=OperationFailure(
+                "The $changeStream stage is only supported on replica sets", code=40573
+            ))
+            await processor.start()
+            await asyncio.sleep(0.05)
+            finished = processor._watch_task.done()
+            await processor.stop()
+            return finished, processor.outbox_repo.collection.watch.call_count
+
+        # Act
+        caplog.set_level("INFO")
+        finished, calls = run(scenario())
+
+        # Assert
+        assert finished
+        assert calls == 1
+        assert "relying on polling" in caplog.text
+
+    def test_empty_polls_back_off_to_the_processing_interval(self, blockchain_service):
+        """Idle polling doubles from min_poll_interval and is capped at processing_interval."""
+        async def scenario():
+            processor = OutboxProcessor(
+                InMemoryDB(), blockchain_service, processing_interval=0.04,
+                min_poll_interval=0.01, use_change_stream=False,
+            )
+            await processor.start()
+            await asyncio.sleep(0.15)
+            await processor.stop()
+            return processor.poll_interval
+
+        assert run(scenario()) == 0.04
+
+    def test_start_creates_the_outbox_indexes(self, blockchain_service):
+        """Starting the processor ensures the {status, next_attempt_at} index exists."""
+        async def scenario():
+            db = InMemoryDB()
+            processor = OutboxProcessor(db, blockchain_service, use_change_stream=False)
+            await processor.start()
+            await processor.stop()
+            return {index["name"] for index in db.outbox.list_indexes()}
+
+        assert "status_asc_next_attempt_at_asc" in run(scenario())
+
+    def test_claim_errors_reach_the_loop_error_backoff(self, blockchain_service, caplog):
+        """A failing claim is handled as a loop error, not mistaken for busy slots."""
+        async def scenario():
+            processor = OutboxProcessor(
+                InMemoryDB(), blockchain_service, processing_interval=30, use_change_stream=False
+            )
+            processor.outbox_repo.claim_batch = AsyncMock(side_effect=RuntimeError("db down"))
+            await processor.start()
+            await asyncio.sleep(0.05)
+            await processor.stop()
+
+        # Act
+        run(scenario())
+
+        # Assert
+        assert "Error in processing loop: db down" in caplog.text
+
+
+class TestOutboxProcessorLeases:
+
+    def test_slow_execution_outlives_lease_without_a_second_send(self):
+        """Renewals keep a queued or slow entry's lease, so a rival worker never reclaims it."""
+        async def scenario():
+            db = InMemoryDB()
+            repo = AsyncTransactionOutboxRepository(db)
+            for i in range(2):
+                await repo.create_entry(OutboxType.MINT_NFT, {**MINT_REQUEST, "card_id": f"card-{i}"})
+            processor = OutboxProcessor(
+                db, MagicMock(spec=BlockchainService), processing_interval=30,
+                lease_seconds=0.15, use_change_stream=False,
+            )
+            sends = Counter()
+
+            def slow_execute(entry):
+                sends[entry.outbox_id] += 1
+                time.sleep(0.3)  # Twice the lease, queued behind a one-slot chain
+                return {"status": "confirmed"}
+
+            processor.blockchain_handler._execute = slow_execute
+            rival_claims = []
+            await processor.start()
+            for _ in range(16):
+                await asyncio.sleep(0.05)
+                rival_claims += await repo.claim_batch("rival", limit=2, lease_seconds=30)
+            await processor.stop()
+            statuses = [doc["status"] for doc in db.outbox.data]
+            return rival_claims, sends, statuses
+
+        # Act
+        with patch(
+            "backend.services.blockchain_handler.BlockchainConfig.get_max_concurrency",
+            return_value=1,
+        ):
+            rival_claims, sends, statuses = run(scenario())
+
+        # Assert
+        assert rival_claims == []
+        assert sorted(sends.values()) == [1, 1]
+        assert statuses == [OutboxStatus.COMPLETED.value] * 2
+
+    def test_lease_stolen_mid_execution_goes_to_manual_review(self, caplog):
+        """A result that can no longer be recorded under the lease is parked, not counted completed."""
+        async def scenario():
+            db = InMemoryDB()
+            repo = AsyncTransactionOutboxRepository(db)
+            entry = await repo.create_entry(OutboxType.MINT_NFT, MINT_REQUEST)
+            processor = OutboxProcessor(
+                db, MagicMock(spec=BlockchainService), processing_interval=30,
+                lease_seconds=0.15, use_change_stream=False,
+            )
+            started, release = threading.Event(), threading.Event()
+
+            def blocking_execute(entry):
+                started.set()
+                release.wait(5)
+                return {"tx_hash": "0xfeed", "status": "confirmed"}
+
+            processor.blockchain_handler._execute = blocking_execute
+            await processor.start()
+            await asyncio.to_thread(started.wait, 5)
+            # Another worker reclaims the entry while the send is still in flight
+            await db.outbox.update_one(
+                {"outbox_id": entry.outbox_id}, {"$set": {"lease_owner": "rival"}}
+            )
+            await asyncio.sleep(0.15)
+            release.set()
+            await processor.stop()
+            return processor, await db.outbox.find_one({"outbox_id": entry.outbox_id})
+
+        # Act
+        processor, doc = run(scenario())
+
+        # Assert
+        assert processor.completed_count == 0
+        assert processor.failed_count == 1
+        assert doc["status"] == OutboxStatus.MANUAL_REVIEW.value
+        assert doc["last_error"] == "Lease lost during execution"
+        assert doc["review_result"]["tx_hash"] == "0xfeed"
+        assert "0xfeed" in caplog.text
+
+    def test_entries_lost_before_execution_are_counted_as_skipped(self):
+        """An entry another worker took over is neither completed nor failed here."""
+        async def scenario():
+            db = InMemoryDB()
+            await AsyncTransactionOutboxRepository(db).create_entry(OutboxType.MINT_NFT, MINT_REQUEST)
+            processor = OutboxProcessor(
+                db, MagicMock(spec=BlockchainService), processing_interval=30,
+                use_change_stream=False,
+            )
+            processor.blockchain_handler.process_entry_async = AsyncMock(
+                side_effect=LeaseLostError("lease lost")
+            )
+            await processor.start()
+            await asyncio.sleep(0.1)
+            await processor.stop()
+            return processor
+
+        # Act
+        processor = run(scenario())
+
+        # Assert
+        assert processor.skipped_count == 1
+        assert processor.completed_count == 0
+        assert processor.failed_count == 0